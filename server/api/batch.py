@@ -0,0 +1,266 @@
+import asyncio
+import mimetypes
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse
+from loguru import logger
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+from config.config_loader import UPLOAD_CONFIG
+from db.async_redis import async_redis
+from fastapi_celery.client import enqueue_transcriptions
+from utils.media import probe_media
+from utils.scheduling import USER_SLOTS, queue_name, size_class
+from utils.stt_options import build_options
+
+router = APIRouter()
+
+# 允许直接导入的服务器本地目录，为空时只能提交已上传的文件
+IMPORT_DIRS = [os.path.realpath(d) for d in UPLOAD_CONFIG.get("import_dirs") or []]
+BATCH_MAX_ITEMS = int(UPLOAD_CONFIG.get("batch_max_items", 1000))
+PROBE_CONCURRENCY = int(UPLOAD_CONFIG.get("batch_probe_concurrency", 8))
+
+
+class BatchRequest(BaseModel):
+    # 已通过 /api/upload 上传的文件
+    file_ids: List[str] = []
+    # 服务器本地的文件，或目录中的全部音视频文件，须位于 upload.import_dirs 中
+    paths: List[str] = []
+    directory: Optional[str] = None
+    recursive: bool = False
+    user_id: Optional[str] = None
+    model: Optional[str] = None
+    engine: Optional[str] = None
+    language: Optional[str] = None
+    initial_prompt: Optional[str] = None
+    word_timestamps: Optional[bool] = None
+    temperature: Optional[float] = None
+    vad: Optional[bool] = None
+
+
+def _check_import_path(path):
+    real = os.path.realpath(path)
+    if not any(os.path.commonpath([real, d]) == d for d in IMPORT_DIRS):
+        raise HTTPException(status_code=403, detail=f"Path not allowed: {path}")
+    return real
+
+
+def _media_type(path):
+    media_type = mimetypes.guess_type(path)[0]
+    if media_type and media_type.startswith(("audio/", "video/")):
+        return media_type
+    return None
+
+
+def _list_directory(directory, recursive):
+    """列出目录中的音视频文件（按扩展名判断），按路径排序"""
+    paths = []
+    for root, dirs, names in os.walk(directory):
+        paths.extend(
+            os.path.join(root, name) for name in names if _media_type(name) is not None
+        )
+        if not recursive:
+            break
+    return sorted(paths)
+
+
+def _local_file_info(path):
+    media_info = probe_media(path)
+    return {
+        "file_id": str(uuid.uuid4()),
+        "file_name": os.path.basename(path),
+        # 直接使用原路径，不复制到 storage；删除任务时也不会删除该文件
+        "file_path": path,
+        "file_size": os.path.getsize(path),
+        "file_type": _media_type(path),
+        "duration": media_info["duration"],
+    }
+
+
+async def _probe_local_files(paths):
+    """并发探测本地文件时长，返回 ([文件信息], [错误])"""
+    semaphore = asyncio.Semaphore(PROBE_CONCURRENCY)
+
+    async def probe(path):
+        async with semaphore:
+            try:
+                return await run_in_threadpool(_local_file_info, path), None
+            except Exception as e:
+                logger.error(f"Error probing {path}: {e}")
+                return None, {"source": path, "error": "Failed to probe media"}
+
+    results = await asyncio.gather(*(probe(path) for path in paths))
+    return [r for r, _ in results if r], [e for _, e in results if e]
+
+
+@router.post("/stt-batch")
+async def create_batch(request: Request, batch: BatchRequest):
+    """批量提交转写任务，返回批次ID，进度通过 /api/stt-batch/{batch_id} 查询
+
+    所有文件、任务和摘要在一个 Redis pipeline 中写入，可以立即投递的任务
+    作为一个 Celery group 投递；同一用户超出队列名额的任务与 /api/stt 一样先暂存。
+    """
+    paths = [_check_import_path(path) for path in batch.paths]
+    if batch.directory:
+        directory = _check_import_path(batch.directory)
+        if not os.path.isdir(directory):
+            raise HTTPException(status_code=404, detail="Directory not found")
+        paths += await run_in_threadpool(_list_directory, directory, batch.recursive)
+    if not paths and not batch.file_ids:
+        raise HTTPException(status_code=400, detail="No files to transcribe")
+    if len(paths) + len(batch.file_ids) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail="Too many files in one batch")
+
+    options = build_options(
+        model=batch.model,
+        engine=batch.engine,
+        language=batch.language,
+        initial_prompt=batch.initial_prompt,
+        word_timestamps=batch.word_timestamps,
+        temperature=batch.temperature,
+        vad=batch.vad,
+    )
+    try:
+        errors = []
+        file_infos = []
+        for file_id, file_info in zip(
+            batch.file_ids, await async_redis.get_files(batch.file_ids)
+        ):
+            if file_info is None:
+                errors.append({"source": file_id, "error": "File not found"})
+            else:
+                file_infos.append(file_info)
+        local_infos, probe_errors = await _probe_local_files(paths)
+        errors += probe_errors
+
+        batch_id = str(uuid.uuid4())
+        user = batch.user_id or request.client.host
+        jobs, summaries, items = [], {}, []
+        for file_info in file_infos + local_infos:
+            task_id = str(uuid.uuid4())
+            duration = file_info.get("duration")
+            jobs.append(
+                {
+                    "task_id": task_id,
+                    "file_id": file_info["file_id"],
+                    "options": options,
+                    "size_class": size_class(duration),
+                    "user": user,
+                    "duration": duration,
+                    "queued_at": time.time(),
+                    "batch_id": batch_id,
+                }
+            )
+            summaries[task_id] = {
+                "file_id": file_info["file_id"],
+                "file_name": file_info.get("file_name"),
+                "file_type": file_info.get("file_type"),
+                "file_path": file_info.get("file_path"),
+                "duration": duration,
+                "state": "PENDING",
+            }
+            items.append(
+                {
+                    "task_id": task_id,
+                    "file_id": file_info["file_id"],
+                    "file_name": file_info.get("file_name"),
+                    "duration": duration,
+                }
+            )
+
+        batch_info = {
+            "batch_id": batch_id,
+            "created_at": datetime.now().isoformat(),
+            "items": items,
+            "errors": errors,
+        }
+        admitted = await async_redis.submit_batch(
+            batch_id,
+            batch_info,
+            {info["file_id"]: info for info in local_infos},
+            jobs,
+            summaries,
+            USER_SLOTS,
+        )
+        ready = [
+            (job["file_id"], options, queue_name(job["size_class"]), job["task_id"])
+            for job, ok in zip(jobs, admitted)
+            if ok
+        ]
+        if ready:
+            await run_in_threadpool(enqueue_transcriptions, ready)
+        logger.info(
+            f"批次 {batch_id}：{len(jobs)} 个任务，立即投递 {len(ready)} 个，"
+            f"{len(errors)} 个文件无法处理"
+        )
+        return JSONResponse(
+            content={
+                "code": 200,
+                "message": "文件正在后台处理",
+                "data": {
+                    "batch_id": batch_id,
+                    "total": len(jobs),
+                    "queued": len(ready),
+                    "held": len(jobs) - len(ready),
+                    "errors": errors,
+                },
+            }
+        )
+    except Exception as e:
+        logger.exception(e)
+        raise HTTPException(status_code=500, detail="Failed to create batch")
+
+
+@router.get("/stt-batch/{batch_id}")
+async def get_batch(batch_id: str):
+    """批次的总体进度和每个任务的状态
+
+    percent 按已结束（成功或失败）任务的音频时长占比计算。
+    """
+    batch_info = await async_redis.get_batch(batch_id)
+    if batch_info is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    items = batch_info["items"]
+    metas = await async_redis.get_stt_task_metas([i["task_id"] for i in items])
+    counts = {"PENDING": 0, "PROGRESS": 0, "SUCCESS": 0, "FAILURE": 0}
+    total_duration = finished_duration = 0.0
+    statuses = []
+    for item, meta in zip(items, metas):
+        state = meta.get("state", "PENDING") if meta else "PENDING"
+        counts[state] = counts.get(state, 0) + 1
+        duration = item.get("duration") or 0
+        total_duration += duration
+        if state in ("SUCCESS", "FAILURE"):
+            finished_duration += duration
+        statuses.append(
+            dict(item, state=state, process=meta.get("process") if meta else None)
+        )
+
+    finished = counts["SUCCESS"] + counts["FAILURE"]
+    if total_duration:
+        percent = round(100 * finished_duration / total_duration, 1)
+    else:
+        percent = round(100 * finished / max(len(items), 1), 1)
+    return JSONResponse(
+        content={
+            "code": 200,
+            "message": "Success",
+            "data": {
+                "batch_id": batch_id,
+                "created_at": batch_info["created_at"],
+                "total": len(items),
+                "finished": finished,
+                "counts": counts,
+                "percent": percent,
+                "items": statuses,
+                "errors": batch_info["errors"],
+            },
+        }
+    )
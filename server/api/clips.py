@@ -0,0 +1,141 @@
+import os
+import shutil
+import uuid
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse, JSONResponse
+from loguru import logger
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+from config.config_loader import STT_CONFIG
+from db.async_redis import async_redis
+from fastapi_celery.client import enqueue_clip
+
+router = APIRouter()
+CLIP_CONFIG = STT_CONFIG.get("clips", {})
+CLIP_QUEUE = CLIP_CONFIG.get("queue", "clips")
+MAX_RANGES = int(CLIP_CONFIG.get("max_ranges", 50))
+CLIP_DIR = os.path.join("storage", "clips")
+
+
+class ClipRange(BaseModel):
+    # 从 segment_id 的第 word_start 个词到 end_segment_id 的第 word_end 个词（含），
+    # 不指定词序号时取整个片段
+    segment_id: int
+    end_segment_id: Optional[int] = None
+    word_start: Optional[int] = None
+    word_end: Optional[int] = None
+
+
+class ClipRequest(BaseModel):
+    task_id: str
+    ranges: List[ClipRange]
+
+
+async def delete_task_clips(task_id):
+    """删除任务导出的全部剪辑文件，剪辑记录随过期时间自动清除"""
+    await run_in_threadpool(
+        shutil.rmtree, os.path.join(CLIP_DIR, task_id), ignore_errors=True
+    )
+
+
+def _range_times(clip_range, segments):
+    first = segments.get(clip_range.segment_id)
+    end_id = clip_range.end_segment_id
+    last = segments.get(clip_range.segment_id if end_id is None else end_id)
+    if first is None or last is None:
+        raise ValueError("Unknown segment")
+    start, end = first["start"], last["end"]
+    for index in (clip_range.word_start, clip_range.word_end):
+        if index is not None and index < 0:
+            raise ValueError("Unknown word index")
+    try:
+        if clip_range.word_start is not None:
+            start = first["words"][clip_range.word_start]["start"]
+        if clip_range.word_end is not None:
+            end = last["words"][clip_range.word_end]["end"]
+    except (KeyError, IndexError):
+        raise ValueError("Unknown word index")
+    if end <= start:
+        raise ValueError("Clip range ends before it starts")
+    return start, end
+
+
+@router.post("/clips")
+async def create_clip(request: ClipRequest):
+    """按转写稿中的片段/词范围从原文件剪辑，多个范围按顺序拼接为一个文件
+
+    剪辑在后台执行，进度通过 /api/clips/{clip_id} 查询。
+    """
+    if not request.ranges:
+        raise HTTPException(status_code=400, detail="No clip ranges")
+    if len(request.ranges) > MAX_RANGES:
+        raise HTTPException(status_code=400, detail="Too many clip ranges")
+
+    meta = await async_redis.get_stt_task_meta(request.task_id)
+    if meta is None or meta.get("state") != "SUCCESS":
+        raise HTTPException(status_code=404, detail="Task not found")
+    file_path = meta.get("file_path")
+    if not file_path or not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail="Media file not found")
+
+    segment_ids = set()
+    for clip_range in request.ranges:
+        segment_ids.add(clip_range.segment_id)
+        if clip_range.end_segment_id is not None:
+            segment_ids.add(clip_range.end_segment_id)
+    if "blocks" in meta:
+        segments = await async_redis.get_segments_by_id(request.task_id, segment_ids)
+    else:
+        segments = {s.get("id"): s for s in meta.get("segments", [])}
+    try:
+        ranges = [_range_times(r, segments) for r in request.ranges]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    clip_id = str(uuid.uuid4())
+    clip_info = {
+        "clip_id": clip_id,
+        "task_id": request.task_id,
+        "ranges": ranges,
+        "duration": round(sum(end - start for start, end in ranges), 3),
+        "state": "PENDING",
+        "process": "queued",
+        "percent": 0,
+        "created_at": datetime.now().isoformat(),
+    }
+    try:
+        await async_redis.set_clip(clip_id, clip_info)
+        # 投递消息是同步的网络调用，放到线程池避免阻塞事件循环
+        await run_in_threadpool(
+            enqueue_clip, clip_id, request.task_id, file_path, ranges, queue=CLIP_QUEUE
+        )
+    except Exception as e:
+        logger.exception(e)
+        raise HTTPException(status_code=500, detail="Failed to create clip")
+    return JSONResponse(
+        content={"code": 200, "message": "Success", "data": {"clip_id": clip_id}}
+    )
+
+
+@router.get("/clips/{clip_id}")
+async def get_clip(clip_id: str):
+    clip_info = await async_redis.get_clip(clip_id)
+    if clip_info is None:
+        raise HTTPException(status_code=404, detail="Clip not found")
+    data = {k: v for k, v in clip_info.items() if k != "clip_path"}
+    if clip_info.get("state") == "SUCCESS":
+        data["url"] = f"/api/clips/{clip_id}/file"
+    return JSONResponse(content={"code": 200, "message": "Success", "data": data})
+
+
+@router.get("/clips/{clip_id}/file")
+async def get_clip_file(clip_id: str):
+    clip_info = await async_redis.get_clip(clip_id)
+    path = clip_info.get("clip_path") if clip_info else None
+    if not path or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Clip not found")
+    return FileResponse(path, filename=os.path.basename(path))
@@ -0,0 +1,103 @@
+import os
+from urllib.parse import quote
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from loguru import logger
+
+from config.config_loader import STT_CONFIG
+from db.async_redis import async_redis
+from utils.subtitles import FORMATS, Exporter
+
+router = APIRouter()
+
+EXPORT_CONFIG = STT_CONFIG.get("export", {})
+# 超过该大小的导出结果只流式输出，不写入缓存
+EXPORT_CACHE_MAX_BYTES = int(EXPORT_CONFIG.get("cache_max_bytes", 4 * 1024 * 1024))
+
+
+def _content_disposition(file_name, ext):
+    name = f"{os.path.splitext(file_name or 'transcript')[0]}.{ext}"
+    return f"attachment; filename*=UTF-8''{quote(name)}"
+
+
+async def _export_parts(task_id, meta, exporter):
+    yield exporter.begin()
+    async for segments in async_redis.iter_stt_segments(task_id, meta):
+        yield exporter.write(segments)
+    yield exporter.end()
+
+
+async def _render(task_id, meta, exporter, version, field):
+    """逐批读取片段并渲染，结果不大时写入缓存；导出期间转写被修改则不缓存"""
+    chunks, size = [], 0
+    async for part in _export_parts(task_id, meta, exporter):
+        data = part.encode("utf-8")
+        size += len(data)
+        if size <= EXPORT_CACHE_MAX_BYTES:
+            chunks.append(data)
+        if data:
+            yield data
+
+    if size > EXPORT_CACHE_MAX_BYTES:
+        return
+    current = await async_redis.get_stt_task_meta(task_id)
+    if current and current.get("version", 1) == version:
+        await async_redis.set_export(task_id, version, field, b"".join(chunks))
+
+
+@router.get("/stt-export/{task_id}")
+async def export_transcript(
+    request: Request,
+    task_id: str,
+    format: str = "srt",
+    max_line_width: int = None,
+    max_line_count: int = None,
+    highlight_words: bool = None,
+):
+    """按当前版本的片段导出 SRT / VTT / TSV / JSON / TXT
+
+    行宽、行数和逐词高亮未指定时使用配置 stt.export 中的默认值。
+    导出结果按转写版本缓存，修改转写后版本号变化，旧缓存自动失效。
+    """
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown export format: {format}")
+    if max_line_width is None:
+        max_line_width = EXPORT_CONFIG.get("max_line_width")
+    if max_line_count is None:
+        max_line_count = EXPORT_CONFIG.get("max_line_count")
+    if highlight_words is None:
+        highlight_words = bool(EXPORT_CONFIG.get("highlight_words", False))
+
+    meta = await async_redis.get_stt_task_meta(task_id)
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if meta.get("state") != "SUCCESS":
+        raise HTTPException(status_code=409, detail="Transcript is not ready")
+
+    version = meta.get("version", 1)
+    options = f"{max_line_width}:{max_line_count}:{int(highlight_words)}"
+    field = f"{version}:{format}:{options}"
+    ext, media_type = FORMATS[format]
+    headers = {
+        "Content-Disposition": _content_disposition(meta.get("file_name"), ext),
+        "ETag": f'"{field}"',
+        "X-Transcript-Version": str(version),
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+
+    cached = await async_redis.get_export(task_id, field)
+    if cached is not None:
+        return Response(content=cached, media_type=media_type, headers=headers)
+
+    try:
+        exporter = Exporter(format, max_line_width, max_line_count, highlight_words)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info(f"{task_id} 导出 {format}，版本 {version}")
+    return StreamingResponse(
+        _render(task_id, meta, exporter, version, field),
+        media_type=media_type,
+        headers=headers,
+    )
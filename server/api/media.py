@@ -0,0 +1,34 @@
+import os
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+
+from db.async_redis import async_redis
+
+router = APIRouter()
+
+PROXY_MEDIA_TYPES = {".m4a": "audio/mp4", ".webm": "audio/webm"}
+
+
+def proxy_url(file_info):
+    """文件已生成播放代理时返回其地址，否则返回 None"""
+    if file_info and file_info.get("proxy_path"):
+        return f"/api/media/{file_info['file_id']}/proxy"
+    return None
+
+
+@router.get("/media/{file_id}/proxy")
+async def get_proxy_media(file_id: str):
+    """播放用的低码率音频代理，支持 Range 请求；原文件仍可通过 /storage 获取
+
+    代理按 file_id 生成后不再变化，允许浏览器长期缓存。
+    """
+    file_info = await async_redis.get_file(file_id)
+    path = file_info.get("proxy_path") if file_info else None
+    if not path or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Proxy media not found")
+    return FileResponse(
+        path,
+        media_type=PROXY_MEDIA_TYPES.get(os.path.splitext(path)[1], "audio/mp4"),
+        headers={"Cache-Control": "public, max-age=604800, immutable"},
+    )
@@ -0,0 +1,32 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from db.async_redis import async_redis
+from utils.metrics import HTTP_LATENCY, render_gauge, render_metrics
+from utils.scheduling import SIZE_CLASSES, queue_name
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+async def metrics():
+    """Prometheus 文本格式的指标
+
+    转写阶段耗时、实时率等由各 worker 写入 Redis 汇总，HTTP 延迟为本进程的统计。
+    """
+    data, queues = await async_redis.get_metrics(list(SIZE_CLASSES))
+    lines = render_metrics(data)
+    lines += render_gauge(
+        "cutai_queue_jobs",
+        "Jobs waiting in each queue",
+        [({"queue": queue_name(name)}, q["queued"]) for name, q in queues.items()],
+    )
+    lines += render_gauge(
+        "cutai_running_jobs",
+        "Jobs being processed in each queue",
+        [({"queue": queue_name(name)}, q["running"]) for name, q in queues.items()],
+    )
+    lines += HTTP_LATENCY.render()
+    return PlainTextResponse(
+        "\n".join(lines) + "\n", media_type="text/plain; version=0.0.4"
+    )
@@ -0,0 +1,98 @@
+import asyncio
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
+from loguru import logger
+
+from db.async_redis import async_redis
+from utils.search import find_hits, query_terms
+
+router = APIRouter()
+
+MAX_QUERY_LENGTH = 100
+# 一页最多读取的候选批数，每批 2 * limit 个
+MAX_SCAN_ROUNDS = 5
+
+
+async def _verify_candidates(candidates, q):
+    """读取候选片段并按原文核对，返回与 candidates 一一对应的结果，未命中时为 None"""
+    by_task = {}
+    for task_id, segment_id, _ in candidates:
+        by_task.setdefault(task_id, []).append(segment_id)
+    task_ids = list(by_task)
+    segments, file_names = await asyncio.gather(
+        asyncio.gather(
+            *(async_redis.get_segments_by_id(t, by_task[t]) for t in task_ids)
+        ),
+        async_redis.get_summary_field(task_ids, "file_name"),
+    )
+    segments = dict(zip(task_ids, segments))
+
+    items = []
+    for task_id, segment_id, score in candidates:
+        segment = segments[task_id].get(segment_id)
+        hits = find_hits(segment, q) if segment else []
+        if not hits:
+            # 各词项都出现但不相邻，或索引尚未随编辑更新
+            items.append(None)
+            continue
+        items.append(
+            {
+                "task_id": task_id,
+                "file_name": file_names.get(task_id),
+                "segment_id": segment_id,
+                "text": segment["text"],
+                "start": segment["start"],
+                "end": segment["end"],
+                "score": round(score, 4),
+                "hits": hits,
+            }
+        )
+    return items
+
+
+@router.get("/search")
+async def search_transcripts(q: str, limit: int = 20, offset: int = 0):
+    """在所有任务的转写片段中检索，按相关度返回命中的片段
+
+    中文按相邻两字匹配，英文按单词匹配，所有词项都须出现在同一片段中；
+    返回前再按原文核对，hits 为查询文本在片段中出现的位置及词级起止时间。
+
+    offset / next_offset 是候选片段（索引交集）中的位置，而不是结果条数：
+    未通过核对的候选会被跳过，继续读取后面的候选直到凑满 limit 条，
+    最多读取 MAX_SCAN_ROUNDS 批，因此一页可能少于 limit 条。
+    next_offset 为已核对的候选数，没有更多候选时为 null。
+    """
+    terms = query_terms(q[:MAX_QUERY_LENGTH])
+    if not terms:
+        raise HTTPException(status_code=400, detail="Empty search query")
+    limit = max(1, min(limit, 100))
+    offset = max(0, offset)
+
+    try:
+        items, cursor, total = [], offset, 0
+        for _ in range(MAX_SCAN_ROUNDS):
+            candidates, total = await async_redis.search_segments(
+                terms, cursor, limit * 2
+            )
+            if not candidates:
+                break
+            for item in await _verify_candidates(candidates, q):
+                cursor += 1
+                if item is not None:
+                    items.append(item)
+                if len(items) == limit:
+                    break
+            if len(items) == limit or cursor >= total:
+                break
+        next_offset = cursor if cursor < total else None
+        return JSONResponse(
+            content={
+                "code": 200,
+                "message": "Success",
+                "data": {"items": items, "next_offset": next_offset},
+            }
+        )
+    except Exception as e:
+        logger.exception(e)
+        raise HTTPException(status_code=500, detail="Failed to search transcripts")
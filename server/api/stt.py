@@ -1,88 +1,209 @@
-import datetime
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from fastapi import Form
-from moviepy import VideoFileClip, AudioFileClip
 from loguru import logger
 import os
+from fastapi_celery.client import enqueue_retranscription, enqueue_transcription
+from db import keys
+from db.async_redis import async_redis
+from db.redis import VersionConflict, build_task_summary
+from api.clips import delete_task_clips
+from api.media import proxy_url
+from api.upload import STORAGE_DIR
+from config.config_loader import STT_CONFIG
+from utils.stt_options import build_options, cache_key
+from utils.scheduling import USER_SLOTS, size_class, queue_name, queue_status
+from utils.transcript import PatchError, segment_text
 from datetime import datetime
-from fastapi_celery.tasks import process_file_celery, get_stt_progress
 import uuid
-from db.redis import RedisHandler
-from pydantic import BaseModel
-from typing import List, Dict, Any
+import time
+import json
+from pydantic import BaseModel, ConfigDict, ValidationError
+from typing import List, Dict, Any, Optional
 
 router = APIRouter()
-sync_redis = RedisHandler()
+EVENT_BLOCK_MS = 5000
+CACHE_TTL = int(STT_CONFIG.get("cache", {}).get("ttl", 3600 * 24 * 7))
+MAX_RETRANSCRIBE_RANGE = float(
+    STT_CONFIG.get("retranscribe", {}).get("max_range", 600)
+)
 
 
-class UpdateTranscriptRequest(BaseModel):
-    task_id: str
-    segments: List[Dict[str, Any]]
+class TranscriptWord(BaseModel):
+    # 其余字段（如 probability）原样保存
+    model_config = ConfigDict(extra="allow")
 
+    word: str
+    start: float
+    end: float
 
-@router.post("/upload")
-async def file_upload(file: UploadFile = File(...)):
-    # 检查上传的文件类型
-    if not file.content_type.startswith(("audio/", "video/")):
-        raise HTTPException(status_code=400, detail="只能上传音频或视频文件。")
 
-    try:
-        current_time = datetime.now()
-        formatted_current_time = current_time.strftime("%Y-%m-%d_%H-%M-%S.%f")[:-3]
-        storage_dir = "storage"
-        os.makedirs(storage_dir, exist_ok=True)
+class TranscriptSegment(BaseModel):
+    model_config = ConfigDict(extra="allow")
 
-        temp_file_path = os.path.join(
-            storage_dir, f"{formatted_current_time}_{file.filename}"
-        )
-        with open(temp_file_path, "wb") as f:
-            f.write(await file.read())
-
-        file_id = str(uuid.uuid4())
-        file_info = {}
-        file_info["file_id"] = file_id
-        file_info["file_name"] = file.filename
-        file_info["file_path"] = temp_file_path
-        file_info["file_size"] = file.size
-        file_info["file_type"] = file.content_type
-
-        # 如果是视频文件，提取音频
-        if file.content_type.startswith("video/"):
-            video_clip = VideoFileClip(temp_file_path)
-            file_info["duration"] = video_clip.duration
-        elif file.content_type.startswith("audio/"):
-            audio_clip = AudioFileClip(temp_file_path)
-            file_info["duration"] = audio_clip.duration
-
-        sync_redis.add_file(file_id, file_info)
+    id: Optional[int] = None
+    start: float
+    end: float
+    words: List[TranscriptWord]
 
-        return JSONResponse(
-            content={
-                "code": 200,
-                "message": "文件上传成功",
-                "data": {"file_id": file_id},
-            }
-        )
-    except Exception as e:
-        logger.exception(e)
-        if os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
-        raise HTTPException(status_code=500, detail="文件上传失败")
+
+class UpdateTranscriptRequest(BaseModel):
+    task_id: str
+    # 逐个按 TranscriptSegment 校验，格式不对时返回 400
+    segments: List[Dict[str, Any]]
+    version: Optional[int] = None
+
+
+class SegmentOp(BaseModel):
+    op: str
+    segment_id: Optional[int] = None
+    segment_ids: Optional[List[int]] = None
+    words: Optional[List[Dict[str, Any]]] = None
+    word_index: Optional[int] = None
+    segments: Optional[List[Dict[str, Any]]] = None
+    after_segment_id: Optional[int] = None
+    before_segment_id: Optional[int] = None
+
+
+class PatchTranscriptRequest(BaseModel):
+    version: int
+    ops: List[SegmentOp]
+
+
+class RetranscribeRequest(BaseModel):
+    start: float
+    end: float
+    # 提交时转写稿的版本号，与当前版本不一致时返回 409
+    version: Optional[int] = None
+    model: Optional[str] = None
+    engine: Optional[str] = None
+    language: Optional[str] = None
+    initial_prompt: Optional[str] = None
+    word_timestamps: Optional[bool] = None
+    temperature: Optional[float] = None
+    vad: Optional[bool] = None
+
+
+def _version_conflict(current_version):
+    return JSONResponse(
+        status_code=409,
+        content={
+            "code": 409,
+            "message": "转写稿已被修改，请刷新后重试",
+            "data": {"version": current_version},
+        },
+    )
 
 
 @router.post("/stt")
-async def stt_task(file_id: str = Form(...)):
+async def stt_task(
+    request: Request,
+    file_id: str = Form(...),
+    user_id: str = Form(None),
+    model: str = Form(None),
+    engine: str = Form(None),
+    language: str = Form(None),
+    initial_prompt: str = Form(None),
+    word_timestamps: bool = Form(None),
+    temperature: float = Form(None),
+    vad: bool = Form(None),
+):
+    file_info = await async_redis.get_file(file_id)
+    if file_info is None:
+        raise HTTPException(status_code=404, detail="File not found")
     try:
         logger.info(f"开始处理文件：{file_id}")
-        task = process_file_celery.delay(file_id)
-        # 将任务ID添加到全局列表
-        sync_redis.add_task_to_global_list(task.id)
+        options = build_options(
+            model=model,
+            engine=engine,
+            language=language,
+            initial_prompt=initial_prompt,
+            word_timestamps=word_timestamps,
+            temperature=temperature,
+            vad=vad,
+        )
+
+        if file_info.get("file_hash"):
+            cached = await async_redis.get_cached_transcript(
+                cache_key(file_info["file_hash"], options), ttl=CACHE_TTL
+            )
+            if cached is not None:
+                # 相同内容、相同参数已转写过，直接生成完成状态的任务
+                task_id = str(uuid.uuid4())
+                task_info = {}
+                task_info["completion_time"] = datetime.now().isoformat()
+                task_info["file_id"] = file_id
+                task_info["file_type"] = file_info.get("file_type")
+                task_info["file_name"] = file_info["file_name"]
+                task_info["file_path"] = file_info["file_path"]
+                task_info["duration"] = cached["duration"]
+                task_info["status"] = "success"
+                task_info["process"] = "completed"
+                task_info["cost_time"] = 0
+                task_info["cached"] = True
+                task_info["text"] = cached["text"]
+                task_info["segments"] = cached["segments"]
+                task_info["state"] = "SUCCESS"
+                await async_redis.set_stt_task(task_id=task_id, task_info=task_info)
+                await async_redis.set_task_summary(
+                    task_id, build_task_summary(task_info)
+                )
+                await async_redis.update_search_index(task_id, cached["segments"])
+                logger.info(f"{file_id} 命中转写缓存，任务：{task_id}")
+                return JSONResponse(
+                    content={
+                        "code": 200,
+                        "message": "文件处理完成",
+                        "data": {"task_id": task_id, "cached": True},
+                    }
+                )
+
+        # 按时长选择队列；同一用户在队列中的任务数超过名额时先暂存，
+        # 等其前面的任务完成后由 worker 投递，避免批量上传占满队列
+        duration = file_info.get("duration")
+        job_class = size_class(duration)
+        task_id = str(uuid.uuid4())
+        job = {
+            "task_id": task_id,
+            "file_id": file_id,
+            "options": options,
+            "size_class": job_class,
+            "user": user_id or request.client.host,
+            "duration": duration,
+            "queued_at": time.time(),
+        }
+        admitted = await async_redis.admit_job(task_id, job, USER_SLOTS)
+        if admitted:
+            # 投递消息是同步的网络调用，放到线程池避免阻塞事件循环
+            await run_in_threadpool(
+                enqueue_transcription,
+                file_id,
+                options,
+                queue=queue_name(job_class),
+                task_id=task_id,
+            )
+        # 将任务写入任务索引，列表页按时间倒序分页读取
+        await async_redis.set_task_summary(
+            task_id,
+            {
+                "file_id": file_id,
+                "file_name": file_info.get("file_name"),
+                "file_type": file_info.get("file_type"),
+                "file_path": file_info.get("file_path"),
+                "duration": duration,
+                "state": "PENDING",
+            },
+        )
         return JSONResponse(
             content={
                 "code": 200,
                 "message": "文件正在后台处理",
-                "data": {"task_id": task.id},
+                "data": {
+                    "task_id": task_id,
+                    "queue": queue_name(job_class),
+                    "held": not admitted,
+                },
             }
         )
     except Exception as e:
@@ -90,34 +211,55 @@ async def stt_task(file_id: str = Form(...)):
         raise HTTPException(status_code=500, detail="文件处理失败")
 
 
+@router.get("/stt-cache/stats")
+async def get_stt_cache_stats():
+    stats = await async_redis.get_cache_stats()
+    if stats is None:
+        raise HTTPException(status_code=500, detail="获取缓存统计失败")
+    return JSONResponse(content={"code": 200, "message": "Success", "data": stats})
+
+
 @router.get("/stt-progress/{task_id}")
 async def get_stt_result(task_id: str):
     try:
-        task_info = sync_redis.get_stt_task(task_id)
+        task_info = await async_redis.get_stt_task(task_id)
         # logger.info(f"获取任务结果：{task_info}")
-        if task_info is None:
+        snapshot = None
+        if task_info is None or task_info.get("state") not in ("SUCCESS", "FAILURE"):
+            snapshot = await async_redis.get_queue_snapshot(task_id)
+        if task_info is None and snapshot is None:
             return JSONResponse(content={"code": 404, "message": "任务不存在"})
+        if task_info is None:
+            # 还在排队，worker 尚未写入任务信息
+            task_info = {"state": "PENDING"}
         if task_info["state"] == "SUCCESS":
+            file_info = None
+            if task_info.get("file_id"):
+                file_info = await async_redis.get_file(task_info["file_id"])
             return JSONResponse(
                 content={
                     "code": 200,
                     "message": "文件处理完成",
                     "data": {
                         "task_id": task_id,
+                        "file_id": task_info.get("file_id"),
                         "file_name": task_info["file_name"],
                         "file_path": task_info.get("file_path"),
                         "file_type": task_info.get("file_type"),
+                        "proxy_url": proxy_url(file_info),
                         "text": task_info["text"],
                         "segments": task_info["segments"],
+                        "version": task_info.get("version", 1),
                     },
                 }
             )
         elif task_info["state"] == "FAILURE":
+            cancelled = task_info.get("process") == "cancelled"
             return JSONResponse(
                 content={
                     "code": 110001,
-                    "message": "文件处理失败",
-                    "data": {"task_id": task_id},
+                    "message": "任务已取消" if cancelled else "文件处理失败",
+                    "data": {"task_id": task_id, "process": task_info.get("process")},
                 }
             )
         else:
@@ -125,7 +267,13 @@ async def get_stt_result(task_id: str):
                 content={
                     "code": 100001,
                     "message": "文件处理中",
-                    "data": {"task_id": task_id},
+                    "data": {
+                        "task_id": task_id,
+                        "state": task_info.get("state"),
+                        "queue": queue_status(snapshot, time.time())
+                        if snapshot
+                        else None,
+                    },
                 }
             )
     except Exception as e:
@@ -133,58 +281,317 @@ async def get_stt_result(task_id: str):
         raise HTTPException(status_code=500, detail="获取文件处理结果失败")
 
 
-@router.post("/stt-update")
-async def update_stt_task(request: UpdateTranscriptRequest):
+@router.get("/stt-segments/{task_id}")
+async def get_stt_segments(task_id: str, start: float = None, end: float = None):
+    """按时间范围获取片段，只解码涉及的存储块，适合长文件按需加载"""
+    try:
+        segments = await async_redis.get_stt_segments(task_id, start=start, end=end)
+        if segments is None:
+            return JSONResponse(content={"code": 404, "message": "任务不存在"})
+        return JSONResponse(
+            content={
+                "code": 200,
+                "message": "Success",
+                "data": {"task_id": task_id, "segments": segments},
+            }
+        )
+    except Exception as e:
+        logger.exception(e)
+        raise HTTPException(status_code=500, detail="获取片段失败")
+
+
+@router.get("/stt-partial/{task_id}")
+async def get_stt_partial(task_id: str, after: int = -1):
+    """获取转写过程中已完成的片段，after 为客户端已拿到的最后一个片段下标"""
     try:
-        task_info = sync_redis.get_stt_task(request.task_id)
+        task_info = await async_redis.get_stt_task_meta(task_id)
         if task_info is None:
-            raise HTTPException(status_code=404, detail="Task not found")
+            return JSONResponse(content={"code": 404, "message": "任务不存在"})
+
+        segments = await async_redis.get_partial_segments(task_id, after=after)
+        return JSONResponse(
+            content={
+                "code": 200,
+                "message": "Success",
+                "data": {
+                    "task_id": task_id,
+                    "state": task_info.get("state"),
+                    "segments": segments,
+                    "next_index": after + len(segments),
+                },
+            }
+        )
+    except Exception as e:
+        logger.exception(e)
+        raise HTTPException(status_code=500, detail="获取中间结果失败")
+
+
+def _format_sse(event_id, event):
+    data = json.dumps(event, ensure_ascii=False)
+    return f"id: {event_id}\nevent: progress\ndata: {data}\n\n"
+
+
+@router.get("/stt-events/{task_id}")
+async def stt_events(task_id: str, request: Request, last_event_id: str = None):
+    """以 SSE 推送任务进度，断线重连时根据 Last-Event-ID 从上次位置继续"""
+    last_id = request.headers.get("last-event-id") or last_event_id or "0-0"
+
+    async def event_stream():
+        nonlocal last_id
+        if last_id == "0-0":
+            events = await async_redis.read_task_events(task_id, last_id)
+            if not events:
+                # 事件流已过期或任务来自缓存命中，先推送一次当前状态
+                task_info = await async_redis.get_stt_task_meta(task_id)
+                if task_info is None:
+                    yield _format_sse(last_id, {"state": "NOT_FOUND"})
+                    return
+                state = task_info.get("state")
+                yield _format_sse(
+                    last_id,
+                    {
+                        "state": state,
+                        "process": task_info.get("process"),
+                        "percent": 100 if state in ("SUCCESS", "FAILURE") else 0,
+                    },
+                )
+                if state in ("SUCCESS", "FAILURE"):
+                    return
 
-        task_info["segments"] = request.segments
+        while not await request.is_disconnected():
+            events = await async_redis.read_task_events(
+                task_id, last_id, EVENT_BLOCK_MS
+            )
+            if not events:
+                yield ": keep-alive\n\n"
+                continue
+            for event_id, event in events:
+                last_id = event_id
+                yield _format_sse(event_id, event)
+                if event.get("state") in ("SUCCESS", "FAILURE"):
+                    return
 
-        for segment in task_info["segments"]:
-            segment["text"] = "".join(
-                [word["word"] for word in segment["words"]]
-            ).strip()
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-        task_info["text"] = "\n\n".join([s["text"] for s in task_info["segments"]])
 
-        sync_redis.set_stt_task(request.task_id, task_info)
+@router.post("/stt-update")
+async def update_stt_task(request: UpdateTranscriptRequest):
+    """整体替换转写片段；提交 version 时做版本校验，局部修改请使用 PATCH 接口"""
+    try:
+        segments = [
+            TranscriptSegment(**segment).dict(exclude_none=True)
+            for segment in request.segments
+        ]
+    except ValidationError as e:
+        error = e.errors()[0]
+        field = ".".join(str(part) for part in error["loc"])
+        raise HTTPException(
+            status_code=400, detail=f"Invalid segment field {field}: {error['msg']}"
+        )
+    for segment in segments:
+        segment["text"] = segment_text(segment["words"])
+    try:
+        version = await async_redis.replace_stt_segments(
+            request.task_id, segments, request.version
+        )
+    except VersionConflict as e:
+        return _version_conflict(e.current_version)
+    except Exception as e:
+        logger.exception(e)
+        raise HTTPException(status_code=500, detail="Failed to update transcript")
 
-        return JSONResponse(
-            content={"code": 200, "message": "Transcript updated successfully"}
+    if version is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    await async_redis.update_search_index(request.task_id, segments)
+    return JSONResponse(
+        content={
+            "code": 200,
+            "message": "Transcript updated successfully",
+            "data": {"version": version},
+        }
+    )
+
+
+@router.patch("/stt-task/{task_id}/segments")
+async def patch_stt_segments(task_id: str, request: PatchTranscriptRequest):
+    """按片段ID增量编辑转写稿，只重写涉及的存储块
+
+    version 为客户端编辑所基于的版本号，与当前版本不一致时返回 409。
+    """
+    ops = [op.dict(exclude_none=True) for op in request.ops]
+    try:
+        result = await async_redis.patch_stt_segments(
+            task_id, ops, request.version
         )
+    except VersionConflict as e:
+        return _version_conflict(e.current_version)
+    except PatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.exception(e)
         raise HTTPException(status_code=500, detail="Failed to update transcript")
 
+    if result is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    await async_redis.update_search_index(
+        task_id, result["segments"], removed=result["removed"]
+    )
+    return JSONResponse(
+        content={
+            "code": 200,
+            "message": "Transcript updated successfully",
+            "data": result,
+        }
+    )
+
+
+@router.post("/stt-task/{task_id}/cancel")
+async def cancel_stt_task(task_id: str):
+    """取消排队或处理中的任务
+
+    未开始处理的任务立即释放名额并标记为已取消；处理中的任务由 worker
+    在当前窗口完成后停止，状态变为 FAILURE、process 为 cancelled。
+    """
+    meta = await async_redis.get_stt_task_meta(task_id)
+    summary_state = None
+    if meta is None:
+        # 暂存或排队中的任务还没有写入任务信息，只有摘要
+        states = await async_redis.get_summary_field([task_id], "state")
+        summary_state = states[task_id]
+        if summary_state is None:
+            raise HTTPException(status_code=404, detail="Task not found")
+    state = meta.get("state") if meta else summary_state
+    if state in ("SUCCESS", "FAILURE"):
+        raise HTTPException(status_code=409, detail="Task already finished")
 
-@router.get("/stt-tasks")
-async def get_all_stt_tasks():
     try:
-        task_ids = sync_redis.get_all_task_ids_from_global_list()
-        valid_tasks = []
-        for task_id in task_ids:
-            task_info = sync_redis.get_stt_task(task_id)
+        running, next_job = await async_redis.cancel_job(task_id)
+        if next_job is not None:
+            await run_in_threadpool(
+                enqueue_transcription,
+                next_job["file_id"],
+                next_job["options"],
+                queue=queue_name(next_job["size_class"]),
+                task_id=next_job["task_id"],
+            )
+        if not running:
+            file_id = meta.get("file_id") if meta else None
+            await async_redis.set_stt_task(
+                task_id,
+                {"file_id": file_id, "state": "FAILURE", "process": "cancelled"},
+            )
+            await async_redis.set_task_summary(task_id, {"state": "FAILURE"})
+            await async_redis.publish_task_event(
+                task_id, {"state": "FAILURE", "process": "cancelled", "percent": 100}
+            )
+    except Exception as e:
+        logger.exception(e)
+        raise HTTPException(status_code=500, detail="Failed to cancel task")
+
+    return JSONResponse(
+        content={
+            "code": 200,
+            "message": "Task cancelled" if not running else "Task is stopping",
+            "data": {"task_id": task_id, "stopping": running},
+        }
+    )
+
+
+@router.post("/stt-task/{task_id}/retranscribe")
+async def retranscribe_stt_range(task_id: str, request: RetranscribeRequest):
+    """用指定的模型和提示重新转写 [start, end]（秒），结果替换该范围内的片段
+
+    只解码该范围的音频，范围外的片段（包括人工编辑）保持不变。重新转写在后台执行，
+    进度和结果通过 /api/stt-task/{task_id}/retranscribe/{job_id} 查询。
+    """
+    if not 0 <= request.start < request.end:
+        raise HTTPException(status_code=400, detail="Invalid time range")
+    if request.end - request.start > MAX_RETRANSCRIBE_RANGE:
+        raise HTTPException(status_code=400, detail="Time range too long")
+
+    meta = await async_redis.get_stt_task_meta(task_id)
+    if meta is None or meta.get("state") != "SUCCESS":
+        raise HTTPException(status_code=404, detail="Task not found")
+    if not meta.get("file_path") or not os.path.exists(meta["file_path"]):
+        raise HTTPException(status_code=404, detail="Media file not found")
+    version = meta.get("version", 1)
+    if request.version is not None and request.version != version:
+        return _version_conflict(version)
+
+    options = build_options(
+        model=request.model,
+        engine=request.engine,
+        language=request.language,
+        initial_prompt=request.initial_prompt,
+        word_timestamps=request.word_timestamps,
+        temperature=request.temperature,
+        vad=request.vad,
+    )
+    job_id = str(uuid.uuid4())
+    job_info = {
+        "job_id": job_id,
+        "task_id": task_id,
+        "start": request.start,
+        "end": request.end,
+        "options": options,
+        "state": "PENDING",
+        "process": "queued",
+        "created_at": datetime.now().isoformat(),
+    }
+    try:
+        await async_redis.set_range_job(job_id, job_info)
+        await run_in_threadpool(
+            enqueue_retranscription,
+            job_id,
+            task_id,
+            request.start,
+            request.end,
+            options,
+            queue=queue_name(size_class(request.end - request.start)),
+        )
+    except Exception as e:
+        logger.exception(e)
+        raise HTTPException(status_code=500, detail="Failed to start re-transcription")
+    return JSONResponse(
+        content={"code": 200, "message": "Success", "data": {"job_id": job_id}}
+    )
 
-            if not task_info:
-                continue
 
-            if task_info.get("state") != "SUCCESS":
-                continue
+@router.get("/stt-task/{task_id}/retranscribe/{job_id}")
+async def get_retranscribe_job(task_id: str, job_id: str):
+    """重新转写的进度；完成后 result 中为新版本号、新片段和被替换的片段ID"""
+    job_info = await async_redis.get_range_job(job_id)
+    if job_info is None or job_info.get("task_id") != task_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JSONResponse(content={"code": 200, "message": "Success", "data": job_info})
 
-            file_path = task_info.get("file_path")
-            if not file_path or not os.path.exists(file_path):
-                continue
 
-            if not all(k in task_info for k in ["file_name", "duration", "segments"]):
-                continue
+@router.get("/stt-tasks")
+async def get_all_stt_tasks(
+    state: str = "SUCCESS", cursor: str = None, limit: int = 20
+):
+    """分页获取任务摘要列表，完整转写结果需通过 /stt-progress/{task_id} 获取
 
-            task_info["task_id"] = task_id
-            valid_tasks.append(task_info)
+    state 为空字符串时返回所有状态的任务。
+    """
+    if state and state not in keys.TASK_STATES:
+        raise HTTPException(status_code=400, detail=f"Unknown task state: {state}")
+    limit = max(1, min(limit, 100))
 
+    try:
+        tasks, next_cursor = await async_redis.list_task_summaries(
+            state=state or None, cursor=cursor, limit=limit
+        )
         return JSONResponse(
-            content={"code": 200, "message": "Success", "data": valid_tasks}
+            content={
+                "code": 200,
+                "message": "Success",
+                "data": {"items": tasks, "next_cursor": next_cursor},
+            }
         )
 
     except Exception as e:
@@ -195,7 +602,7 @@ async def get_all_stt_tasks():
 @router.delete("/stt-task/{task_id}")
 async def delete_stt_task(task_id: str):
     try:
-        task_info = sync_redis.get_stt_task(task_id)
+        task_info = await async_redis.get_stt_task_meta(task_id)
         if not task_info:
             raise HTTPException(status_code=404, detail="Task not found")
 
@@ -208,20 +615,32 @@ async def delete_stt_task(task_id: str):
                 logger.error(f"Error deleting SRT file {srt_path}: {srt_del_error}")
 
         file_path = task_info.get("file_path")
-        if file_path and os.path.exists(file_path):
+        # 批量导入的本地文件不在 storage 中，删除任务时保留原文件
+        managed = file_path and os.path.realpath(file_path).startswith(
+            os.path.realpath(STORAGE_DIR) + os.sep
+        )
+        if managed and os.path.exists(file_path):
             try:
                 os.remove(file_path)
                 logger.info(f"Deleted media file: {file_path}")
             except Exception as file_del_error:
                 logger.error(f"Error deleting file {file_path}: {file_del_error}")
 
-        sync_redis.delete_stt_task(task_id)
+        await async_redis.delete_stt_task(task_id)
+        await async_redis.delete_search_index(task_id)
+        await delete_task_clips(task_id)
 
         file_id = task_info.get("file_id")
         if file_id:
-            sync_redis.delete_file(file_id)
-
-        sync_redis.remove_task_from_global_list(task_id)
+            file_info = await async_redis.get_file(file_id)
+            proxy_path = file_info.get("proxy_path") if file_info else None
+            if proxy_path and os.path.exists(proxy_path):
+                await run_in_threadpool(os.remove, proxy_path)
+            await async_redis.delete_file(file_id)
+            await async_redis.delete_peaks(file_id)
+
+        await async_redis.delete_task_summary(task_id)
+        await async_redis.remove_task_from_global_list(task_id)
 
         logger.info(f"Successfully deleted task {task_id} and associated data.")
         return JSONResponse(
@@ -0,0 +1,337 @@
+import hashlib
+import os
+import subprocess
+import time
+import uuid
+from datetime import datetime
+
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi.responses import JSONResponse
+from loguru import logger
+from starlette.concurrency import run_in_threadpool
+
+from config.config_loader import UPLOAD_CONFIG
+from db.async_redis import async_redis
+from utils.media import probe_media
+
+router = APIRouter()
+
+STORAGE_DIR = "storage"
+PARTIAL_DIR = os.path.join(STORAGE_DIR, ".partial")
+CHUNK_SIZE = int(UPLOAD_CONFIG.get("chunk_size", 4 * 1024 * 1024))
+SESSION_TTL = int(UPLOAD_CONFIG.get("session_ttl", 3600 * 24))
+# 计算文件指纹的块大小，与分片大小无关；修改后同一文件的指纹会变化，转写缓存随之失效
+HASH_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def _check_content_type(content_type):
+    if not content_type or not content_type.startswith(("audio/", "video/")):
+        raise HTTPException(status_code=400, detail="只能上传音频或视频文件。")
+
+
+def _storage_path(file_name):
+    formatted_current_time = datetime.now().strftime("%Y-%m-%d_%H-%M-%S.%f")[:-3]
+    return os.path.join(
+        STORAGE_DIR, f"{formatted_current_time}_{os.path.basename(file_name)}"
+    )
+
+
+class BlockHasher:
+    """文件指纹：按 HASH_BLOCK_SIZE 分块计算 sha256，再对各块摘要依次拼接后计算 sha256
+
+    已完成块的摘要保存在上传会话中，续传时只需读回最后一个不完整的块，
+    完成上传时也不必重新读取整个文件。
+    """
+
+    def __init__(self, digests=()):
+        self.digests = list(digests)
+        self._block = hashlib.sha256()
+        self._filled = 0
+
+    def update(self, data):
+        view = memoryview(data)
+        while len(view):
+            take = min(HASH_BLOCK_SIZE - self._filled, len(view))
+            self._block.update(view[:take])
+            self._filled += take
+            view = view[take:]
+            if self._filled == HASH_BLOCK_SIZE:
+                self.digests.append(self._block.hexdigest())
+                self._block = hashlib.sha256()
+                self._filled = 0
+
+    def hexdigest(self):
+        digests = self.digests
+        if self._filled:
+            digests = digests + [self._block.hexdigest()]
+        return hashlib.sha256(b"".join(bytes.fromhex(d) for d in digests)).hexdigest()
+
+
+def _resume_hasher(partial_path, digests, offset):
+    """由会话中保存的块摘要恢复 offset 处的指纹计算状态
+
+    offset 之前的完整块直接沿用已保存的摘要，其余数据（通常只是最后一个不完整的块）
+    从磁盘读回；分片写入中途断开时，会话里的摘要可能少于磁盘上的数据，同样从磁盘补齐。
+    """
+    block_no = min(len(digests), offset // HASH_BLOCK_SIZE)
+    hasher = BlockHasher(digests[:block_no])
+    position = block_no * HASH_BLOCK_SIZE
+    with open(partial_path, "rb") as f:
+        f.seek(position)
+        while position < offset:
+            data = f.read(min(HASH_BLOCK_SIZE, offset - position))
+            if not data:
+                break
+            hasher.update(data)
+            position += len(data)
+    return hasher
+
+
+def _write_chunk(f, hasher, chunk):
+    # hashlib 在大块数据上会释放 GIL，与写盘一起放到线程池执行
+    if hasher is not None:
+        hasher.update(chunk)
+    f.write(chunk)
+
+
+async def _stream_to_file(file: UploadFile, f, hasher=None):
+    """按固定大小分片把上传内容写入已打开的文件，返回写入的字节数"""
+    written = 0
+    while True:
+        chunk = await file.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        await run_in_threadpool(_write_chunk, f, hasher, chunk)
+        written += len(chunk)
+    return written
+
+
+def _touch(file_path):
+    with open(file_path, "wb"):
+        pass
+
+
+async def _register_file(file_path, file_name, file_size, file_type, file_hash):
+    file_id = str(uuid.uuid4())
+    file_info = {}
+    file_info["file_id"] = file_id
+    file_info["file_name"] = file_name
+    file_info["file_path"] = file_path
+    file_info["file_size"] = file_size
+    file_info["file_type"] = file_type
+    file_info["file_hash"] = file_hash
+
+    # ffprobe 是阻塞调用，放到线程池中避免卡住事件循环
+    T0 = time.perf_counter()
+    media_info = await run_in_threadpool(probe_media, file_path)
+    await async_redis.observe_metrics(
+        [
+            (
+                "cutai_stage_duration_seconds",
+                {"stage": "upload_probe"},
+                time.perf_counter() - T0,
+            )
+        ]
+    )
+    file_info["duration"] = media_info["duration"]
+
+    await async_redis.add_file(file_id, file_info)
+    return file_id
+
+
+@router.post("/upload")
+async def file_upload(file: UploadFile = File(...)):
+    # 检查上传的文件类型
+    _check_content_type(file.content_type)
+
+    os.makedirs(STORAGE_DIR, exist_ok=True)
+    temp_file_path = _storage_path(file.filename)
+    try:
+        hasher = BlockHasher()
+        f = await run_in_threadpool(open, temp_file_path, "wb")
+        try:
+            file_size = await _stream_to_file(file, f, hasher)
+        finally:
+            await run_in_threadpool(f.close)
+
+        file_id = await _register_file(
+            temp_file_path,
+            file.filename,
+            file_size,
+            file.content_type,
+            hasher.hexdigest(),
+        )
+
+        return JSONResponse(
+            content={
+                "code": 200,
+                "message": "文件上传成功",
+                "data": {"file_id": file_id},
+            }
+        )
+    except Exception as e:
+        logger.exception(e)
+        if os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+        raise HTTPException(status_code=500, detail="文件上传失败")
+
+
+@router.post("/upload/init")
+async def upload_init(
+    file_name: str = Form(...),
+    file_type: str = Form(...),
+    file_size: int = Form(None),
+):
+    _check_content_type(file_type)
+
+    try:
+        os.makedirs(PARTIAL_DIR, exist_ok=True)
+        upload_id = str(uuid.uuid4())
+        partial_path = os.path.join(PARTIAL_DIR, upload_id)
+        await run_in_threadpool(_touch, partial_path)
+
+        upload_info = {
+            "upload_id": upload_id,
+            "file_name": file_name,
+            "file_type": file_type,
+            "file_size": file_size,
+            "partial_path": partial_path,
+            "created_at": datetime.now().isoformat(),
+        }
+        await async_redis.set_upload(upload_id, upload_info, ttl=SESSION_TTL)
+
+        return JSONResponse(
+            content={
+                "code": 200,
+                "message": "上传会话已创建",
+                "data": {"upload_id": upload_id, "chunk_size": CHUNK_SIZE},
+            }
+        )
+    except Exception as e:
+        logger.exception(e)
+        raise HTTPException(status_code=500, detail="创建上传会话失败")
+
+
+async def _get_upload_or_404(upload_id):
+    upload_info = await async_redis.get_upload(upload_id)
+    if upload_info is None or not os.path.exists(upload_info["partial_path"]):
+        raise HTTPException(status_code=404, detail="上传会话不存在或已过期")
+    return upload_info
+
+
+@router.get("/upload/{upload_id}")
+async def upload_status(upload_id: str):
+    upload_info = await _get_upload_or_404(upload_id)
+    # 以磁盘上实际写入的大小为准，断线后客户端从这里继续发送
+    offset = await run_in_threadpool(os.path.getsize, upload_info["partial_path"])
+    return JSONResponse(
+        content={
+            "code": 200,
+            "message": "Success",
+            "data": {
+                "upload_id": upload_id,
+                "offset": offset,
+                "file_size": upload_info.get("file_size"),
+            },
+        }
+    )
+
+
+def _open_at_offset(partial_path, offset):
+    f = open(partial_path, "r+b")
+    f.seek(offset)
+    f.truncate()
+    return f
+
+
+@router.put("/upload/{upload_id}")
+async def upload_chunk(
+    upload_id: str,
+    offset: int = Form(...),
+    chunk: UploadFile = File(...),
+):
+    upload_info = await _get_upload_or_404(upload_id)
+    partial_path = upload_info["partial_path"]
+
+    current_size = await run_in_threadpool(os.path.getsize, partial_path)
+    if offset < 0 or offset > current_size:
+        raise HTTPException(
+            status_code=409, detail=f"分片偏移不连续，当前已接收 {current_size} 字节"
+        )
+
+    try:
+        hasher = await run_in_threadpool(
+            _resume_hasher, partial_path, upload_info.get("block_digests", []), offset
+        )
+        # offset 小于已接收大小时视为客户端重传，截断后覆盖写入
+        f = await run_in_threadpool(_open_at_offset, partial_path, offset)
+        try:
+            written = await _stream_to_file(chunk, f, hasher)
+        finally:
+            await run_in_threadpool(f.close)
+
+        upload_info["block_digests"] = hasher.digests
+        await async_redis.set_upload(upload_id, upload_info, ttl=SESSION_TTL)
+        return JSONResponse(
+            content={
+                "code": 200,
+                "message": "分片上传成功",
+                "data": {"upload_id": upload_id, "offset": offset + written},
+            }
+        )
+    except Exception as e:
+        logger.exception(e)
+        raise HTTPException(status_code=500, detail="分片上传失败")
+
+
+@router.post("/upload/{upload_id}/complete")
+async def upload_complete(upload_id: str):
+    upload_info = await _get_upload_or_404(upload_id)
+    partial_path = upload_info["partial_path"]
+
+    file_size = await run_in_threadpool(os.path.getsize, partial_path)
+    expected_size = upload_info.get("file_size")
+    if expected_size is not None and file_size != expected_size:
+        raise HTTPException(
+            status_code=409,
+            detail=f"文件尚未上传完整：{file_size}/{expected_size} 字节",
+        )
+
+    file_path = _storage_path(upload_info["file_name"])
+    try:
+        # 只需读回最后一个不完整的块
+        digests = upload_info.get("block_digests", [])
+        hasher = await run_in_threadpool(
+            _resume_hasher, partial_path, digests, file_size
+        )
+        await run_in_threadpool(os.replace, partial_path, file_path)
+
+        file_id = await _register_file(
+            file_path,
+            upload_info["file_name"],
+            file_size,
+            upload_info["file_type"],
+            hasher.hexdigest(),
+        )
+        await async_redis.delete_upload(upload_id)
+
+        return JSONResponse(
+            content={
+                "code": 200,
+                "message": "文件上传成功",
+                "data": {"file_id": file_id},
+            }
+        )
+    except subprocess.CalledProcessError as e:
+        # ffprobe 无法识别文件内容，重试也不会成功，清理上传的数据
+        logger.exception(e)
+        if os.path.exists(file_path):
+            await run_in_threadpool(os.remove, file_path)
+        await async_redis.delete_upload(upload_id)
+        raise HTTPException(status_code=500, detail="文件上传失败")
+    except Exception as e:
+        # 其他失败（如 Redis 暂时不可用）保留会话和已接收的数据，客户端可以重试 complete
+        logger.exception(e)
+        if os.path.exists(file_path):
+            await run_in_threadpool(os.replace, file_path, partial_path)
+        raise HTTPException(status_code=500, detail="文件上传失败")
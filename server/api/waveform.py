@@ -0,0 +1,71 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse, Response
+
+from db.async_redis import async_redis
+
+router = APIRouter()
+
+DEFAULT_WIDTH = 2000
+
+
+def _pick_level(levels, span_samples, width):
+    """选择范围内峰值数不少于 width 的最粗一级，都不够时用最精细的第 0 级"""
+    for index in range(len(levels) - 1, -1, -1):
+        if span_samples / levels[index]["samples_per_peak"] >= width:
+            return index
+    return 0
+
+
+@router.get("/waveform/{file_id}")
+async def get_waveform_meta(file_id: str):
+    """波形峰值的采样率、时长和各级信息，由 worker 在解码音频时生成"""
+    meta = await async_redis.get_peaks_meta(file_id)
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Waveform not found")
+    return JSONResponse(content={"code": 200, "message": "Success", "data": meta})
+
+
+@router.get("/waveform/{file_id}/peaks")
+async def get_waveform_peaks(
+    file_id: str,
+    level: int = None,
+    start: float = 0,
+    end: float = None,
+    width: int = DEFAULT_WIDTH,
+):
+    """返回时间范围 [start, end]（秒）内的峰值，int8 的 min, max 交替排列
+
+    不指定 level 时按 width（期望的峰值个数，通常为绘制宽度的像素数）选择级别。
+    实际使用的级别和起始位置在响应头中返回。
+    """
+    meta = await async_redis.get_peaks_meta(file_id)
+    if meta is None or not meta["levels"]:
+        raise HTTPException(status_code=404, detail="Waveform not found")
+    levels = meta["levels"]
+    if level is not None and not 0 <= level < len(levels):
+        raise HTTPException(status_code=400, detail=f"Unknown level: {level}")
+
+    sample_rate = meta["sample_rate"]
+    end = meta["duration"] if end is None else min(end, meta["duration"])
+    start = max(0.0, start)
+    if level is None:
+        level = _pick_level(levels, max(end - start, 0) * sample_rate, width)
+
+    samples_per_peak = levels[level]["samples_per_peak"]
+    first = int(start * sample_rate // samples_per_peak)
+    last = min(levels[level]["length"], -int(-end * sample_rate // samples_per_peak))
+    data = await async_redis.get_peaks(file_id, level, first, last)
+    if data is None:
+        raise HTTPException(status_code=500, detail="Failed to read waveform")
+    return Response(
+        content=data,
+        media_type="application/octet-stream",
+        headers={
+            "X-Peaks-Level": str(level),
+            "X-Samples-Per-Peak": str(samples_per_peak),
+            "X-Sample-Rate": str(sample_rate),
+            "X-Start-Index": str(first),
+            # 峰值随文件生成后不再变化
+            "Cache-Control": "public, max-age=86400",
+        },
+    )
@@ -0,0 +1,476 @@
+# 端到端基准：离线运行上传、转写、任务列表和进度轮询，结果输出为 JSON 便于跨提交对比。
+#
+# 默认使用 fakeredis 提供的本地 Redis 服务（pip install fakeredis），也可用 --redis-url
+# 指向一个空的 Redis；转写由进程内的 Celery worker 消费。测试音频用 NumPy 合成，
+# 安装了 ffmpeg 时额外生成带视频轨的 mp4。上传和转写依赖 ffprobe / ffmpeg。
+# 在 server 目录下运行：
+#   python -m bench.e2e --lengths 30,300 --model tiny --output bench-e2e.json
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import wave
+from datetime import datetime
+from urllib.parse import urlparse
+
+import numpy as np
+
+BENCHMARKS = ("upload", "e2e", "listing", "progress")
+SAMPLE_RATE = 16000
+
+
+def start_local_redis():
+    """在后台线程启动 fakeredis 的 TCP 服务，返回 (服务, 端口)"""
+    try:
+        from fakeredis import TcpFakeServer
+    except ImportError:
+        sys.exit("fakeredis is not installed; install it or pass --redis-url")
+    server = TcpFakeServer(("127.0.0.1", 0), server_type="redis")
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.server_address[1]
+
+
+def synth_speech(seconds, seed):
+    """合成类似语音的信号：2-4 秒的调幅谐波段落之间插入 0.3-1 秒静音"""
+    rng = np.random.default_rng(seed)
+    total = int(seconds * SAMPLE_RATE)
+    audio = np.zeros(total, dtype=np.float32)
+    pos = 0
+    while pos < total:
+        length = min(int(rng.uniform(2, 4) * SAMPLE_RATE), total - pos)
+        t = np.arange(length) / SAMPLE_RATE
+        f0 = rng.uniform(100, 250)
+        voiced = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 6))
+        envelope = 0.5 + 0.5 * np.sin(2 * np.pi * rng.uniform(3, 6) * t)
+        noise = rng.normal(0, 0.05, length)
+        audio[pos : pos + length] = 0.2 * (voiced * envelope + noise)
+        pos += length + int(rng.uniform(0.3, 1.0) * SAMPLE_RATE)
+    return audio
+
+
+def write_wav(path, audio):
+    samples = (np.clip(audio, -1, 1) * 32767).astype(np.int16)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(samples.tobytes())
+
+
+def make_fixtures(directory, lengths, video):
+    """按给定时长生成测试文件，每个文件内容不同，避免命中转写缓存"""
+    fixtures = []
+    for i, seconds in enumerate(lengths):
+        wav_path = os.path.join(directory, f"speech_{int(seconds)}s.wav")
+        write_wav(wav_path, synth_speech(seconds, seed=i))
+        fixtures.append(
+            {"path": wav_path, "content_type": "audio/wav", "seconds": seconds}
+        )
+        if video:
+            mp4_path = os.path.join(directory, f"speech_{int(seconds)}s.mp4")
+            subprocess.run(
+                [
+                    "ffmpeg", "-v", "error", "-y",
+                    "-f", "lavfi", "-i", f"testsrc=size=640x360:rate=25:d={seconds}",
+                    "-i", wav_path,
+                    "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac",
+                    "-shortest", mp4_path,
+                ],
+                check=True,
+            )
+            fixtures.append(
+                {"path": mp4_path, "content_type": "video/mp4", "seconds": seconds}
+            )
+    return fixtures
+
+
+def summarize(samples):
+    """耗时样本的统计，单位为毫秒"""
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+    return {
+        "runs": len(ordered),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "p50_ms": round(percentile(0.5) * 1000, 3),
+        "p95_ms": round(percentile(0.95) * 1000, 3),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+    }
+
+
+async def timed(client, method, url, **kwargs):
+    T0 = time.perf_counter()
+    response = await client.request(method, url, **kwargs)
+    elapsed = time.perf_counter() - T0
+    response.raise_for_status()
+    return response, elapsed
+
+
+async def upload(client, fixture):
+    with open(fixture["path"], "rb") as f:
+        content = f.read()
+    files = {
+        "file": (os.path.basename(fixture["path"]), content, fixture["content_type"])
+    }
+    response, elapsed = await timed(client, "POST", "/api/upload", files=files)
+    return response.json()["data"]["file_id"], len(content), elapsed
+
+
+async def bench_upload(client, fixtures, runs, created):
+    results = []
+    for fixture in fixtures:
+        samples = []
+        size = 0
+        for _ in range(runs):
+            file_id, size, elapsed = await upload(client, fixture)
+            created["files"].append(file_id)
+            samples.append(elapsed)
+        results.append(
+            {
+                "fixture": os.path.basename(fixture["path"]),
+                "bytes": size,
+                "latency": summarize(samples),
+                "throughput_mb_s": round(size / min(samples) / 1024 / 1024, 2),
+            }
+        )
+    return results
+
+
+async def bench_e2e(client, fixtures, model, timeout, poll_interval, created):
+    """上传后提交转写并轮询进度，直到任务完成，与前端的使用方式一致"""
+    results = []
+    for fixture in fixtures:
+        file_id, _, _ = await upload(client, fixture)
+        created["files"].append(file_id)
+        T0 = time.perf_counter()
+        response, _ = await timed(
+            client, "POST", "/api/stt", data={"file_id": file_id, "model": model}
+        )
+        task_id = response.json()["data"]["task_id"]
+        created["tasks"].append(task_id)
+        polls = 0
+        while True:
+            response, _ = await timed(client, "GET", f"/api/stt-progress/{task_id}")
+            polls += 1
+            body = response.json()
+            if body["code"] != 100001 or time.perf_counter() - T0 > timeout:
+                break
+            await asyncio.sleep(poll_interval)
+        elapsed = time.perf_counter() - T0
+        entry = {
+            "fixture": os.path.basename(fixture["path"]),
+            "audio_seconds": fixture["seconds"],
+            "elapsed_seconds": round(elapsed, 3),
+            "seconds_per_audio_minute": round(elapsed / fixture["seconds"] * 60, 3),
+            "polls": polls,
+            "status": {200: "success", 110001: "failure"}.get(body["code"], "timeout"),
+        }
+        if body["code"] == 200:
+            entry["segments"] = len(body["data"]["segments"])
+        results.append(entry)
+    return results
+
+
+def fake_segments(count):
+    return [
+        {
+            "id": i,
+            "start": i * 3.0,
+            "end": i * 3.0 + 2.5,
+            "text": f"第 {i} 句合成文本，用于测量读取和序列化的开销。",
+        }
+        for i in range(count)
+    ]
+
+
+async def seed_tasks(async_redis, count, start, created):
+    """写入 count 个已完成任务的摘要，列表接口只读取摘要和索引"""
+    now = time.time()
+    for i in range(start, start + count):
+        task_id = f"bench-{uuid.uuid4()}"
+        created["tasks"].append(task_id)
+        await async_redis.set_task_summary(
+            task_id,
+            {
+                "file_id": f"bench-file-{i}",
+                "file_name": f"bench_{i}.wav",
+                "file_type": "audio/wav",
+                "duration": 60,
+                "completion_time": datetime.now().isoformat(),
+                "state": "SUCCESS",
+            },
+            score=now - i,
+        )
+
+
+async def bench_listing(client, async_redis, task_counts, runs, created):
+    results = []
+    seeded = 0
+    for count in sorted(task_counts):
+        await seed_tasks(async_redis, count - seeded, seeded, created)
+        seeded = count
+        first_page, deep_page = [], []
+        cursor = None
+        for _ in range(runs):
+            response, elapsed = await timed(
+                client, "GET", "/api/stt-tasks", params={"limit": 20}
+            )
+            first_page.append(elapsed)
+            cursor = response.json()["data"]["next_cursor"] or cursor
+        # 沿游标继续翻页，确认翻页成本不随页数增长
+        for _ in range(runs):
+            if not cursor:
+                break
+            response, elapsed = await timed(
+                client, "GET", "/api/stt-tasks", params={"limit": 20, "cursor": cursor}
+            )
+            deep_page.append(elapsed)
+            cursor = response.json()["data"]["next_cursor"]
+        results.append(
+            {
+                "tasks": count,
+                "first_page": summarize(first_page),
+                "next_pages": summarize(deep_page),
+            }
+        )
+    return results
+
+
+async def bench_progress(client, async_redis, segment_counts, runs, created):
+    """完成任务按片段数测量结果读取；排队任务测量排队位置和预计时间的计算"""
+    results = []
+    for count in segment_counts:
+        task_id = f"bench-{uuid.uuid4()}"
+        created["tasks"].append(task_id)
+        segments = fake_segments(count)
+        await async_redis.set_stt_task(
+            task_id,
+            {
+                "state": "SUCCESS",
+                "file_name": "bench.wav",
+                "segments": segments,
+                "text": "\n\n".join(s["text"] for s in segments),
+            },
+        )
+        samples = []
+        size = 0
+        for _ in range(runs):
+            response, elapsed = await timed(
+                client, "GET", f"/api/stt-progress/{task_id}"
+            )
+            samples.append(elapsed)
+            size = len(response.content)
+        results.append(
+            {
+                "state": "SUCCESS",
+                "segments": count,
+                "response_bytes": size,
+                "latency": summarize(samples),
+            }
+        )
+
+    from utils.scheduling import USER_SLOTS, size_class
+
+    task_id = f"bench-{uuid.uuid4()}"
+    created["tasks"].append(task_id)
+    job = {
+        "task_id": task_id,
+        "file_id": "bench-file",
+        "options": {},
+        "size_class": size_class(60),
+        "user": "bench",
+        "duration": 60,
+        "queued_at": time.time(),
+    }
+    await async_redis.admit_job(task_id, job, USER_SLOTS)
+    created["jobs"].append(job)
+    samples = []
+    for _ in range(runs):
+        response, elapsed = await timed(client, "GET", f"/api/stt-progress/{task_id}")
+        samples.append(elapsed)
+    results.append(
+        {
+            "state": "PENDING",
+            "response_bytes": len(response.content),
+            "latency": summarize(samples),
+        }
+    )
+    return results
+
+
+async def cleanup(async_redis, created):
+    """删除基准写入的任务、文件和排队信息，使用已有 Redis 时不留下痕迹"""
+    from db import keys
+
+    for task_id in created["tasks"]:
+        await async_redis.delete_stt_task(task_id)
+        await async_redis.delete_task_summary(task_id)
+        await async_redis.remove_task_from_global_list(task_id)
+    for job in created["jobs"]:
+        inflight_key, held_key = keys.user_slot_keys(job["size_class"], job["user"])
+        await async_redis.redis_client.zrem(
+            keys.QUEUEKEY_PREFIX + job["size_class"], job["task_id"]
+        )
+        await async_redis.redis_client.delete(
+            keys.JOBKEY_PREFIX + job["task_id"], inflight_key, held_key
+        )
+    for file_id in created["files"]:
+        file_info = await async_redis.get_file(file_id)
+        if file_info and os.path.exists(file_info["file_path"]):
+            os.remove(file_info["file_path"])
+            srt_path = os.path.join(
+                "result", os.path.basename(file_info["file_path"]) + ".srt"
+            )
+            if os.path.exists(srt_path):
+                os.remove(srt_path)
+        await async_redis.delete_file(file_id)
+
+
+async def run(args, fixtures):
+    import httpx
+
+    from db.async_redis import async_redis
+    from main import app
+
+    created = {"files": [], "tasks": [], "jobs": []}
+    await async_redis.connect()
+    transport = httpx.ASGITransport(app=app)
+    client = httpx.AsyncClient(transport=transport, base_url="http://bench")
+    results = {}
+    try:
+        for name in args.benchmarks.split(","):
+            T0 = time.perf_counter()
+            try:
+                if name == "upload":
+                    results[name] = await bench_upload(
+                        client, fixtures, args.runs, created
+                    )
+                elif name == "e2e":
+                    results[name] = await bench_e2e(
+                        client,
+                        fixtures,
+                        args.model,
+                        args.timeout,
+                        args.poll_interval,
+                        created,
+                    )
+                elif name == "listing":
+                    results[name] = await bench_listing(
+                        client, async_redis, args.task_counts, args.runs, created
+                    )
+                elif name == "progress":
+                    results[name] = await bench_progress(
+                        client, async_redis, args.segment_counts, args.runs, created
+                    )
+            except Exception as e:
+                # 某一项失败（例如缺少 ffmpeg）不影响其余各项
+                results[name] = {"error": f"{type(e).__name__}: {e}"}
+            print(
+                f"{name}: {time.perf_counter() - T0:.1f}s", file=sys.stderr, flush=True
+            )
+    finally:
+        await client.aclose()
+        await cleanup(async_redis, created)
+        await async_redis.disconnect()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmarks")
+    parser.add_argument("--benchmarks", default=",".join(BENCHMARKS))
+    parser.add_argument("--lengths", default="30,300", help="测试音频时长（秒）")
+    parser.add_argument("--video", action="store_true", help="同时生成 mp4 测试文件")
+    parser.add_argument("--model", default="tiny")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--task-counts", default="100,1000,10000")
+    parser.add_argument("--segment-counts", default="100,1000,5000")
+    parser.add_argument("--timeout", type=float, default=1800)
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--redis-url", help="使用已有的空 Redis，默认启动 fakeredis")
+    parser.add_argument("--output", help="结果 JSON 输出路径，默认打印到标准输出")
+    args = parser.parse_args()
+    args.task_counts = [int(n) for n in args.task_counts.split(",")]
+    args.segment_counts = [int(n) for n in args.segment_counts.split(",")]
+    lengths = [float(n) for n in args.lengths.split(",")]
+    unknown = set(args.benchmarks.split(",")) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+    if args.video and not shutil.which("ffmpeg"):
+        parser.error("--video requires ffmpeg")
+
+    # Redis 地址在导入应用模块时读取，必须先设置环境变量
+    server = None
+    if args.redis_url:
+        url = urlparse(args.redis_url)
+        os.environ["REDIS_HOST"] = url.hostname or "localhost"
+        os.environ["REDIS_PORT"] = str(url.port or 6379)
+        if url.password:
+            os.environ["REDIS_PASSWORD"] = url.password
+    else:
+        server, port = start_local_redis()
+        os.environ["REDIS_HOST"] = "127.0.0.1"
+        os.environ["REDIS_PORT"] = str(port)
+
+    fixture_dir = tempfile.mkdtemp(prefix="cutai-bench-")
+    try:
+        fixtures = make_fixtures(fixture_dir, lengths, args.video)
+        if "e2e" in args.benchmarks.split(","):
+            from celery.contrib.testing.worker import start_worker
+
+            from celery_config import app
+            from utils.scheduling import SIZE_CLASSES, queue_name
+
+            # 进程内 worker 消费所有队列，任务经由 broker 投递，与线上路径一致
+            with start_worker(
+                app,
+                pool="solo",
+                concurrency=1,
+                queues=[queue_name(name) for name in SIZE_CLASSES],
+                perform_ping_check=False,
+                shutdown_timeout=30,
+            ):
+                results = asyncio.run(run(args, fixtures))
+        else:
+            results = asyncio.run(run(args, fixtures))
+    finally:
+        shutil.rmtree(fixture_dir, ignore_errors=True)
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    commit = subprocess.run(
+        ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True
+    ).stdout.strip()
+    report = {
+        "commit": commit or None,
+        "created_at": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "redis": "external" if args.redis_url else "fakeredis",
+        "fixtures": [
+            {"file": os.path.basename(f["path"]), "seconds": f["seconds"]}
+            for f in fixtures
+        ],
+        "results": results,
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
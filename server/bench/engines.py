@@ -0,0 +1,154 @@
+# 推理引擎对比：在本地样本集上比较各引擎的实时率（RTF）与错误率漂移
+#
+# 样本目录中每个音视频文件旁放一个同名 .txt 参考文本，例如 a.wav / a.txt。
+# 在 server 目录下运行：
+#   python -m bench.engines --samples ./samples --model small --engines torch,int8
+import argparse
+import json
+import os
+import re
+import time
+
+from fastapi_celery.audio import SAMPLE_RATE, decode_audio
+from fastapi_celery.engines import get_engine
+from fastapi_celery.models import model_size_mb
+from utils.stt_options import build_options
+
+MEDIA_EXTENSIONS = (".wav", ".mp3", ".m4a", ".flac", ".ogg", ".aac", ".mp4", ".mkv")
+
+
+def edit_distance(ref, hyp):
+    previous = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        current = [i]
+        for j, h in enumerate(hyp, 1):
+            current.append(
+                min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (r != h))
+            )
+        previous = current
+    return previous[-1]
+
+
+def normalize(text):
+    return re.sub(r"[^\w\s]", "", text).lower()
+
+
+def error_rates(reference, hypothesis):
+    """返回 (CER, WER)；中文没有空格分词，以字错误率为主"""
+    ref, hyp = normalize(reference), normalize(hypothesis)
+    ref_chars, hyp_chars = ref.replace(" ", ""), hyp.replace(" ", "")
+    ref_words, hyp_words = ref.split(), hyp.split()
+    cer = edit_distance(ref_chars, hyp_chars) / max(len(ref_chars), 1)
+    wer = edit_distance(ref_words, hyp_words) / max(len(ref_words), 1)
+    return cer, wer
+
+
+def load_samples(sample_dir):
+    samples = []
+    for name in sorted(os.listdir(sample_dir)):
+        base, ext = os.path.splitext(name)
+        reference_path = os.path.join(sample_dir, base + ".txt")
+        if ext.lower() not in MEDIA_EXTENSIONS or not os.path.exists(reference_path):
+            continue
+        with open(reference_path, encoding="utf-8") as f:
+            reference = f.read()
+        audio = decode_audio(os.path.join(sample_dir, name))
+        samples.append({"name": name, "audio": audio, "reference": reference})
+    return samples
+
+
+def run_engine(engine_name, model_name, samples, options):
+    engine = get_engine(engine_name)
+    T0 = time.time()
+    model = engine.load(model_name)
+    load_seconds = time.time() - T0
+
+    rows = []
+    for sample in samples:
+        duration = len(sample["audio"]) / float(SAMPLE_RATE)
+        T0 = time.time()
+        result = engine.transcribe(
+            model,
+            sample["audio"],
+            fp16=False,
+            temperature=options["temperature"],
+            language=options["language"],
+            initial_prompt=options["initial_prompt"],
+            verbose=False,
+            word_timestamps=options["word_timestamps"],
+        )
+        elapsed = time.time() - T0
+        cer, wer = error_rates(sample["reference"], result["text"])
+        rows.append(
+            {
+                "sample": sample["name"],
+                "audio_seconds": round(duration, 2),
+                "elapsed_seconds": round(elapsed, 2),
+                "rtf": round(elapsed / duration, 4) if duration else None,
+                "cer": round(cer, 4),
+                "wer": round(wer, 4),
+            }
+        )
+
+    audio_seconds = sum(r["audio_seconds"] for r in rows)
+    elapsed_seconds = sum(r["elapsed_seconds"] for r in rows)
+    return {
+        "engine": engine_name,
+        "model": model_name,
+        "model_size_mb": round(model_size_mb(model), 1),
+        "load_seconds": round(load_seconds, 2),
+        "rtf": round(elapsed_seconds / audio_seconds, 4) if audio_seconds else None,
+        "cer": round(sum(r["cer"] for r in rows) / max(len(rows), 1), 4),
+        "wer": round(sum(r["wer"] for r in rows) / max(len(rows), 1), 4),
+        "samples": rows,
+    }
+
+
+def compare(results):
+    """以第一个引擎为基准，计算其余引擎的加速比与错误率漂移"""
+    baseline = results[0]
+    summary = []
+    for result in results[1:]:
+        summary.append(
+            {
+                "engine": result["engine"],
+                "baseline": baseline["engine"],
+                "speedup": round(baseline["rtf"] / result["rtf"], 3)
+                if result["rtf"]
+                else None,
+                "cer_drift": round(result["cer"] - baseline["cer"], 4),
+                "wer_drift": round(result["wer"] - baseline["wer"], 4),
+            }
+        )
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Whisper inference engines")
+    parser.add_argument("--samples", required=True, help="样本目录")
+    parser.add_argument("--model", default="small")
+    parser.add_argument("--engines", default="torch,int8")
+    parser.add_argument("--output", help="结果 JSON 输出路径，默认打印到标准输出")
+    args = parser.parse_args()
+
+    options = build_options()
+    samples = load_samples(args.samples)
+    if not samples:
+        parser.error(f"no samples with reference text found in {args.samples}")
+
+    results = [
+        run_engine(engine, args.model, samples, options)
+        for engine in args.engines.split(",")
+    ]
+    report = {"results": results, "comparison": compare(results)}
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# 进程启动开销：分别在新的子进程中导入 API 应用和 Celery worker 的任务模块，
+# 记录导入耗时、常驻内存，以及是否加载了推理依赖。
+#
+# API 进程或 worker 主进程加载了 torch / whisper，或超出给定阈值时以非零状态退出，
+# 可直接放进 CI。worker 导入任务模块时不需要 Redis 已启动。在 server 目录下运行：
+#   python -m bench.startup --max-api-seconds 3 --max-api-rss-mb 200 \
+#       --max-worker-seconds 3 --max-worker-rss-mb 200
+import argparse
+import json
+import subprocess
+import sys
+
+HEAVY_MODULES = ("torch", "whisper", "moviepy")
+
+PROBE = """
+import json, sys, time
+T0 = time.perf_counter()
+{imports}
+elapsed = time.perf_counter() - T0
+rss_kb = 0
+with open("/proc/self/status") as f:
+    for line in f:
+        if line.startswith("VmRSS:"):
+            rss_kb = int(line.split()[1])
+print(json.dumps({{
+    "import_seconds": round(elapsed, 3),
+    "rss_mb": round(rss_kb / 1024, 1),
+    "heavy_modules": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+TARGETS = {
+    "api": "import main",
+    "worker": "import celery_config\nimport fastapi_celery.tasks",
+    # worker 子进程加载默认模型之后的开销
+    "worker_model": (
+        "import fastapi_celery.tasks as tasks\n"
+        "tasks.get_registry().get(tasks.DEFAULT_OPTIONS['model'])"
+    ),
+}
+
+
+def measure(name, runs=3):
+    """取多次冷启动中耗时最短的一次，减少磁盘缓存等因素的干扰"""
+    code = PROBE.format(imports=TARGETS[name], heavy=HEAVY_MODULES)
+    results = []
+    for _ in range(runs):
+        process = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True
+        )
+        if process.returncode != 0:
+            # 例如 worker 导入时连接不上 Redis
+            error = process.stderr.strip().splitlines()[-1]
+            return {"target": name, "error": error}
+        # 应用模块导入时可能有打印输出，结果在最后一行
+        results.append(json.loads(process.stdout.strip().splitlines()[-1]))
+    best = min(results, key=lambda r: r["import_seconds"])
+    return {"target": name, **best}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure API/worker startup cost")
+    parser.add_argument("--targets", default="api,worker")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--max-api-seconds", type=float)
+    parser.add_argument("--max-api-rss-mb", type=float)
+    parser.add_argument("--max-worker-seconds", type=float)
+    parser.add_argument("--max-worker-rss-mb", type=float)
+    args = parser.parse_args()
+
+    report = [measure(name, args.runs) for name in args.targets.split(",")]
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    limits = {
+        "api": (args.max_api_seconds, args.max_api_rss_mb),
+        "worker": (args.max_worker_seconds, args.max_worker_rss_mb),
+    }
+    errors = []
+    for result in report:
+        name = result["target"]
+        if name not in limits:
+            continue
+        label = "API" if name == "api" else "Worker"
+        max_seconds, max_rss_mb = limits[name]
+        if "error" in result:
+            errors.append(f"{label} import failed: {result['error']}")
+            continue
+        heavy = ", ".join(result["heavy_modules"])
+        if heavy:
+            errors.append(f"{label} process imported {heavy}")
+        if max_seconds and result["import_seconds"] > max_seconds:
+            errors.append(f"{label} import took {result['import_seconds']}s")
+        if max_rss_mb and result["rss_mb"] > max_rss_mb:
+            errors.append(f"{label} RSS is {result['rss_mb']} MB")
+    if errors:
+        sys.exit("\n".join(errors))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 from celery import Celery
-from config.config_loader import REDIS_CONFIG
+from config.config_loader import QUEUE_CONFIG, REDIS_CONFIG
+from utils.scheduling import FALLBACK_CLASS, queue_name
 
 import sys
 import os
@@ -18,3 +19,16 @@ app = Celery(
 )
 # 配置 Celery 使用 Redis 作为结果后端
 app.conf.result_backend = f"redis://:{password}@{host}:{port}/{database}"
+# 转写任务按时长投递到 stt.short / stt.medium / stt.long，
+# 未指定队列的任务进入中等长度队列，由对应的 worker 池处理
+app.conf.task_default_queue = queue_name(FALLBACK_CLASS)
+# 任务处理完才确认消息：worker 进程被杀死（如 OOM）时任务重新入队，
+# 由其他 worker 从检查点继续；每个进程只预取一个任务，避免积压在将要退出的 worker 上
+app.conf.task_acks_late = True
+app.conf.task_reject_on_worker_lost = True
+app.conf.worker_prefetch_multiplier = 1
+# 整台机器宕机时，未确认的消息在超时后重新投递；需大于最长任务的处理时间，
+# 否则仍在处理的任务会被重复投递
+app.conf.broker_transport_options = {
+    "visibility_timeout": int(QUEUE_CONFIG.get("visibility_timeout", 21600))
+}
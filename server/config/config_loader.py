@@ -12,3 +12,7 @@ config = load_config('./config/config.yaml')
 DATABASE_CONFIG = config.get('database', {})
 REDIS_CONFIG = config.get('redis', {})
 API_CONFIG = config.get('api', {})
+UPLOAD_CONFIG = config.get('upload', {})
+STT_CONFIG = config.get('stt', {})
+WORKER_CONFIG = config.get('worker', {})
+QUEUE_CONFIG = config.get('queue', {})
@@ -0,0 +1,818 @@
+import json
+import os
+import time
+import uuid
+import zlib
+from datetime import datetime
+
+import redis
+import redis.asyncio as aioredis
+from loguru import logger
+
+from config.config_loader import REDIS_CONFIG
+from db import keys
+from db.codec import decode_block, blocks_in_range, unpack_text
+from utils.metrics import METRICS
+from utils.search import idf, segment_terms
+from db.redis import (
+    ADMIT_JOB_SCRIPT,
+    RELEASE_SLOT_SCRIPT,
+    PAGE_SUMMARIES_SCRIPT,
+    VersionConflict,
+    build_task_summary,
+    unpack_task,
+    queue_task_writes,
+    replace_segments,
+    filter_segments,
+    patch_segment_ids,
+    apply_patch,
+    decode_events,
+    number_partials,
+    decode_metrics,
+    queue_metric_ops,
+    decode_cache_stats,
+    decode_search_doc,
+    search_index_ops,
+    parse_cursor,
+    page_entries,
+    decode_summary,
+    next_page_cursor,
+)
+
+
+FILE_TTL = 3600 * 24 * 7
+
+
+class AsyncRedisHandler:
+    """API 进程使用的异步 Redis 访问层，键结构和编码与 RedisHandler 一致
+
+    连接池在应用启动时通过 connect() 创建，所有路由共用同一个实例。
+    """
+
+    def __init__(
+        self,
+        host=os.getenv("REDIS_HOST", REDIS_CONFIG["host"]),
+        port=os.getenv("REDIS_PORT", REDIS_CONFIG["port"]),
+        db=os.getenv("REDIS_DB", REDIS_CONFIG["db"]),
+        password=os.getenv("REDIS_PASSWORD", REDIS_CONFIG["password"]),
+    ):
+        self.host = host
+        self.port = port
+        self.db = db | 0
+        self.password = password
+        self.redis_pool = None
+        self.redis_client = None
+
+    async def connect(self):
+        self.redis_pool = aioredis.ConnectionPool.from_url(
+            f"redis://{self.host}:{self.port}/{self.db}",
+            password=self.password,
+        )
+        self.redis_client = aioredis.Redis(connection_pool=self.redis_pool)
+        if await self.redis_client.ping():
+            logger.info("async redis connect success")
+        else:
+            logger.error("async redis connect failed")
+
+    async def disconnect(self):
+        if self.redis_client:
+            await self.redis_client.aclose()
+        if self.redis_pool:
+            await self.redis_pool.disconnect()
+
+    async def get_json_many(self, prefix, ids):
+        """用一次 MGET 读取多个 JSON 值，不存在的键返回 None"""
+        if not ids:
+            return []
+        try:
+            values = await self.redis_client.mget([prefix + i for i in ids])
+            return [json.loads(value) if value else None for value in values]
+        except Exception as e:
+            logger.error(f"Error getting values: {e}")
+            return [None] * len(ids)
+
+    async def set_json_many(self, prefix, items, ttl):
+        """在一个 pipeline 中写入多个 JSON 值，items 为 {id: value}"""
+        if not items:
+            return
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for item_id, value in items.items():
+                pipe.setex(prefix + item_id, ttl, json.dumps(value))
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Error setting values: {e}")
+
+    async def add_file(self, file_id, file_info):
+        await self.set_json_many(keys.FILEKEY_PREFIX, {file_id: file_info}, FILE_TTL)
+
+    async def get_file(self, file_id):
+        return (await self.get_json_many(keys.FILEKEY_PREFIX, [file_id]))[0]
+
+    async def get_files(self, file_ids):
+        return await self.get_json_many(keys.FILEKEY_PREFIX, file_ids)
+
+    async def delete_file(self, file_id):
+        try:
+            await self.redis_client.delete(keys.FILEKEY_PREFIX + file_id)
+        except Exception as e:
+            logger.error(f"Error deleting file: {e}")
+
+    async def get_peaks_meta(self, file_id):
+        return (await self.get_json_many(keys.PEAKSKEY_PREFIX, [file_id]))[0]
+
+    async def get_peaks(self, file_id, level, start, end):
+        """读取某一级第 [start, end) 个峰值，每个峰值为 int8 的 min, max 两个字节"""
+        try:
+            if end <= start:
+                return b""
+            return await self.redis_client.getrange(
+                f"{keys.PEAKSKEY_PREFIX}{file_id}:{level}", start * 2, end * 2 - 1
+            )
+        except Exception as e:
+            logger.error(f"Error getting peaks: {e}")
+            return None
+
+    async def delete_peaks(self, file_id):
+        try:
+            meta = await self.get_peaks_meta(file_id)
+            if meta:
+                await self.redis_client.delete(
+                    *keys.peaks_keys(file_id, len(meta["levels"]))
+                )
+        except Exception as e:
+            logger.error(f"Error deleting peaks: {e}")
+
+    async def set_upload(self, upload_id, upload_info, ttl=3600 * 24):
+        await self.set_json_many(keys.UPLOADKEY_PREFIX, {upload_id: upload_info}, ttl)
+
+    async def get_upload(self, upload_id):
+        return (await self.get_json_many(keys.UPLOADKEY_PREFIX, [upload_id]))[0]
+
+    async def delete_upload(self, upload_id):
+        try:
+            await self.redis_client.delete(keys.UPLOADKEY_PREFIX + upload_id)
+        except Exception as e:
+            logger.error(f"Error deleting upload: {e}")
+
+    async def set_range_job(self, job_id, job_info, ttl=3600 * 24):
+        await self.set_json_many(keys.RANGEJOBKEY_PREFIX, {job_id: job_info}, ttl)
+
+    async def get_range_job(self, job_id):
+        return (await self.get_json_many(keys.RANGEJOBKEY_PREFIX, [job_id]))[0]
+
+    async def set_clip(self, clip_id, clip_info, ttl=3600 * 24):
+        await self.set_json_many(keys.CLIPKEY_PREFIX, {clip_id: clip_info}, ttl)
+
+    async def get_clip(self, clip_id):
+        return (await self.get_json_many(keys.CLIPKEY_PREFIX, [clip_id]))[0]
+
+    async def set_stt_task(self, task_id, task_info, ttl=3600 * 24 * 7):
+        pipe = self.redis_client.pipeline()
+        queue_task_writes(pipe, task_id, task_info, ttl)
+        await pipe.execute()
+
+    async def get_stt_task_meta(self, task_id):
+        """只读取任务元数据，不含文本和片段"""
+        return (await self.get_json_many(keys.TASKKEY_PREFIX, [task_id]))[0]
+
+    async def get_stt_task_metas(self, task_ids):
+        return await self.get_json_many(keys.TASKKEY_PREFIX, task_ids)
+
+    async def get_stt_task(self, task_id):
+        try:
+            meta = await self.get_stt_task_meta(task_id)
+            if meta is None or "blocks" not in meta:
+                # 进行中的任务，或旧版本整体存储的任务
+                return meta
+
+            key = keys.TASKKEY_PREFIX + task_id
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.hgetall(key + keys.SEGMENTS_SUFFIX)
+            pipe.hgetall(key + keys.TEXT_SUFFIX)
+            return unpack_task(meta, *await pipe.execute())
+        except Exception as e:
+            logger.error(f"Error getting STT task: {e}")
+            return None
+
+    async def get_stt_text(self, task_id):
+        try:
+            meta = await self.get_stt_task_meta(task_id)
+            if meta is None or "blocks" not in meta:
+                return meta.get("text") if meta else None
+            text_blocks = await self.redis_client.hgetall(
+                keys.TASKKEY_PREFIX + task_id + keys.TEXT_SUFFIX
+            )
+            return unpack_text(
+                meta["blocks"], {int(k): v for k, v in text_blocks.items()}
+            )
+        except Exception as e:
+            logger.error(f"Error getting STT text: {e}")
+            return None
+
+    async def get_stt_segments(self, task_id, start=None, end=None):
+        """读取与时间范围 [start, end] 有交集的片段，只解码涉及的存储块"""
+        try:
+            meta = await self.get_stt_task_meta(task_id)
+            if meta is None:
+                return None
+            if "blocks" not in meta:
+                segments = meta.get("segments", [])
+            else:
+                block_nos = blocks_in_range(meta["blocks"], start, end)
+                if not block_nos:
+                    return []
+                segment_blocks = await self.redis_client.hmget(
+                    keys.TASKKEY_PREFIX + task_id + keys.SEGMENTS_SUFFIX, block_nos
+                )
+                segments = []
+                for data in segment_blocks:
+                    segments.extend(decode_block(data))
+            return filter_segments(segments, start, end)
+        except Exception as e:
+            logger.error(f"Error getting STT segments: {e}")
+            return None
+
+    async def iter_stt_segments(self, task_id, meta, batch_blocks=8):
+        """按存储块分批读取全部片段，导出大文件时不必一次性载入"""
+        if "blocks" not in meta:
+            yield meta.get("segments", [])
+            return
+        block_nos = blocks_in_range(meta["blocks"])
+        segments_key = keys.TASKKEY_PREFIX + task_id + keys.SEGMENTS_SUFFIX
+        for i in range(0, len(block_nos), batch_blocks):
+            segment_blocks = await self.redis_client.hmget(
+                segments_key, block_nos[i : i + batch_blocks]
+            )
+            segments = []
+            for data in segment_blocks:
+                if data:
+                    segments.extend(decode_block(data))
+            yield segments
+
+    async def get_export(self, task_id, field):
+        try:
+            data = await self.redis_client.hget(
+                keys.TASKKEY_PREFIX + task_id + keys.EXPORTS_SUFFIX, field
+            )
+            return zlib.decompress(data) if data else None
+        except Exception as e:
+            logger.error(f"Error getting export: {e}")
+            return None
+
+    async def set_export(self, task_id, version, field, content, ttl=3600 * 24):
+        """缓存导出结果，同时删除旧版本的缓存"""
+        try:
+            key = keys.TASKKEY_PREFIX + task_id + keys.EXPORTS_SUFFIX
+            stale = [
+                f
+                for f in await self.redis_client.hkeys(key)
+                if not f.decode().startswith(f"{version}:")
+            ]
+            pipe = self.redis_client.pipeline()
+            if stale:
+                pipe.hdel(key, *stale)
+            pipe.hset(key, field, zlib.compress(content))
+            pipe.expire(key, ttl)
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Error setting export: {e}")
+
+    async def patch_stt_segments(self, task_id, ops, base_version):
+        """与 RedisHandler.patch_stt_segments 相同，以 WATCH/MULTI 做乐观并发控制"""
+        key = keys.TASKKEY_PREFIX + task_id
+        async with self.redis_client.pipeline() as pipe:
+            try:
+                await pipe.watch(key)
+                meta_str = await pipe.get(key)
+                if not meta_str:
+                    return None
+                meta = json.loads(meta_str)
+                if "blocks" not in meta:
+                    # 旧版本整体存储的任务，先转换为分块存储
+                    await pipe.unwatch()
+                    task_info = await self.get_stt_task(task_id)
+                    if task_info is None or "segments" not in task_info:
+                        # 期间任务已过期，或仍在处理中
+                        return None
+                    await self.set_stt_task(task_id, task_info)
+                    return await self.patch_stt_segments(task_id, ops, base_version)
+
+                version = meta.get("version", 1)
+                if version != base_version:
+                    raise VersionConflict(version)
+
+                segment_ids = patch_segment_ids(ops)
+                block_nos = await pipe.hmget(key + keys.SEGIDX_SUFFIX, segment_ids)
+                locate = {
+                    segment_id: int(block_no)
+                    for segment_id, block_no in zip(segment_ids, block_nos)
+                    if block_no is not None
+                }
+                needed = sorted(set(locate.values()))
+                data = []
+                if needed:
+                    data = await pipe.hmget(key + keys.SEGMENTS_SUFFIX, needed)
+                blocks = {b: decode_block(d) for b, d in zip(needed, data)}
+
+                segment_updates, text_updates, segidx_updates, removed, result = (
+                    apply_patch(meta, blocks, locate, ops)
+                )
+
+                pipe.multi()
+                pipe.set(key, json.dumps(meta), keepttl=True)
+                if segment_updates:
+                    pipe.hset(key + keys.SEGMENTS_SUFFIX, mapping=segment_updates)
+                    pipe.hset(key + keys.TEXT_SUFFIX, mapping=text_updates)
+                if segidx_updates:
+                    pipe.hset(key + keys.SEGIDX_SUFFIX, mapping=segidx_updates)
+                if removed:
+                    pipe.hdel(key + keys.SEGIDX_SUFFIX, *removed)
+                await pipe.execute()
+                return result
+            except redis.WatchError:
+                current = await self.get_stt_task_meta(task_id) or {}
+                raise VersionConflict(current.get("version"))
+
+    async def replace_stt_segments(
+        self, task_id, segments, base_version=None, ttl=3600 * 24 * 7
+    ):
+        """与 RedisHandler.replace_stt_segments 相同，以 WATCH/MULTI 做乐观并发控制"""
+        key = keys.TASKKEY_PREFIX + task_id
+        async with self.redis_client.pipeline() as pipe:
+            try:
+                await pipe.watch(key)
+                meta_str = await pipe.get(key)
+                if not meta_str:
+                    return None
+                meta = json.loads(meta_str)
+                version = meta.get("version", 1)
+                if base_version is not None and version != base_version:
+                    raise VersionConflict(version)
+
+                task_info = replace_segments(meta, segments)
+                pipe.multi()
+                queue_task_writes(pipe, task_id, task_info, ttl)
+                await pipe.execute()
+                return task_info["version"]
+            except redis.WatchError:
+                current = await self.get_stt_task_meta(task_id) or {}
+                raise VersionConflict(current.get("version"))
+
+    async def delete_stt_task(self, task_id):
+        try:
+            await self.redis_client.delete(*keys.task_keys(task_id))
+        except Exception as e:
+            logger.error(f"Error deleting STT task: {e}")
+
+    async def remove_task_from_global_list(self, task_id):
+        try:
+            await self.redis_client.lrem(keys.TASK_ID_LIST_KEY, 0, task_id)
+        except Exception as e:
+            logger.error(f"Error removing task ID from global list: {e}")
+
+    async def get_all_task_ids_from_global_list(self, start=0, end=-1):
+        try:
+            task_ids = await self.redis_client.lrange(keys.TASK_ID_LIST_KEY, start, end)
+            return [task_id.decode("utf-8") for task_id in task_ids]
+        except Exception as e:
+            logger.error(f"Error retrieving task IDs from global list: {e}")
+            return []
+
+    async def get_cached_transcript(self, cache_key, ttl=3600 * 24 * 7):
+        try:
+            result_str = await self.redis_client.get(keys.CACHEKEY_PREFIX + cache_key)
+            pipe = self.redis_client.pipeline(transaction=False)
+            if result_str:
+                # 命中后刷新访问时间和过期时间，淘汰时按最近最少使用顺序
+                pipe.zadd(keys.CACHE_INDEX_KEY, {cache_key: time.time()})
+                pipe.expire(keys.CACHEKEY_PREFIX + cache_key, ttl)
+                pipe.hincrby(keys.CACHE_STATS_KEY, "hits", 1)
+            else:
+                pipe.hincrby(keys.CACHE_STATS_KEY, "misses", 1)
+            await pipe.execute()
+            return json.loads(result_str) if result_str else None
+        except Exception as e:
+            logger.error(f"Error getting cached transcript: {e}")
+            return None
+
+    async def get_cache_stats(self):
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.hgetall(keys.CACHE_STATS_KEY)
+            pipe.zcard(keys.CACHE_INDEX_KEY)
+            return decode_cache_stats(*await pipe.execute())
+        except Exception as e:
+            logger.error(f"Error getting cache stats: {e}")
+            return None
+
+    async def read_task_events(self, task_id, last_id="0-0", block_ms=None, count=100):
+        """读取 last_id 之后的进度事件，返回 [(事件ID, 事件), ...]"""
+        try:
+            streams = await self.redis_client.xread(
+                {keys.EVENTKEY_PREFIX + task_id: last_id}, count=count, block=block_ms
+            )
+            return decode_events(streams)
+        except Exception as e:
+            logger.error(f"Error reading task events: {e}")
+            return []
+
+    async def get_partial_segments(self, task_id, after=-1):
+        """返回下标大于 after 的片段，片段ID即其在中间结果中的下标"""
+        try:
+            segments = await self.redis_client.lrange(
+                keys.PARTIALKEY_PREFIX + task_id, after + 1, -1
+            )
+            return number_partials(segments, after)
+        except Exception as e:
+            logger.error(f"Error getting partial segments: {e}")
+            return []
+
+    async def update_search_index(self, task_id, segments, removed=None):
+        """更新任务的全文索引
+
+        removed 为 None 时 segments 是任务的全部片段；否则只更新 segments 中的片段，
+        并删除 removed 中的片段。
+        """
+        try:
+            doc_key = keys.SEARCH_DOC_PREFIX + task_id
+            new = segment_terms(segments)
+            if removed is None:
+                old = decode_search_doc(await self.redis_client.hgetall(doc_key))
+            else:
+                ids = list(new) + list(removed)
+                values = await self.redis_client.hmget(doc_key, ids) if ids else []
+                old = decode_search_doc(dict(zip(ids, values)))
+            pipe = self.redis_client.pipeline()
+            search_index_ops(pipe, task_id, old, new)
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Error updating search index: {e}")
+
+    async def delete_search_index(self, task_id):
+        await self.update_search_index(task_id, [])
+
+    async def search_segments(self, terms, offset=0, limit=20):
+        """返回包含全部词项的片段 [(任务ID, 片段ID, 得分), ...] 及候选总数
+
+        得分为各词项 idf 与词频乘积之和；交集在 Redis 中计算，只取当前页。
+        只有一个词项时不求交集，直接按词频读取该词项的倒排表。
+        """
+        pipe = self.redis_client.pipeline(transaction=False)
+        for term in terms:
+            pipe.zcard(keys.SEARCH_TERM_PREFIX + term)
+        pipe.hget(keys.SEARCH_STATS_KEY, "segments")
+        *dfs, total = await pipe.execute()
+        if not terms or not all(dfs):
+            return [], 0
+
+        total = int(total or 0)
+        weights = {
+            keys.SEARCH_TERM_PREFIX + term: idf(total, df)
+            for term, df in zip(terms, dfs)
+        }
+        if len(weights) == 1:
+            # 单个词项（如单字查询）直接读取倒排表，不复制整张表做交集
+            [(term_key, weight)] = weights.items()
+            entries = await self.redis_client.zrevrange(
+                term_key, offset, offset + limit - 1, withscores=True
+            )
+            entries = [(member, score * weight) for member, score in entries]
+            count = dfs[0]
+        else:
+            tmp_key = keys.SEARCH_TMP_PREFIX + uuid.uuid4().hex
+            pipe = self.redis_client.pipeline()
+            pipe.zinterstore(tmp_key, weights)
+            pipe.zrevrange(tmp_key, offset, offset + limit - 1, withscores=True)
+            pipe.delete(tmp_key)
+            count, entries, _ = await pipe.execute()
+        hits = []
+        for member, score in entries:
+            task_id, segment_id = member.decode("utf-8").rsplit(":", 1)
+            hits.append((task_id, int(segment_id), score))
+        return hits, count
+
+    async def get_segments_by_id(self, task_id, segment_ids):
+        """按片段ID读取片段，只解码涉及的存储块"""
+        key = keys.TASKKEY_PREFIX + task_id
+        block_nos = await self.redis_client.hmget(
+            key + keys.SEGIDX_SUFFIX, list(segment_ids)
+        )
+        block_nos = sorted({int(b) for b in block_nos if b is not None})
+        if not block_nos:
+            return {}
+        wanted = set(segment_ids)
+        segments = {}
+        for data in await self.redis_client.hmget(
+            key + keys.SEGMENTS_SUFFIX, block_nos
+        ):
+            for segment in decode_block(data) if data else []:
+                if segment.get("id") in wanted:
+                    segments[segment["id"]] = segment
+        return segments
+
+    async def backfill_search_index(self):
+        """为建立全文索引之前完成的任务补建索引，只在首次启动时执行"""
+        try:
+            if await self.redis_client.hget(keys.SEARCH_STATS_KEY, "backfilled"):
+                return
+            task_ids = await self.redis_client.zrange(
+                keys.state_index_key("SUCCESS"), 0, -1
+            )
+            for task_id in task_ids:
+                task_id = task_id.decode("utf-8")
+                segments = await self.get_stt_segments(task_id)
+                if segments:
+                    await self.update_search_index(task_id, segments)
+            await self.redis_client.hset(keys.SEARCH_STATS_KEY, "backfilled", 1)
+            logger.info(f"全文索引补建完成，共 {len(task_ids)} 个任务")
+        except Exception as e:
+            logger.error(f"Error backfilling search index: {e}")
+
+    async def get_summary_field(self, task_ids, field):
+        """读取多个任务摘要中的同一字段，返回 {任务ID: 值}"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        for task_id in task_ids:
+            pipe.hget(keys.SUMMARYKEY_PREFIX + task_id, field)
+        names = await pipe.execute()
+        return {
+            task_id: name.decode("utf-8") if name else None
+            for task_id, name in zip(task_ids, names)
+        }
+
+    async def set_task_summary(self, task_id, summary, score=None):
+        """写入任务摘要并把任务移动到对应状态的索引中"""
+        try:
+            score = score or time.time()
+            summary = {k: v for k, v in summary.items() if v is not None}
+            pipe = self.redis_client.pipeline()
+            pipe.hset(keys.SUMMARYKEY_PREFIX + task_id, mapping=summary)
+            pipe.zadd(keys.TASK_INDEX_KEY, {task_id: score})
+            if "state" in summary:
+                for state in keys.TASK_STATES:
+                    pipe.zrem(keys.state_index_key(state), task_id)
+                pipe.zadd(keys.state_index_key(summary["state"]), {task_id: score})
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Error setting task summary: {e}")
+
+    async def delete_task_summary(self, task_id):
+        try:
+            pipe = self.redis_client.pipeline()
+            pipe.delete(keys.SUMMARYKEY_PREFIX + task_id)
+            pipe.zrem(keys.TASK_INDEX_KEY, task_id)
+            for state in keys.TASK_STATES:
+                pipe.zrem(keys.state_index_key(state), task_id)
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Error deleting task summary: {e}")
+
+    async def list_task_summaries(self, state=None, cursor=None, limit=20):
+        """按时间倒序分页读取任务摘要，返回 (摘要列表, 下一页游标)"""
+        try:
+            max_score, last_id = parse_cursor(cursor)
+            index_key = keys.state_index_key(state)
+            if last_id is None:
+                entries = await self.redis_client.zrevrange(
+                    index_key, 0, limit, withscores=True
+                )
+            else:
+                entries = page_entries(
+                    await self.redis_client.eval(
+                        PAGE_SUMMARIES_SCRIPT,
+                        1,
+                        index_key,
+                        max_score,
+                        last_id,
+                        limit + 1,
+                    )
+                )
+
+            page = entries[:limit]
+            pipe = self.redis_client.pipeline(transaction=False)
+            for member, _ in page:
+                pipe.hgetall(keys.SUMMARYKEY_PREFIX + member.decode("utf-8"))
+            summaries = [
+                decode_summary(member, summary)
+                for (member, _), summary in zip(page, await pipe.execute())
+                if summary
+            ]
+            return summaries, next_page_cursor(entries, limit)
+        except Exception as e:
+            logger.error(f"Error listing task summaries: {e}")
+            return [], None
+
+    async def migrate_task_list_to_index(self):
+        """把旧版全局任务列表中的任务写入索引，仅在索引为空时执行"""
+        try:
+            if await self.redis_client.zcard(keys.TASK_INDEX_KEY):
+                return 0
+            task_ids = await self.get_all_task_ids_from_global_list()
+            migrated = 0
+            for task_id in reversed(task_ids):
+                task_info = await self.get_stt_task_meta(task_id)
+                if not task_info:
+                    continue
+                score = time.time()
+                if task_info.get("completion_time"):
+                    completion_time = datetime.fromisoformat(task_info["completion_time"])
+                    score = completion_time.timestamp()
+                await self.set_task_summary(
+                    task_id, build_task_summary(task_info), score
+                )
+                migrated += 1
+            if migrated:
+                logger.info(f"已把 {migrated} 个旧任务写入任务索引")
+            return migrated
+        except Exception as e:
+            logger.error(f"Error migrating task list to index: {e}")
+            return 0
+
+    async def admit_job(self, task_id, job, user_slots, ttl=3600 * 24):
+        """登记任务并检查用户名额，返回 True 表示可以立即投递，False 表示已暂存"""
+        size_class = job["size_class"]
+        inflight_key, held_key = keys.user_slot_keys(size_class, job["user"])
+        admitted = await self.redis_client.eval(
+            ADMIT_JOB_SCRIPT,
+            4,
+            inflight_key,
+            held_key,
+            keys.QUEUEKEY_PREFIX + size_class,
+            keys.JOBKEY_PREFIX + task_id,
+            user_slots,
+            task_id,
+            time.time(),
+            json.dumps(job),
+            ttl,
+        )
+        return bool(admitted)
+
+    async def cancel_job(self, task_id, ttl=3600 * 24):
+        """标记任务已取消，返回 (是否正在处理, 需要接着投递的暂存任务)
+
+        正在处理的任务由 worker 在下一个窗口开始前停止并释放名额；
+        暂存或排队中的任务在这里直接释放名额，worker 取到消息后直接跳过。
+        """
+        await self.redis_client.set(keys.CANCELKEY_PREFIX + task_id, 1, ex=ttl)
+        job = (await self.get_json_many(keys.JOBKEY_PREFIX, [task_id]))[0]
+        if job is None:
+            return True, None
+        size_class = job["size_class"]
+        inflight_key, held_key = keys.user_slot_keys(size_class, job["user"])
+        running_key = keys.RUNNINGKEY_PREFIX + size_class
+        if await self.redis_client.zscore(running_key, task_id) is not None:
+            return True, None
+
+        next_id = None
+        if not await self.redis_client.lrem(held_key, 0, task_id):
+            next_id = await self.redis_client.eval(
+                RELEASE_SLOT_SCRIPT,
+                4,
+                running_key,
+                keys.QUEUEKEY_PREFIX + size_class,
+                inflight_key,
+                held_key,
+                task_id,
+                time.time(),
+                keys.JOBKEY_PREFIX,
+                ttl,
+            )
+        await self.redis_client.delete(keys.JOBKEY_PREFIX + task_id)
+        if not next_id:
+            return False, None
+        next_job = await self.get_json_many(
+            keys.JOBKEY_PREFIX, [next_id.decode("utf-8")]
+        )
+        return False, next_job[0]
+
+    async def publish_task_event(self, task_id, event, maxlen=1000, ttl=3600 * 24):
+        try:
+            key = keys.EVENTKEY_PREFIX + task_id
+            pipe = self.redis_client.pipeline()
+            pipe.xadd(key, {"data": json.dumps(event)}, maxlen=maxlen, approximate=True)
+            pipe.expire(key, ttl)
+            return (await pipe.execute())[0].decode("utf-8")
+        except Exception as e:
+            logger.error(f"Error publishing task event: {e}")
+            return None
+
+    async def submit_batch(
+        self, batch_id, batch_info, files, jobs, summaries, user_slots, ttl=3600 * 24
+    ):
+        """在一个 pipeline 中登记批量任务的文件、调度信息、任务摘要和批次记录
+
+        jobs 按提交顺序逐个检查用户名额，返回每个任务是否可以立即投递。
+        同一批次的任务按提交顺序依次取递增的分数，排队顺序和任务列表的游标都不会出现并列。
+        """
+        pipe = self.redis_client.pipeline(transaction=False)
+        for file_id, file_info in files.items():
+            pipe.setex(keys.FILEKEY_PREFIX + file_id, FILE_TTL, json.dumps(file_info))
+        now = time.time()
+        for i, job in enumerate(jobs):
+            inflight_key, held_key = keys.user_slot_keys(job["size_class"], job["user"])
+            pipe.eval(
+                ADMIT_JOB_SCRIPT,
+                4,
+                inflight_key,
+                held_key,
+                keys.QUEUEKEY_PREFIX + job["size_class"],
+                keys.JOBKEY_PREFIX + job["task_id"],
+                user_slots,
+                job["task_id"],
+                now + i * 1e-6,
+                json.dumps(job),
+                ttl,
+            )
+        for i, (task_id, summary) in enumerate(summaries.items()):
+            summary = {k: v for k, v in summary.items() if v is not None}
+            score = now + i * 1e-6
+            pipe.hset(keys.SUMMARYKEY_PREFIX + task_id, mapping=summary)
+            pipe.zadd(keys.TASK_INDEX_KEY, {task_id: score})
+            pipe.zadd(keys.state_index_key(summary["state"]), {task_id: score})
+        pipe.setex(keys.BATCHKEY_PREFIX + batch_id, FILE_TTL, json.dumps(batch_info))
+        results = await pipe.execute()
+        return [bool(r) for r in results[len(files) : len(files) + len(jobs)]]
+
+    async def get_batch(self, batch_id):
+        return (await self.get_json_many(keys.BATCHKEY_PREFIX, [batch_id]))[0]
+
+    async def get_queue_snapshot(self, task_id):
+        """读取估算排队时间所需的数据，任务不在排队或处理中时返回 None"""
+        try:
+            job = (await self.get_json_many(keys.JOBKEY_PREFIX, [task_id]))[0]
+            if job is None:
+                return None
+            size_class = job["size_class"]
+            queue_key = keys.QUEUEKEY_PREFIX + size_class
+            _, held_key = keys.user_slot_keys(size_class, job["user"])
+
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.zrank(queue_key, task_id)
+            pipe.zrange(keys.RUNNINGKEY_PREFIX + size_class, 0, -1, withscores=True)
+            pipe.hget(keys.RTF_KEY, size_class)
+            pipe.lrange(held_key, 0, -1)
+            rank, running, rtf, held_ids = await pipe.execute()
+
+            running = {member.decode("utf-8"): score for member, score in running}
+            held_ids = [member.decode("utf-8") for member in held_ids]
+            held = False
+            ahead_ids = []
+            if task_id in running:
+                pass
+            elif rank is not None:
+                if rank > 0:
+                    ahead_ids = await self.redis_client.zrange(queue_key, 0, rank - 1)
+                    ahead_ids = [member.decode("utf-8") for member in ahead_ids]
+            elif task_id in held_ids:
+                # 暂存的任务要等整个队列以及该用户前面暂存的任务
+                held = True
+                ahead_ids = await self.redis_client.zrange(queue_key, 0, -1)
+                ahead_ids = [member.decode("utf-8") for member in ahead_ids]
+                ahead_ids += held_ids[: held_ids.index(task_id)]
+            else:
+                return None
+
+            ahead_jobs = await self.get_json_many(keys.JOBKEY_PREFIX, ahead_ids)
+            return {
+                "size_class": size_class,
+                "duration": job.get("duration"),
+                "held": held,
+                "rtf": float(rtf) if rtf is not None else None,
+                "running_finish": running.get(task_id),
+                "class_running": [t for k, t in running.items() if k != task_id],
+                "ahead": [j.get("duration") if j else None for j in ahead_jobs],
+            }
+        except Exception as e:
+            logger.error(f"Error getting queue snapshot: {e}")
+            return None
+
+    async def observe_metrics(self, observations):
+        if not observations:
+            return
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            queue_metric_ops(pipe, observations)
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Error observing metrics: {e}")
+
+    async def get_metrics(self, size_classes):
+        """读取汇总指标，以及每个队列的排队数和处理中任务数"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        for name in METRICS:
+            pipe.hgetall(keys.METRICKEY_PREFIX + name)
+        for size_class in size_classes:
+            pipe.zcard(keys.QUEUEKEY_PREFIX + size_class)
+            pipe.zcard(keys.RUNNINGKEY_PREFIX + size_class)
+        results = await pipe.execute()
+        metrics = decode_metrics(results[: len(METRICS)])
+        counts = results[len(METRICS) :]
+        queues = {
+            size_class: {"queued": counts[2 * i], "running": counts[2 * i + 1]}
+            for i, size_class in enumerate(size_classes)
+        }
+        return metrics, queues
+
+
+# API 进程内共享的实例，连接池在应用启动时创建
+async_redis = AsyncRedisHandler()
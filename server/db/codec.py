@@ -0,0 +1,225 @@
+import json
+import math
+import struct
+import zlib
+from array import array
+
+# 每个存储块包含的片段数，按时间范围读取或编辑时只需解码/重写涉及的块
+BLOCK_SIZE = 32
+
+SEGMENT_FLOAT_FIELDS = (
+    "temperature",
+    "avg_logprob",
+    "compression_ratio",
+    "no_speech_prob",
+)
+SEGMENT_INT_COLUMNS = ("id", "seek", "start", "end", "text", "words", "tokens")
+WORD_INT_COLUMNS = ("word", "start", "end")
+SEGMENT_KNOWN_FIELDS = {"id", "seek", "start", "end", "text", "tokens", "words"}
+SEGMENT_KNOWN_FIELDS.update(SEGMENT_FLOAT_FIELDS)
+WORD_KNOWN_FIELDS = {"word", "start", "end", "probability"}
+MISSING_INT = -(2**31)
+
+
+def _ms(seconds):
+    return MISSING_INT if seconds is None else int(round(seconds * 1000))
+
+
+def _seconds(ms):
+    return None if ms == MISSING_INT else ms / 1000
+
+
+def _float(value):
+    return math.nan if value is None else float(value)
+
+
+def encode_block(segments):
+    """把一组片段编码为紧凑的列式二进制并压缩
+
+    时间戳以整数毫秒存储，概率等浮点数以 float32 存储，文本和词放入字符串表，
+    未知字段以 JSON 形式原样保留。
+    """
+    strings, string_index = [], {}
+
+    def intern(value):
+        if value not in string_index:
+            string_index[value] = len(strings)
+            strings.append(value)
+        return string_index[value]
+
+    seg_ints = {k: array("i") for k in SEGMENT_INT_COLUMNS}
+    seg_floats = {k: array("f") for k in SEGMENT_FLOAT_FIELDS}
+    word_ints = {k: array("i") for k in WORD_INT_COLUMNS}
+    word_probability = array("f")
+    tokens = array("i")
+    extra = {}
+
+    for i, segment in enumerate(segments):
+        seg_ints["id"].append(segment.get("id", MISSING_INT))
+        seg_ints["seek"].append(segment.get("seek", MISSING_INT))
+        seg_ints["start"].append(_ms(segment.get("start")))
+        seg_ints["end"].append(_ms(segment.get("end")))
+        seg_ints["text"].append(intern(segment.get("text", "")))
+        for field in SEGMENT_FLOAT_FIELDS:
+            seg_floats[field].append(_float(segment.get(field)))
+
+        segment_tokens = segment.get("tokens")
+        seg_ints["tokens"].append(-1 if segment_tokens is None else len(segment_tokens))
+        tokens.extend(segment_tokens or [])
+
+        words = segment.get("words") or []
+        seg_ints["words"].append(len(words) if "words" in segment else -1)
+        for j, word in enumerate(words):
+            word_ints["word"].append(intern(word.get("word", "")))
+            word_ints["start"].append(_ms(word.get("start")))
+            word_ints["end"].append(_ms(word.get("end")))
+            word_probability.append(_float(word.get("probability")))
+            word_extra = {k: v for k, v in word.items() if k not in WORD_KNOWN_FIELDS}
+            if word_extra:
+                segment_extra = extra.setdefault(str(i), {})
+                segment_extra.setdefault("words", {})[str(j)] = word_extra
+
+        segment_extra = {
+            k: v for k, v in segment.items() if k not in SEGMENT_KNOWN_FIELDS
+        }
+        if segment_extra:
+            extra.setdefault(str(i), {})["fields"] = segment_extra
+
+    columns = list(seg_ints.values()) + list(seg_floats.values())
+    columns += list(word_ints.values()) + [word_probability, tokens]
+    header = json.dumps(
+        {
+            "segments": len(segments),
+            "words": len(word_probability),
+            "tokens": len(tokens),
+            "strings": strings,
+            "extra": extra,
+        },
+        ensure_ascii=False,
+    ).encode("utf-8")
+
+    payload = struct.pack("<I", len(header)) + header
+    payload += b"".join(column.tobytes() for column in columns)
+    return zlib.compress(payload, 6)
+
+
+def decode_block(data):
+    payload = zlib.decompress(data)
+    (header_len,) = struct.unpack_from("<I", payload)
+    header = json.loads(payload[4 : 4 + header_len])
+    offset = 4 + header_len
+
+    def read(typecode, count):
+        nonlocal offset
+        column = array(typecode)
+        size = column.itemsize * count
+        column.frombytes(payload[offset : offset + size])
+        offset += size
+        return column
+
+    n_seg, n_words = header["segments"], header["words"]
+    seg_ints = {k: read("i", n_seg) for k in SEGMENT_INT_COLUMNS}
+    seg_floats = {k: read("f", n_seg) for k in SEGMENT_FLOAT_FIELDS}
+    word_ints = {k: read("i", n_words) for k in WORD_INT_COLUMNS}
+    word_probability = read("f", n_words)
+    tokens = read("i", header["tokens"])
+    strings, extra = header["strings"], header["extra"]
+
+    segments = []
+    word_pos = token_pos = 0
+    for i in range(n_seg):
+        segment = {}
+        if seg_ints["id"][i] != MISSING_INT:
+            segment["id"] = seg_ints["id"][i]
+        if seg_ints["seek"][i] != MISSING_INT:
+            segment["seek"] = seg_ints["seek"][i]
+        segment["start"] = _seconds(seg_ints["start"][i])
+        segment["end"] = _seconds(seg_ints["end"][i])
+        segment["text"] = strings[seg_ints["text"][i]]
+
+        token_count = seg_ints["tokens"][i]
+        if token_count >= 0:
+            segment["tokens"] = tokens[token_pos : token_pos + token_count].tolist()
+            token_pos += token_count
+        for field in SEGMENT_FLOAT_FIELDS:
+            value = seg_floats[field][i]
+            if not math.isnan(value):
+                segment[field] = round(value, 6)
+
+        segment_extra = extra.get(str(i), {})
+        word_count = seg_ints["words"][i]
+        if word_count >= 0:
+            words = []
+            word_extra = segment_extra.get("words", {})
+            for j in range(word_count):
+                k = word_pos + j
+                word = {
+                    "word": strings[word_ints["word"][k]],
+                    "start": _seconds(word_ints["start"][k]),
+                    "end": _seconds(word_ints["end"][k]),
+                }
+                if not math.isnan(word_probability[k]):
+                    word["probability"] = round(word_probability[k], 6)
+                word.update(word_extra.get(str(j), {}))
+                words.append(word)
+            word_pos += word_count
+            segment["words"] = words
+        segment.update(segment_extra.get("fields", {}))
+        segments.append(segment)
+    return segments
+
+
+def block_text(segments):
+    return "\n\n".join(segment.get("text", "") for segment in segments)
+
+
+def block_info(segments):
+    if not segments:
+        # 编辑合并后可能出现空块，保留块号不变，读取时跳过
+        return {"start": 0, "end": 0, "count": 0}
+    return {
+        "start": min(s["start"] for s in segments),
+        "end": max(s["end"] for s in segments),
+        "count": len(segments),
+    }
+
+
+def encode_text(segments):
+    return zlib.compress(block_text(segments).encode("utf-8"))
+
+
+def pack_segments(segments, block_size=BLOCK_SIZE):
+    """按块编码全部片段
+
+    返回 (块索引, {块号: 片段数据}, {块号: 文本数据}, {片段ID: 块号})。
+    """
+    blocks, segment_blocks, text_blocks, locate = [], {}, {}, {}
+    for block_no, i in enumerate(range(0, len(segments), block_size)):
+        block = segments[i : i + block_size]
+        blocks.append(block_info(block))
+        segment_blocks[block_no] = encode_block(block)
+        text_blocks[block_no] = encode_text(block)
+        for segment in block:
+            if "id" in segment:
+                locate[segment["id"]] = block_no
+    return blocks, segment_blocks, text_blocks, locate
+
+
+def unpack_text(blocks, text_blocks):
+    texts = []
+    for block_no, block in enumerate(blocks):
+        data = text_blocks.get(block_no)
+        if data and block["count"]:
+            texts.append(zlib.decompress(data).decode("utf-8"))
+    return "\n\n".join(texts)
+
+
+def blocks_in_range(blocks, start=None, end=None):
+    """返回与时间范围 [start, end] 有交集的块号"""
+    return [
+        block_no
+        for block_no, block in enumerate(blocks)
+        if block["count"]
+        and (start is None or block["end"] >= start)
+        and (end is None or block["start"] <= end)
+    ]
@@ -0,0 +1,62 @@
+# Redis 键结构，API 进程（异步客户端）与 Celery worker（同步客户端）共用
+
+FILEKEY_PREFIX = "cutai:files:"
+TASKKEY_PREFIX = "cutai:tasks:"
+SEGMENTS_SUFFIX = ":segments"  # 按块存储的压缩片段
+TEXT_SUFFIX = ":text"  # 按块存储的压缩文本
+SEGIDX_SUFFIX = ":segidx"  # 片段ID -> 块号
+EXPORTS_SUFFIX = ":exports"  # 按版本缓存的字幕导出结果
+TASK_ID_LIST_KEY = "cutai:task_id_list"  # 全局任务ID列表的键
+UPLOADKEY_PREFIX = "cutai:uploads:"
+SUMMARYKEY_PREFIX = "cutai:task_summary:"  # 任务摘要，列表页只读这个
+TASK_INDEX_KEY = "cutai:task_index"  # 按更新时间排序的全部任务
+TASK_STATE_INDEX_PREFIX = "cutai:task_index:"  # 按状态分组的任务索引
+TASK_STATES = ("PENDING", "PROGRESS", "SUCCESS", "FAILURE")
+EVENTKEY_PREFIX = "cutai:events:"  # 每个任务的进度事件流
+COUNTERKEY_PREFIX = "cutai:counters:"
+PARTIALKEY_PREFIX = "cutai:partials:"  # 转写过程中已完成的片段
+PARTIAL_WINDOWS_SUFFIX = ":windows"  # 分发窗口尚未按顺序输出的中间结果
+CHECKPOINTKEY_PREFIX = "cutai:checkpoints:"  # 已完成窗口的片段和解码上下文，用于断点续转
+CANCELKEY_PREFIX = "cutai:cancel:"  # 已请求取消的任务
+CACHEKEY_PREFIX = "cutai:stt_cache:"
+CACHE_INDEX_KEY = "cutai:stt_cache_index"  # 按最近访问时间排序的缓存键
+CACHE_STATS_KEY = "cutai:stt_cache_stats"
+JOBKEY_PREFIX = "cutai:jobs:"  # 排队任务的调度信息
+QUEUEKEY_PREFIX = "cutai:queue:"  # 每个队列中已投递、未开始的任务，按投递时间排序
+RUNNINGKEY_PREFIX = "cutai:running:"  # 每个队列中正在处理的任务，按预计完成时间排序
+INFLIGHTKEY_PREFIX = "cutai:inflight:"  # 每个用户在每个队列中已投递的任务数
+HELDKEY_PREFIX = "cutai:held:"  # 每个用户超出名额暂存的任务
+RTF_KEY = "cutai:rtf"  # 每个队列观测到的实时率
+METRICKEY_PREFIX = "cutai:metrics:"  # 各 worker 汇总的指标，每个指标一个 hash
+SEARCH_TERM_PREFIX = "cutai:search:term:"  # 倒排索引：词项 -> {任务ID:片段ID: 词频}
+SEARCH_DOC_PREFIX = "cutai:search:doc:"  # 每个任务已建索引的片段词项，用于增量更新
+SEARCH_TMP_PREFIX = "cutai:search:tmp:"  # 查询时的临时交集结果
+SEARCH_STATS_KEY = "cutai:search:stats"  # 已建索引的片段总数等
+BATCHKEY_PREFIX = "cutai:batches:"  # 批量提交的任务列表
+RANGEJOBKEY_PREFIX = "cutai:range_jobs:"  # 按时间范围重新转写的任务
+CLIPKEY_PREFIX = "cutai:clips:"  # 剪辑导出任务的范围、进度和结果
+PEAKSKEY_PREFIX = "cutai:peaks:"  # 每个文件的波形峰值元数据，各级峰值在 :{级别} 下
+
+TASK_SUFFIXES = (SEGMENTS_SUFFIX, TEXT_SUFFIX, SEGIDX_SUFFIX, EXPORTS_SUFFIX)
+
+
+def task_keys(task_id):
+    """任务元数据键及其片段、文本、片段索引、导出缓存 hash 的键"""
+    key = TASKKEY_PREFIX + task_id
+    return [key] + [key + suffix for suffix in TASK_SUFFIXES]
+
+
+def state_index_key(state=None):
+    return TASK_STATE_INDEX_PREFIX + state if state else TASK_INDEX_KEY
+
+
+def user_slot_keys(size_class, user):
+    """用户在某个队列中的已投递计数键和暂存列表键"""
+    suffix = f"{size_class}:{user}"
+    return INFLIGHTKEY_PREFIX + suffix, HELDKEY_PREFIX + suffix
+
+
+def peaks_keys(file_id, level_count):
+    """文件波形峰值的元数据键及各级峰值数据的键"""
+    key = PEAKSKEY_PREFIX + file_id
+    return [key] + [f"{key}:{level}" for level in range(level_count)]
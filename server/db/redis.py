@@ -1,8 +1,392 @@
 import json
 import redis
 from config.config_loader import REDIS_CONFIG
+from db import keys
+from db.codec import (
+    pack_segments,
+    encode_block,
+    encode_text,
+    decode_block,
+    block_info,
+    unpack_text,
+    blocks_in_range,
+)
+from utils.transcript import apply_segment_ops
+from utils.scheduling import DEFAULT_RTF, update_rtf
+from utils.metrics import METRICS, metric_fields
+from utils.search import segment_terms
 from loguru import logger
 import os
+import time
+from datetime import datetime
+
+
+class VersionConflict(Exception):
+    """转写稿已被其他编辑修改，提交的版本号与当前版本不一致"""
+
+    def __init__(self, current_version):
+        super().__init__(f"Transcript version conflict, current: {current_version}")
+        self.current_version = current_version
+
+
+def build_task_summary(task_info):
+    """从完整任务信息中提取列表页需要的摘要字段"""
+    return {
+        "file_id": task_info.get("file_id"),
+        "file_name": task_info.get("file_name"),
+        "file_type": task_info.get("file_type"),
+        "file_path": task_info.get("file_path"),
+        "duration": task_info.get("duration"),
+        "completion_time": task_info.get("completion_time"),
+        "state": task_info.get("state"),
+    }
+
+
+def pack_task(task_info):
+    """把完整任务拆分为 (元数据, {块号: 片段数据}, {块号: 文本数据}, {片段ID: 块号})
+
+    元数据中记录块索引、片段总数、版本号和下一个可用的片段ID。
+    """
+    meta = {k: v for k, v in task_info.items() if k not in ("segments", "text")}
+    segments = task_info["segments"]
+    blocks, segment_blocks, text_blocks, locate = pack_segments(segments)
+    meta["blocks"] = blocks
+    meta["segment_count"] = len(segments)
+    meta["version"] = task_info.get("version", 1)
+    meta["next_segment_id"] = max(locate, default=-1) + 1
+    return meta, segment_blocks, text_blocks, locate
+
+
+def unpack_task(meta, segment_blocks, text_blocks):
+    """由元数据和 HGETALL 读出的两个 hash 还原完整任务"""
+    segment_blocks = {int(k): v for k, v in segment_blocks.items()}
+    text_blocks = {int(k): v for k, v in text_blocks.items()}
+
+    internal = ("blocks", "segment_count", "next_segment_id")
+    task_info = {k: v for k, v in meta.items() if k not in internal}
+    task_info["text"] = unpack_text(meta["blocks"], text_blocks)
+    task_info["segments"] = []
+    for block_no in range(len(meta["blocks"])):
+        task_info["segments"].extend(decode_block(segment_blocks[block_no]))
+    return task_info
+
+
+def queue_task_writes(pipe, task_id, task_info, ttl):
+    """把写入任务信息的命令放入 pipeline，见 RedisHandler.set_stt_task"""
+    key, *suffix_keys = keys.task_keys(task_id)
+    if "segments" not in task_info:
+        pipe.setex(key, ttl, json.dumps(task_info))
+        return
+
+    meta, segment_blocks, text_blocks, locate = pack_task(task_info)
+    pipe.setex(key, ttl, json.dumps(meta))
+    pipe.delete(*suffix_keys)
+    if meta["blocks"]:
+        pipe.hset(key + keys.SEGMENTS_SUFFIX, mapping=segment_blocks)
+        pipe.hset(key + keys.TEXT_SUFFIX, mapping=text_blocks)
+        if locate:
+            pipe.hset(key + keys.SEGIDX_SUFFIX, mapping=locate)
+        for suffix_key in suffix_keys:
+            pipe.expire(suffix_key, ttl)
+
+
+def replace_segments(meta, segments):
+    """用新的片段整体替换转写稿，返回版本号加一后的完整任务信息"""
+    internal = ("blocks", "segment_count", "next_segment_id")
+    task_info = {k: v for k, v in meta.items() if k not in internal}
+    task_info["segments"] = segments
+    task_info["text"] = "\n\n".join([s["text"] for s in segments])
+    task_info["version"] = meta.get("version", 1) + 1
+    return task_info
+
+
+def filter_segments(segments, start=None, end=None):
+    return [
+        segment
+        for segment in segments
+        if (start is None or segment["end"] >= start)
+        and (end is None or segment["start"] <= end)
+    ]
+
+
+def patch_segment_ids(ops):
+    """编辑操作引用的全部片段ID"""
+    segment_ids = set()
+    for op in ops:
+        for name in ("segment_id", "after_segment_id", "before_segment_id"):
+            if op.get(name) is not None:
+                segment_ids.add(op[name])
+        segment_ids.update(op.get("segment_ids") or [])
+    return sorted(segment_ids)
+
+
+def apply_patch(meta, blocks, locate, ops):
+    """在已加载的块上执行编辑并更新元数据
+
+    返回 (需重写的片段块, 需重写的文本块, 片段索引更新, 被删除的片段ID, 接口返回值)。
+    """
+    touched, next_id, changed, removed = apply_segment_ops(
+        blocks, meta["blocks"], locate, ops, meta["next_segment_id"]
+    )
+
+    segment_updates, text_updates = {}, {}
+    for block_no in touched:
+        segments = blocks[block_no]
+        meta["segment_count"] += len(segments) - meta["blocks"][block_no]["count"]
+        meta["blocks"][block_no] = block_info(segments)
+        segment_updates[block_no] = encode_block(segments)
+        text_updates[block_no] = encode_text(segments)
+    meta["version"] = meta.get("version", 1) + 1
+    meta["next_segment_id"] = next_id
+
+    changed_segments = [
+        segment
+        for block_no in sorted(touched)
+        for segment in blocks[block_no]
+        if segment.get("id") in changed
+    ]
+    result = {
+        "version": meta["version"],
+        "segments": changed_segments,
+        "removed": sorted(removed),
+    }
+    segidx_updates = {segment_id: locate[segment_id] for segment_id in changed}
+    return segment_updates, text_updates, segidx_updates, removed, result
+
+
+def decode_events(streams):
+    events = []
+    for _, entries in streams or []:
+        for event_id, fields in entries:
+            events.append((event_id.decode("utf-8"), json.loads(fields[b"data"])))
+    return events
+
+
+def number_partials(entries, after):
+    """中间结果列表的片段按下标编号，分发窗口各自从 0 编号的片段ID不对外返回"""
+    segments = []
+    for offset, entry in enumerate(entries):
+        segment = json.loads(entry)
+        segment["id"] = after + 1 + offset
+        segments.append(segment)
+    return segments
+
+
+def decode_cache_stats(stats, entries):
+    stats = {k.decode("utf-8"): int(v) for k, v in stats.items()}
+    stats.setdefault("hits", 0)
+    stats.setdefault("misses", 0)
+    stats.setdefault("evictions", 0)
+    stats["entries"] = entries
+    return stats
+
+
+def queue_metric_ops(pipe, observations):
+    """把 [(指标名, 标签, 值), ...] 写入 pipeline，多个进程的观测在 Redis 中累加"""
+    for name, labels, value in observations:
+        for field, amount in metric_fields(name, labels, value):
+            pipe.hincrbyfloat(keys.METRICKEY_PREFIX + name, field, amount)
+
+
+def decode_metrics(hashes):
+    return {
+        name: {k.decode("utf-8"): float(v) for k, v in data.items()}
+        for name, data in zip(METRICS, hashes)
+    }
+
+
+def decode_search_doc(entries):
+    """任务已建索引的片段词项：HGETALL/HMGET 的结果 -> {片段ID: {词项: 次数}}"""
+    return {
+        int(segment_id): json.loads(terms)
+        for segment_id, terms in entries.items()
+        if terms is not None
+    }
+
+
+def search_index_ops(pipe, task_id, old, new):
+    """把片段的索引词项从 old 更新为 new，两者均为 {片段ID: {词项: 次数}}
+
+    只改写内容有变化的片段；old 中有而 new 中没有的片段从索引中删除。
+    """
+    doc_key = keys.SEARCH_DOC_PREFIX + task_id
+    for segment_id, terms in old.items():
+        if new.get(segment_id) == terms:
+            continue
+        member = f"{task_id}:{segment_id}"
+        for term in terms:
+            pipe.zrem(keys.SEARCH_TERM_PREFIX + term, member)
+    for segment_id, terms in new.items():
+        if old.get(segment_id) == terms:
+            continue
+        member = f"{task_id}:{segment_id}"
+        for term, count in terms.items():
+            pipe.zadd(keys.SEARCH_TERM_PREFIX + term, {member: count})
+        pipe.hset(doc_key, segment_id, json.dumps(terms, ensure_ascii=False))
+    removed = [segment_id for segment_id in old if segment_id not in new]
+    if removed:
+        pipe.hdel(doc_key, *removed)
+    delta = len(set(new) - set(old)) - len(removed)
+    if delta:
+        pipe.hincrby(keys.SEARCH_STATS_KEY, "segments", delta)
+
+
+def parse_cursor(cursor):
+    """游标格式为 "<score>:<task_id>"，返回 (最大分数, 上一页最后一个任务ID)"""
+    if cursor:
+        max_score, last_id = cursor.split(":", 1)
+        return max_score, last_id
+    return "+inf", None
+
+
+def page_entries(flat):
+    """把脚本返回的 [任务ID, 分数, ...] 转为 [(任务ID, 分数)]"""
+    return [(flat[i], float(flat[i + 1])) for i in range(0, len(flat), 2)]
+
+
+def decode_summary(member, summary):
+    summary = {k.decode("utf-8"): v.decode("utf-8") for k, v in summary.items()}
+    if "duration" in summary:
+        summary["duration"] = float(summary["duration"])
+    summary["task_id"] = member.decode("utf-8")
+    return summary
+
+
+def next_page_cursor(entries, limit):
+    if len(entries) <= limit:
+        return None
+    member, score = entries[limit - 1]
+    return f"{repr(score)}:{member.decode('utf-8')}"
+
+
+# 读取游标之后的一页任务。索引按 (分数, 任务ID) 倒序排列，游标指向上一页最后一个任务：
+# 它仍以相同分数在索引中时从它的下一名开始；已被删除或改变了状态时，
+# 跳过分数更高的任务以及同分数中任务ID不小于它的任务（按字节比较，与 Redis 的排序一致）
+# KEYS: 状态索引
+# ARGV: 游标分数, 游标任务ID, 读取条数
+PAGE_SUMMARIES_SCRIPT = """
+local function before(a, b)
+    for i = 1, math.min(#a, #b) do
+        local x, y = string.byte(a, i), string.byte(b, i)
+        if x ~= y then
+            return x < y
+        end
+    end
+    return #a < #b
+end
+local count = tonumber(ARGV[3])
+local start
+local rank = redis.call('ZREVRANK', KEYS[1], ARGV[2])
+local score = redis.call('ZSCORE', KEYS[1], ARGV[2])
+if rank and tonumber(score) == tonumber(ARGV[1]) then
+    start = rank + 1
+else
+    start = redis.call('ZCOUNT', KEYS[1], '(' .. ARGV[1], '+inf')
+    local ties = redis.call('ZREVRANGEBYSCORE', KEYS[1], ARGV[1], ARGV[1])
+    for _, member in ipairs(ties) do
+        if not before(ARGV[2], member) then
+            break
+        end
+        start = start + 1
+    end
+end
+return redis.call('ZREVRANGE', KEYS[1], start, start + count - 1, 'WITHSCORES')
+"""
+
+
+# 投递前检查用户在该队列的名额：有名额则计数并进入排队集合，否则放入暂存列表；
+# 暂存的任务可能要等很久才轮到，调度信息和暂存列表不设过期时间，轮到时再设置
+# KEYS: 已投递计数, 暂存列表, 排队集合, 任务调度信息
+# ARGV: 名额上限, 任务ID, 当前时间, 调度信息 JSON, 过期时间
+ADMIT_JOB_SCRIPT = """
+local n = tonumber(redis.call('GET', KEYS[1]) or '0')
+if n < tonumber(ARGV[1]) then
+    redis.call('SET', KEYS[4], ARGV[4], 'EX', ARGV[5])
+    redis.call('INCR', KEYS[1])
+    redis.call('EXPIRE', KEYS[1], ARGV[5])
+    redis.call('ZADD', KEYS[3], ARGV[3], ARGV[2])
+    return 1
+end
+redis.call('SET', KEYS[4], ARGV[4])
+redis.call('RPUSH', KEYS[2], ARGV[2])
+redis.call('PERSIST', KEYS[2])
+return 0
+"""
+
+# 任务结束后把名额交给该用户暂存的下一个任务，没有暂存任务时归还名额；
+# 跳过调度信息已不存在的暂存任务（例如已被删除）；
+# 只有第一次调用生效，重复调用（例如失败回调）返回空
+# KEYS: 处理中集合, 排队集合, 已投递计数, 暂存列表
+# ARGV: 任务ID, 当前时间, 调度信息键前缀, 过期时间
+RELEASE_SLOT_SCRIPT = """
+local removed = redis.call('ZREM', KEYS[1], ARGV[1])
+removed = removed + redis.call('ZREM', KEYS[2], ARGV[1])
+if removed == 0 then
+    return false
+end
+local next_id = redis.call('LPOP', KEYS[4])
+while next_id do
+    if redis.call('EXPIRE', ARGV[3] .. next_id, ARGV[4]) == 1 then
+        redis.call('ZADD', KEYS[2], ARGV[2], next_id)
+        redis.call('EXPIRE', KEYS[3], ARGV[4])
+        return next_id
+    end
+    next_id = redis.call('LPOP', KEYS[4])
+end
+if tonumber(redis.call('GET', KEYS[3]) or '0') > 0 then
+    redis.call('DECR', KEYS[3])
+end
+return false
+"""
+
+
+# 分发窗口的中间结果按窗口顺序输出：当前输出到的窗口（head）直接追加到中间结果列表，
+# 后面的窗口先暂存，head 窗口完成后依次输出下一个窗口已暂存的部分；
+# 每个窗口内的小窗口（chunk）按序号暂存，重复提交已输出的小窗口时忽略
+# KEYS: 中间结果列表, 窗口状态 hash
+# ARGV: 窗口序号, 小窗口序号（-1 表示没有片段）, 窗口是否完成, 过期时间, 片段 JSON...
+PUBLISH_WINDOW_PARTIAL_SCRIPT = """
+local w = ARGV[1]
+local chunk = tonumber(ARGV[2])
+local published = tonumber(redis.call('HGET', KEYS[2], 'pub:' .. w) or '0')
+if chunk >= published then
+    local n = #ARGV - 4
+    local prefix = 'seg:' .. w .. ':' .. chunk .. ':'
+    for i = 1, n do
+        redis.call('HSET', KEYS[2], prefix .. i, ARGV[4 + i])
+    end
+    redis.call('HSET', KEYS[2], 'count:' .. w .. ':' .. chunk, n)
+end
+if ARGV[3] == '1' then
+    redis.call('HSET', KEYS[2], 'done:' .. w, 1)
+end
+local head = tonumber(redis.call('HGET', KEYS[2], 'head') or '0')
+while true do
+    local pub = tonumber(redis.call('HGET', KEYS[2], 'pub:' .. head) or '0')
+    while true do
+        local count = redis.call('HGET', KEYS[2], 'count:' .. head .. ':' .. pub)
+        if not count then
+            break
+        end
+        for i = 1, tonumber(count) do
+            local field = 'seg:' .. head .. ':' .. pub .. ':' .. i
+            redis.call('RPUSH', KEYS[1], redis.call('HGET', KEYS[2], field))
+            redis.call('HDEL', KEYS[2], field)
+        end
+        redis.call('HDEL', KEYS[2], 'count:' .. head .. ':' .. pub)
+        pub = pub + 1
+    end
+    redis.call('HSET', KEYS[2], 'pub:' .. head, pub)
+    if not redis.call('HGET', KEYS[2], 'done:' .. head) then
+        break
+    end
+    head = head + 1
+end
+redis.call('HSET', KEYS[2], 'head', head)
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+return head
+"""
 
 
 class RedisHandler:
@@ -19,9 +403,6 @@ class RedisHandler:
         self.password = password
         self.redis_pool = None
         self.redis_client = None
-        self.FILEKEY_PREFIX = "cutai:files:"
-        self.TASKKEY_PREFIX = "cutai:tasks:"
-        self.TASK_ID_LIST_KEY = "cutai:task_id_list" # 全局任务ID列表的键
         self.connect()
 
     def connect(self):
@@ -32,10 +413,14 @@ class RedisHandler:
             password=self.password,
         )
         self.redis_client = redis.Redis(connection_pool=self.redis_pool)
-        if self.redis_client.ping():
-            logger.info("redis connect success")
-        else:
-            logger.error("redis connect failed")
+        try:
+            if self.redis_client.ping():
+                logger.info("redis connect success")
+            else:
+                logger.error("redis connect failed")
+        except redis.ConnectionError as e:
+            # worker 导入任务模块时 Redis 可能尚未就绪，连接池在执行命令时会重新连接
+            logger.error(f"redis connect failed: {e}")
 
     def disconnect(self):
         if self.redis_client:
@@ -62,14 +447,14 @@ class RedisHandler:
     def add_file(self, file_id, file_info):
         try:
             self.redis_client.setex(
-                self.FILEKEY_PREFIX + file_id, 3600 * 24 * 7, json.dumps(file_info)
+                keys.FILEKEY_PREFIX + file_id, 3600 * 24 * 7, json.dumps(file_info)
             )
         except Exception as e:
             logger.error(f"Error adding file: {e}")
 
     def get_file(self, file_id):
         try:
-            file_info_str = self.redis_client.get(self.FILEKEY_PREFIX + file_id)
+            file_info_str = self.redis_client.get(keys.FILEKEY_PREFIX + file_id)
             if file_info_str:
                 return json.loads(file_info_str)
             return None
@@ -83,48 +468,703 @@ class RedisHandler:
         except Exception as e:
             logger.error(f"Error deleting file: {e}")
 
-    def set_stt_task(self, task_id, task_info):
+    def set_peaks(self, file_id, sample_rate, duration, levels, ttl=3600 * 24 * 7):
+        """写入多级波形峰值，levels 为 PeakBuilder.finish() 的结果"""
+        try:
+            meta = {
+                "sample_rate": sample_rate,
+                "duration": duration,
+                "levels": [
+                    {"samples_per_peak": samples_per_peak, "length": len(data) // 2}
+                    for samples_per_peak, data in levels
+                ],
+            }
+            key, *level_keys = keys.peaks_keys(file_id, len(levels))
+            pipe = self.redis_client.pipeline()
+            pipe.setex(key, ttl, json.dumps(meta))
+            for level_key, (_, data) in zip(level_keys, levels):
+                pipe.setex(level_key, ttl, data)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Error setting peaks: {e}")
+
+    def set_upload(self, upload_id, upload_info, ttl=3600 * 24):
         try:
             self.redis_client.setex(
-                self.TASKKEY_PREFIX + task_id, 3600 * 24 * 7, json.dumps(task_info)
+                keys.UPLOADKEY_PREFIX + upload_id, ttl, json.dumps(upload_info)
             )
         except Exception as e:
-            logger.error(f"Error setting STT task: {e}")
+            logger.error(f"Error setting upload: {e}")
 
-    def get_stt_task(self, task_id):
+    def get_upload(self, upload_id):
+        try:
+            upload_info_str = self.redis_client.get(keys.UPLOADKEY_PREFIX + upload_id)
+            if upload_info_str:
+                return json.loads(upload_info_str)
+            return None
+        except Exception as e:
+            logger.error(f"Error getting upload: {e}")
+            return None
+
+    def delete_upload(self, upload_id):
+        try:
+            self.redis_client.delete(keys.UPLOADKEY_PREFIX + upload_id)
+        except Exception as e:
+            logger.error(f"Error deleting upload: {e}")
+
+    def set_clip(self, clip_id, clip_info, ttl=3600 * 24):
+        try:
+            self.redis_client.setex(
+                keys.CLIPKEY_PREFIX + clip_id, ttl, json.dumps(clip_info)
+            )
+        except Exception as e:
+            logger.error(f"Error setting clip: {e}")
+
+    def set_range_job(self, job_id, job_info, ttl=3600 * 24):
+        try:
+            self.redis_client.setex(
+                keys.RANGEJOBKEY_PREFIX + job_id, ttl, json.dumps(job_info)
+            )
+        except Exception as e:
+            logger.error(f"Error setting range job: {e}")
+
+    def get_range_job(self, job_id):
+        try:
+            job_info_str = self.redis_client.get(keys.RANGEJOBKEY_PREFIX + job_id)
+            if job_info_str:
+                return json.loads(job_info_str)
+            return None
+        except Exception as e:
+            logger.error(f"Error getting range job: {e}")
+            return None
+
+    def get_clip(self, clip_id):
+        try:
+            clip_info_str = self.redis_client.get(keys.CLIPKEY_PREFIX + clip_id)
+            if clip_info_str:
+                return json.loads(clip_info_str)
+            return None
+        except Exception as e:
+            logger.error(f"Error getting clip: {e}")
+            return None
+
+    def set_stt_task(self, task_id, task_info, ttl=3600 * 24 * 7):
+        """写入任务信息
+
+        含 segments 时按块拆分存储：元数据（含块索引）为 JSON，片段和文本分别以
+        压缩二进制存入两个 hash，读取时可以只取元数据、文本或某个时间范围的片段。
+        片段格式不完整或写入失败时抛出异常，由调用方决定任务状态。
+        """
+        pipe = self.redis_client.pipeline()
+        queue_task_writes(pipe, task_id, task_info, ttl)
+        pipe.execute()
+
+    def get_stt_task_meta(self, task_id):
+        """只读取任务元数据，不含文本和片段"""
         try:
-            task_info_str = self.redis_client.get(self.TASKKEY_PREFIX + task_id)
+            task_info_str = self.redis_client.get(keys.TASKKEY_PREFIX + task_id)
             if task_info_str:
                 return json.loads(task_info_str)
             return None
+        except Exception as e:
+            logger.error(f"Error getting STT task meta: {e}")
+            return None
+
+    def get_stt_task(self, task_id):
+        try:
+            meta = self.get_stt_task_meta(task_id)
+            if meta is None or "blocks" not in meta:
+                # 进行中的任务，或旧版本整体存储的任务
+                return meta
+
+            key = keys.TASKKEY_PREFIX + task_id
+            pipe = self.redis_client.pipeline()
+            pipe.hgetall(key + keys.SEGMENTS_SUFFIX)
+            pipe.hgetall(key + keys.TEXT_SUFFIX)
+            return unpack_task(meta, *pipe.execute())
         except Exception as e:
             logger.error(f"Error getting STT task: {e}")
             return None
 
+    def get_stt_text(self, task_id):
+        try:
+            meta = self.get_stt_task_meta(task_id)
+            if meta is None or "blocks" not in meta:
+                return meta.get("text") if meta else None
+            text_blocks = self.redis_client.hgetall(
+                keys.TASKKEY_PREFIX + task_id + keys.TEXT_SUFFIX
+            )
+            return unpack_text(
+                meta["blocks"], {int(k): v for k, v in text_blocks.items()}
+            )
+        except Exception as e:
+            logger.error(f"Error getting STT text: {e}")
+            return None
+
+    def get_stt_segments(self, task_id, start=None, end=None):
+        """读取与时间范围 [start, end] 有交集的片段，只解码涉及的存储块"""
+        try:
+            meta = self.get_stt_task_meta(task_id)
+            if meta is None:
+                return None
+            if "blocks" not in meta:
+                segments = meta.get("segments", [])
+            else:
+                block_nos = blocks_in_range(meta["blocks"], start, end)
+                if not block_nos:
+                    return []
+                segment_blocks = self.redis_client.hmget(
+                    keys.TASKKEY_PREFIX + task_id + keys.SEGMENTS_SUFFIX, block_nos
+                )
+                segments = []
+                for data in segment_blocks:
+                    segments.extend(decode_block(data))
+            return filter_segments(segments, start, end)
+        except Exception as e:
+            logger.error(f"Error getting STT segments: {e}")
+            return None
+
+    def patch_stt_segments(self, task_id, ops, base_version):
+        """在 base_version 版本上执行片段编辑操作，只重写涉及的存储块
+
+        版本号不一致或提交期间被其他编辑修改时抛出 VersionConflict，操作不合法时
+        抛出 PatchError；任务不存在时返回 None。成功时返回新版本号、被修改或新增的
+        片段以及被删除的片段ID。
+        """
+        key = keys.TASKKEY_PREFIX + task_id
+        with self.redis_client.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                meta_str = pipe.get(key)
+                if not meta_str:
+                    return None
+                meta = json.loads(meta_str)
+                if "blocks" not in meta:
+                    # 旧版本整体存储的任务，先转换为分块存储
+                    pipe.unwatch()
+                    task_info = self.get_stt_task(task_id)
+                    if task_info is None or "segments" not in task_info:
+                        # 期间任务已过期，或仍在处理中
+                        return None
+                    self.set_stt_task(task_id, task_info)
+                    return self.patch_stt_segments(task_id, ops, base_version)
+
+                version = meta.get("version", 1)
+                if version != base_version:
+                    raise VersionConflict(version)
+
+                segment_ids = patch_segment_ids(ops)
+                block_nos = pipe.hmget(key + keys.SEGIDX_SUFFIX, segment_ids)
+                locate = {
+                    segment_id: int(block_no)
+                    for segment_id, block_no in zip(segment_ids, block_nos)
+                    if block_no is not None
+                }
+                needed = sorted(set(locate.values()))
+                data = pipe.hmget(key + keys.SEGMENTS_SUFFIX, needed) if needed else []
+                blocks = {b: decode_block(d) for b, d in zip(needed, data)}
+
+                segment_updates, text_updates, segidx_updates, removed, result = (
+                    apply_patch(meta, blocks, locate, ops)
+                )
+
+                pipe.multi()
+                pipe.set(key, json.dumps(meta), keepttl=True)
+                if segment_updates:
+                    pipe.hset(key + keys.SEGMENTS_SUFFIX, mapping=segment_updates)
+                    pipe.hset(key + keys.TEXT_SUFFIX, mapping=text_updates)
+                if segidx_updates:
+                    pipe.hset(key + keys.SEGIDX_SUFFIX, mapping=segidx_updates)
+                if removed:
+                    pipe.hdel(key + keys.SEGIDX_SUFFIX, *removed)
+                pipe.execute()
+                return result
+            except redis.WatchError:
+                current = self.get_stt_task_meta(task_id) or {}
+                raise VersionConflict(current.get("version"))
+
+    def replace_stt_segments(
+        self, task_id, segments, base_version=None, ttl=3600 * 24 * 7
+    ):
+        """整体替换转写片段，返回新版本号；任务不存在时返回 None
+
+        与 patch_stt_segments 一样以 WATCH/MULTI 做乐观并发控制：提交了 base_version
+        且与当前版本不一致，或提交期间被其他编辑修改时抛出 VersionConflict。
+        """
+        key = keys.TASKKEY_PREFIX + task_id
+        with self.redis_client.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                meta_str = pipe.get(key)
+                if not meta_str:
+                    return None
+                meta = json.loads(meta_str)
+                version = meta.get("version", 1)
+                if base_version is not None and version != base_version:
+                    raise VersionConflict(version)
+
+                task_info = replace_segments(meta, segments)
+                pipe.multi()
+                queue_task_writes(pipe, task_id, task_info, ttl)
+                pipe.execute()
+                return task_info["version"]
+            except redis.WatchError:
+                current = self.get_stt_task_meta(task_id) or {}
+                raise VersionConflict(current.get("version"))
+
     def delete_stt_task(self, task_id):
         try:
-            self.redis_client.delete(self.TASKKEY_PREFIX + task_id)
+            self.redis_client.delete(*keys.task_keys(task_id))
         except Exception as e:
             logger.error(f"Error deleting STT task: {e}")
 
     def remove_task_from_global_list(self, task_id):
         try:
             # 从列表中删除所有值为 task_id 的元素
-            self.redis_client.lrem(self.TASK_ID_LIST_KEY, 0, task_id)
+            self.redis_client.lrem(keys.TASK_ID_LIST_KEY, 0, task_id)
         except Exception as e:
             logger.error(f"Error removing task ID from global list: {e}")
 
     def add_task_to_global_list(self, task_id):
         try:
             # 使用 LPUSH 将新任务ID添加到列表头部，这样最新的任务总在最前面
-            self.redis_client.lpush(self.TASK_ID_LIST_KEY, task_id)
+            self.redis_client.lpush(keys.TASK_ID_LIST_KEY, task_id)
         except Exception as e:
             logger.error(f"Error adding task ID to global list: {e}")
 
     def get_all_task_ids_from_global_list(self, start=0, end=-1):
         try:
-            task_ids = self.redis_client.lrange(self.TASK_ID_LIST_KEY, start, end)
+            task_ids = self.redis_client.lrange(keys.TASK_ID_LIST_KEY, start, end)
             return [task_id.decode("utf-8") for task_id in task_ids]
         except Exception as e:
             logger.error(f"Error retrieving task IDs from global list: {e}")
             return []
+
+    def get_cached_transcript(self, cache_key, ttl=3600 * 24 * 7):
+        try:
+            result_str = self.redis_client.get(keys.CACHEKEY_PREFIX + cache_key)
+            pipe = self.redis_client.pipeline()
+            if result_str:
+                # 命中后刷新访问时间和过期时间，淘汰时按最近最少使用顺序
+                pipe.zadd(keys.CACHE_INDEX_KEY, {cache_key: time.time()})
+                pipe.expire(keys.CACHEKEY_PREFIX + cache_key, ttl)
+                pipe.hincrby(keys.CACHE_STATS_KEY, "hits", 1)
+            else:
+                pipe.hincrby(keys.CACHE_STATS_KEY, "misses", 1)
+            pipe.execute()
+            return json.loads(result_str) if result_str else None
+        except Exception as e:
+            logger.error(f"Error getting cached transcript: {e}")
+            return None
+
+    def set_cached_transcript(
+        self, cache_key, result, ttl=3600 * 24 * 7, max_entries=1000
+    ):
+        try:
+            now = time.time()
+            pipe = self.redis_client.pipeline()
+            pipe.setex(keys.CACHEKEY_PREFIX + cache_key, ttl, json.dumps(result))
+            pipe.zadd(keys.CACHE_INDEX_KEY, {cache_key: now})
+            # 索引中超过 TTL 未访问的条目对应的键已过期，直接移除
+            pipe.zremrangebyscore(keys.CACHE_INDEX_KEY, "-inf", now - ttl)
+            pipe.zcard(keys.CACHE_INDEX_KEY)
+            size = pipe.execute()[-1]
+
+            excess = size - max_entries
+            if excess > 0:
+                evicted = self.redis_client.zrange(keys.CACHE_INDEX_KEY, 0, excess - 1)
+                pipe = self.redis_client.pipeline()
+                pipe.delete(*[keys.CACHEKEY_PREFIX + k.decode("utf-8") for k in evicted])
+                pipe.zrem(keys.CACHE_INDEX_KEY, *evicted)
+                pipe.hincrby(keys.CACHE_STATS_KEY, "evictions", len(evicted))
+                pipe.execute()
+        except Exception as e:
+            logger.error(f"Error setting cached transcript: {e}")
+
+    def get_cache_stats(self):
+        try:
+            pipe = self.redis_client.pipeline()
+            pipe.hgetall(keys.CACHE_STATS_KEY)
+            pipe.zcard(keys.CACHE_INDEX_KEY)
+            return decode_cache_stats(*pipe.execute())
+        except Exception as e:
+            logger.error(f"Error getting cache stats: {e}")
+            return None
+
+    def publish_task_event(self, task_id, event, maxlen=1000, ttl=3600 * 24):
+        try:
+            key = keys.EVENTKEY_PREFIX + task_id
+            pipe = self.redis_client.pipeline()
+            pipe.xadd(key, {"data": json.dumps(event)}, maxlen=maxlen, approximate=True)
+            pipe.expire(key, ttl)
+            return pipe.execute()[0].decode("utf-8")
+        except Exception as e:
+            logger.error(f"Error publishing task event: {e}")
+            return None
+
+    def read_task_events(self, task_id, last_id="0-0", block_ms=None, count=100):
+        """读取 last_id 之后的进度事件，返回 [(事件ID, 事件), ...]"""
+        try:
+            streams = self.redis_client.xread(
+                {keys.EVENTKEY_PREFIX + task_id: last_id}, count=count, block=block_ms
+            )
+            return decode_events(streams)
+        except Exception as e:
+            logger.error(f"Error reading task events: {e}")
+            return []
+
+    def incr_task_counter(self, task_id, name, ttl=3600 * 24):
+        try:
+            key = f"{keys.COUNTERKEY_PREFIX}{task_id}:{name}"
+            pipe = self.redis_client.pipeline()
+            pipe.incr(key)
+            pipe.expire(key, ttl)
+            return pipe.execute()[0]
+        except Exception as e:
+            logger.error(f"Error incrementing task counter: {e}")
+            return None
+
+    def append_partial_segments(self, task_id, segments, ttl=3600 * 24):
+        if not segments:
+            return
+        try:
+            key = keys.PARTIALKEY_PREFIX + task_id
+            pipe = self.redis_client.pipeline()
+            pipe.rpush(key, *[json.dumps(segment) for segment in segments])
+            pipe.expire(key, ttl)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Error appending partial segments: {e}")
+
+    def publish_window_partial(
+        self, task_id, window_index, chunk, segments, finished=False, ttl=3600 * 24
+    ):
+        """输出分发窗口的中间结果，chunk 为窗口内的小窗口序号，为 None 时只记录窗口完成
+
+        各窗口并行转写，结果按窗口顺序追加到中间结果列表，见 PUBLISH_WINDOW_PARTIAL_SCRIPT。
+        """
+        try:
+            key = keys.PARTIALKEY_PREFIX + task_id
+            self.redis_client.eval(
+                PUBLISH_WINDOW_PARTIAL_SCRIPT,
+                2,
+                key,
+                key + keys.PARTIAL_WINDOWS_SUFFIX,
+                window_index,
+                -1 if chunk is None else chunk,
+                1 if finished else 0,
+                ttl,
+                *[json.dumps(segment) for segment in segments],
+            )
+        except Exception as e:
+            logger.error(f"Error publishing window partial segments: {e}")
+
+    def get_partial_segments(self, task_id, after=-1):
+        """返回下标大于 after 的片段，片段ID即其在中间结果中的下标"""
+        try:
+            segments = self.redis_client.lrange(
+                keys.PARTIALKEY_PREFIX + task_id, after + 1, -1
+            )
+            return number_partials(segments, after)
+        except Exception as e:
+            logger.error(f"Error getting partial segments: {e}")
+            return []
+
+    def expire_partial_segments(self, task_id, ttl):
+        try:
+            key = keys.PARTIALKEY_PREFIX + task_id
+            if ttl:
+                self.redis_client.expire(key, ttl)
+                self.redis_client.delete(key + keys.PARTIAL_WINDOWS_SUFFIX)
+            else:
+                self.redis_client.delete(key, key + keys.PARTIAL_WINDOWS_SUFFIX)
+        except Exception as e:
+            logger.error(f"Error expiring partial segments: {e}")
+
+    def save_checkpoint(
+        self,
+        task_id,
+        scope,
+        window_index,
+        window_count,
+        segments,
+        context,
+        ttl=3600 * 24 * 2,
+    ):
+        """记录某个转写范围（scope）完成的一个窗口，窗口片段与进度在同一条命令中写入
+
+        同一任务的所有检查点在一个 hash 中：{scope}:{窗口序号} 为窗口片段，
+        {scope}:state 为窗口总数、已完成窗口数和下一个窗口的解码提示。
+        """
+        try:
+            key = keys.CHECKPOINTKEY_PREFIX + task_id
+            state = {"windows": window_count, "done": window_index + 1}
+            state["context"] = context
+            pipe = self.redis_client.pipeline()
+            pipe.hset(
+                key,
+                mapping={
+                    f"{scope}:{window_index}": json.dumps(segments),
+                    f"{scope}:state": json.dumps(state),
+                },
+            )
+            pipe.expire(key, ttl)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Error saving checkpoint: {e}")
+
+    def get_checkpoint(self, task_id, scope, window_count):
+        """读取检查点，返回 (已完成窗口数, 已完成片段, 解码提示)
+
+        没有检查点，或窗口划分与检查点不一致时返回 None。
+        """
+        try:
+            key = keys.CHECKPOINTKEY_PREFIX + task_id
+            state = self.redis_client.hget(key, f"{scope}:state")
+            if state is None:
+                return None
+            state = json.loads(state)
+            if state["windows"] != window_count:
+                return None
+            done = state["done"]
+            fields = [f"{scope}:{index}" for index in range(done)]
+            windows = self.redis_client.hmget(key, fields) if fields else []
+            if any(w is None for w in windows):
+                return None
+            segments = [s for w in windows for s in json.loads(w)]
+            return done, segments, state["context"]
+        except Exception as e:
+            logger.error(f"Error getting checkpoint: {e}")
+            return None
+
+    def has_checkpoint(self, task_id):
+        try:
+            return bool(self.redis_client.exists(keys.CHECKPOINTKEY_PREFIX + task_id))
+        except Exception as e:
+            logger.error(f"Error checking checkpoint: {e}")
+            return False
+
+    def claim_fan_out(self, task_id, ttl=3600 * 24 * 2):
+        """在分发窗口子任务之前原子地记录分发标记，返回 False 表示已由另一次投递分发"""
+        try:
+            key = keys.CHECKPOINTKEY_PREFIX + task_id
+            pipe = self.redis_client.pipeline()
+            pipe.hsetnx(key, "fanout", 1)
+            pipe.expire(key, ttl)
+            return bool(pipe.execute()[0])
+        except Exception as e:
+            logger.error(f"Error claiming fan-out: {e}")
+            return False
+
+    def is_fanned_out(self, task_id):
+        try:
+            return bool(
+                self.redis_client.hexists(keys.CHECKPOINTKEY_PREFIX + task_id, "fanout")
+            )
+        except Exception as e:
+            logger.error(f"Error checking fan-out: {e}")
+            return False
+
+    def delete_checkpoint(self, task_id):
+        try:
+            self.redis_client.delete(keys.CHECKPOINTKEY_PREFIX + task_id)
+        except Exception as e:
+            logger.error(f"Error deleting checkpoint: {e}")
+
+    def is_task_cancelled(self, task_id):
+        try:
+            return bool(self.redis_client.exists(keys.CANCELKEY_PREFIX + task_id))
+        except Exception as e:
+            logger.error(f"Error checking cancellation: {e}")
+            return False
+
+    def index_task_segments(self, task_id, segments, removed=None):
+        """更新任务的全文索引，只改写内容有变化的片段
+
+        removed 为 None 时 segments 是任务的全部片段；否则只更新 segments 中的片段，
+        并删除 removed 中的片段。
+        """
+        try:
+            doc_key = keys.SEARCH_DOC_PREFIX + task_id
+            if removed is None:
+                old = decode_search_doc(self.redis_client.hgetall(doc_key))
+            else:
+                ids = [s["id"] for s in segments if "id" in s] + list(removed)
+                values = self.redis_client.hmget(doc_key, ids) if ids else []
+                old = decode_search_doc(dict(zip(ids, values)))
+            pipe = self.redis_client.pipeline()
+            search_index_ops(pipe, task_id, old, segment_terms(segments))
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Error indexing task segments: {e}")
+
+    def set_task_summary(self, task_id, summary, score=None):
+        """写入任务摘要并把任务移动到对应状态的索引中"""
+        try:
+            score = score or time.time()
+            summary = {k: v for k, v in summary.items() if v is not None}
+            pipe = self.redis_client.pipeline()
+            pipe.hset(keys.SUMMARYKEY_PREFIX + task_id, mapping=summary)
+            pipe.zadd(keys.TASK_INDEX_KEY, {task_id: score})
+            if "state" in summary:
+                for state in keys.TASK_STATES:
+                    pipe.zrem(keys.state_index_key(state), task_id)
+                pipe.zadd(keys.state_index_key(summary["state"]), {task_id: score})
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Error setting task summary: {e}")
+
+    def delete_task_summary(self, task_id):
+        try:
+            pipe = self.redis_client.pipeline()
+            pipe.delete(keys.SUMMARYKEY_PREFIX + task_id)
+            pipe.zrem(keys.TASK_INDEX_KEY, task_id)
+            for state in keys.TASK_STATES:
+                pipe.zrem(keys.state_index_key(state), task_id)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Error deleting task summary: {e}")
+
+    def list_task_summaries(self, state=None, cursor=None, limit=20):
+        """按时间倒序分页读取任务摘要，返回 (摘要列表, 下一页游标)
+
+        游标格式为 "<score>:<task_id>"，同一时间戳的任务按 task_id 倒序排列，
+        见 PAGE_SUMMARIES_SCRIPT。
+        """
+        try:
+            max_score, last_id = parse_cursor(cursor)
+            index_key = keys.state_index_key(state)
+            if last_id is None:
+                entries = self.redis_client.zrevrange(
+                    index_key, 0, limit, withscores=True
+                )
+            else:
+                entries = page_entries(
+                    self.redis_client.eval(
+                        PAGE_SUMMARIES_SCRIPT,
+                        1,
+                        index_key,
+                        max_score,
+                        last_id,
+                        limit + 1,
+                    )
+                )
+
+            page = entries[:limit]
+            pipe = self.redis_client.pipeline()
+            for member, _ in page:
+                pipe.hgetall(keys.SUMMARYKEY_PREFIX + member.decode("utf-8"))
+            summaries = [
+                decode_summary(member, summary)
+                for (member, _), summary in zip(page, pipe.execute())
+                if summary
+            ]
+            return summaries, next_page_cursor(entries, limit)
+        except Exception as e:
+            logger.error(f"Error listing task summaries: {e}")
+            return [], None
+
+    def count_task_summaries(self, state=None):
+        try:
+            return self.redis_client.zcard(keys.state_index_key(state))
+        except Exception as e:
+            logger.error(f"Error counting task summaries: {e}")
+            return 0
+
+    def migrate_task_list_to_index(self):
+        """把旧版全局任务列表中的任务写入索引，仅在索引为空时执行"""
+        try:
+            if self.redis_client.zcard(keys.TASK_INDEX_KEY):
+                return 0
+            task_ids = self.get_all_task_ids_from_global_list()
+            migrated = 0
+            for task_id in reversed(task_ids):
+                task_info = self.get_stt_task(task_id)
+                if not task_info:
+                    continue
+                score = time.time()
+                if task_info.get("completion_time"):
+                    completion_time = datetime.fromisoformat(task_info["completion_time"])
+                    score = completion_time.timestamp()
+                self.set_task_summary(task_id, build_task_summary(task_info), score)
+                migrated += 1
+            if migrated:
+                logger.info(f"已把 {migrated} 个旧任务写入任务索引")
+            return migrated
+        except Exception as e:
+            logger.error(f"Error migrating task list to index: {e}")
+            return 0
+
+    def get_job(self, task_id):
+        try:
+            job_str = self.redis_client.get(keys.JOBKEY_PREFIX + task_id)
+            return json.loads(job_str) if job_str else None
+        except Exception as e:
+            logger.error(f"Error getting job: {e}")
+            return None
+
+    def start_job(self, task_id):
+        """任务开始处理：从排队集合移到处理中集合，按观测实时率记录预计完成时间"""
+        try:
+            job = self.get_job(task_id)
+            if job is None:
+                return None
+            size_class = job["size_class"]
+            rtf = self.redis_client.hget(keys.RTF_KEY, size_class)
+            rtf = float(rtf) if rtf is not None else DEFAULT_RTF
+            expected_finish = time.time() + (job.get("duration") or 0) * rtf
+            pipe = self.redis_client.pipeline()
+            pipe.zrem(keys.QUEUEKEY_PREFIX + size_class, task_id)
+            pipe.zadd(keys.RUNNINGKEY_PREFIX + size_class, {task_id: expected_finish})
+            pipe.execute()
+            return job
+        except Exception as e:
+            logger.error(f"Error starting job: {e}")
+            return None
+
+    def release_job_slot(self, task_id, elapsed=None, ttl=3600 * 24):
+        """任务结束后释放名额，返回需要接着投递的暂存任务
+
+        elapsed 为成功完成时的处理耗时，用于更新该队列的实时率；
+        ttl 为接着投递的任务调度信息的过期时间。
+        """
+        try:
+            job = self.get_job(task_id)
+            if job is None:
+                return None
+            size_class = job["size_class"]
+            inflight_key, held_key = keys.user_slot_keys(size_class, job["user"])
+            next_id = self.redis_client.eval(
+                RELEASE_SLOT_SCRIPT,
+                4,
+                keys.RUNNINGKEY_PREFIX + size_class,
+                keys.QUEUEKEY_PREFIX + size_class,
+                inflight_key,
+                held_key,
+                task_id,
+                time.time(),
+                keys.JOBKEY_PREFIX,
+                ttl,
+            )
+            if elapsed and job.get("duration"):
+                current = self.redis_client.hget(keys.RTF_KEY, size_class)
+                rtf = update_rtf(
+                    float(current) if current is not None else None,
+                    elapsed / float(job["duration"]),
+                )
+                self.redis_client.hset(keys.RTF_KEY, size_class, rtf)
+            self.redis_client.delete(keys.JOBKEY_PREFIX + task_id)
+            return self.get_job(next_id.decode("utf-8")) if next_id else None
+        except Exception as e:
+            logger.error(f"Error releasing job slot: {e}")
+            return None
+
+    def observe_metrics(self, observations):
+        if not observations:
+            return
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            queue_metric_ops(pipe, observations)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Error observing metrics: {e}")
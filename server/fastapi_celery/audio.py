@@ -0,0 +1,138 @@
+import os
+import subprocess
+
+import numpy as np
+
+from utils.media import probe_media
+from utils.metrics import stage
+
+# Whisper 模型要求的输入采样率
+SAMPLE_RATE = 16000
+# 播放代理的格式：名称 -> (编码器, 容器, 扩展名)
+PROXY_FORMATS = {
+    "aac": ("aac", "mp4", "m4a"),
+    "opus": ("libopus", "webm", "webm"),
+}
+
+
+def _ffmpeg_pcm_cmd(file_path, sr, start=None, duration=None):
+    cmd = ["ffmpeg", "-nostdin", "-threads", "0"]
+    if start:
+        # -ss 放在 -i 之前按关键帧快速定位，音频解码后仍是采样级精确
+        cmd += ["-ss", f"{start:.3f}"]
+    cmd += ["-i", file_path]
+    if duration is not None:
+        cmd += ["-t", f"{duration:.3f}"]
+    cmd += ["-vn", "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le"]
+    cmd += ["-ar", str(sr), "-"]
+    return cmd
+
+
+def decode_audio(file_path, sr=SAMPLE_RATE, start=None, duration=None):
+    """通过 ffmpeg 管道把媒体文件解码为单声道 float32 数组，不落盘临时文件
+
+    指定 start/duration（秒）时只解码该时间范围。
+    """
+    cmd = _ffmpeg_pcm_cmd(file_path, sr, start=start, duration=duration)
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to decode audio: {e.stderr.decode()}") from e
+
+    return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+
+def start_proxy(file_path, out_path, fmt="aac", bitrate="48k", sr=24000):
+    """后台启动 ffmpeg 生成只含音频的低码率单声道代理文件，返回进程，可与转写并行
+
+    先写入临时文件，finish_proxy 确认成功后再改名，避免读到不完整的文件。
+    """
+    codec, container, _ = PROXY_FORMATS[fmt]
+    cmd = ["ffmpeg", "-nostdin", "-v", "error", "-y", "-i", file_path, "-vn"]
+    cmd += ["-ac", "1", "-ar", str(sr), "-c:a", codec, "-b:a", bitrate]
+    if container == "mp4":
+        # moov 放在文件头部，浏览器拿到前几个字节即可开始播放
+        cmd += ["-movflags", "+faststart"]
+    cmd += ["-f", container, out_path + ".part"]
+    return subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+
+def finish_proxy(process, out_path):
+    """等待代理生成完成，失败时抛出 RuntimeError"""
+    _, stderr = process.communicate()
+    if process.returncode != 0:
+        if os.path.exists(out_path + ".part"):
+            os.remove(out_path + ".part")
+        raise RuntimeError(f"Failed to build proxy: {stderr.decode()}")
+    os.replace(out_path + ".part", out_path)
+
+
+def load_audio(file_path, sr=SAMPLE_RATE, timings=None):
+    """解码音频并返回 (采样数组, 音频信息)，音频信息中的时长以解码结果为准
+
+    传入 timings 时把探测和解码的耗时分别累加到 "probe" 和 "decode"。
+    """
+    with stage(timings, "probe"):
+        media_info = probe_media(file_path)
+    with stage(timings, "decode"):
+        audio = decode_audio(file_path, sr=sr)
+
+    audio_info = {}
+    audio_info["audio_length"] = len(audio)
+    audio_info["audio_channels"] = media_info.get("audio_channels")
+    audio_info["audio_framerate"] = media_info.get("audio_framerate")
+    audio_info["duration"] = len(audio) / float(sr)
+    return audio, audio_info
+
+
+def frame_energy(audio, frame_sec=0.1, sr=SAMPLE_RATE):
+    """计算内存中音频每帧的能量（dB）"""
+    frame_len = int(sr * frame_sec)
+    n_frames = len(audio) // frame_len
+    frames = audio[: n_frames * frame_len].reshape(n_frames, frame_len)
+    return 20 * np.log10(np.sqrt(np.mean(frames**2, axis=1)) + 1e-10)
+
+
+def energy_envelope(file_path, frame_sec=0.1, sr=SAMPLE_RATE, peaks=None):
+    """流式解码整个文件并计算每帧的能量（dB），内存占用与文件长度无关
+
+    用于长文件切分时寻找静音位置，返回 (每帧能量数组, 总时长秒)。
+    传入 PeakBuilder 时同一次解码的采样也用于生成波形峰值。
+    """
+    frame_len = int(sr * frame_sec)
+    read_size = frame_len * 2 * 600  # 每次读取 600 帧的 s16le 数据
+    cmd = _ffmpeg_pcm_cmd(file_path, sr)
+
+    energies = []
+    total_samples = 0
+    pending = b""
+    process = subprocess.Popen(
+        cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    try:
+        while True:
+            data = process.stdout.read(read_size)
+            if not data:
+                break
+            data = pending + data
+            usable = len(data) - len(data) % (frame_len * 2)
+            pending = data[usable:]
+            if not usable:
+                continue
+            samples = np.frombuffer(data[:usable], np.int16).astype(np.float32)
+            total_samples += len(samples)
+            samples /= 32768.0
+            energies.append(frame_energy(samples, frame_sec, sr))
+            if peaks is not None:
+                peaks.feed(samples)
+    finally:
+        process.stdout.close()
+        if process.wait() != 0:
+            raise RuntimeError(f"Failed to decode audio: {file_path}")
+
+    total_samples += len(pending) // 2
+    if peaks is not None and len(pending) >= 2:
+        tail = pending[: len(pending) - len(pending) % 2]
+        peaks.feed(np.frombuffer(tail, np.int16).astype(np.float32) / 32768.0)
+    envelope = np.concatenate(energies) if energies else np.zeros(0, np.float32)
+    return envelope, total_samples / float(sr)
@@ -0,0 +1,50 @@
+# API 进程投递任务用的轻量客户端：只依赖 Celery 应用配置，按任务名发送，
+# 不导入 fastapi_celery.tasks，因此不会加载 torch / whisper 等推理依赖
+from celery import group
+
+from celery_config import app
+
+PROCESS_FILE_TASK = "fastapi_celery.tasks.process_file_celery"
+EXPORT_CLIP_TASK = "fastapi_celery.tasks.export_clip"
+RETRANSCRIBE_TASK = "fastapi_celery.tasks.retranscribe_range"
+
+
+def enqueue_transcription(file_id, options, queue=None, task_id=None):
+    """投递转写任务，返回 Celery 任务ID
+
+    queue 为按时长选择的队列；task_id 在任务暂存时已提前生成，投递时沿用。
+    """
+    result = app.send_task(
+        PROCESS_FILE_TASK, args=[file_id, options], queue=queue, task_id=task_id
+    )
+    return result.id
+
+
+def enqueue_transcriptions(jobs):
+    """把多个转写任务作为一个 group 投递，jobs 为 [(文件ID, 参数, 队列, 任务ID), ...]"""
+    group(
+        app.signature(PROCESS_FILE_TASK, args=[file_id, options]).set(
+            queue=queue, task_id=task_id
+        )
+        for file_id, options, queue, task_id in jobs
+    ).apply_async()
+
+
+def enqueue_clip(clip_id, task_id, file_path, ranges, queue=None):
+    """投递剪辑导出任务，Celery 任务ID与剪辑ID相同"""
+    app.send_task(
+        EXPORT_CLIP_TASK,
+        args=[clip_id, task_id, file_path, ranges],
+        queue=queue,
+        task_id=clip_id,
+    )
+
+
+def enqueue_retranscription(job_id, task_id, start, end, options, queue=None):
+    """投递按时间范围重新转写的任务，Celery 任务ID与 job_id 相同"""
+    app.send_task(
+        RETRANSCRIBE_TASK,
+        args=[job_id, task_id, start, end, options],
+        queue=queue,
+        task_id=job_id,
+    )
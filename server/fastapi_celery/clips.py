@@ -0,0 +1,132 @@
+import bisect
+import json
+import os
+import subprocess
+
+# 起点与关键帧相差不超过该值（秒）时直接从关键帧开始复制，不再重新编码
+KEYFRAME_TOLERANCE = 0.05
+# 可与原视频流拼接的编码器：原编码 -> ffmpeg 编码器
+ENCODERS = {"h264": "libx264", "hevc": "libx265"}
+FALLBACK_ENCODER = "libx264"
+# 可以容纳重新编码的 H.264 / HEVC 画面和原音频的封装格式
+REENCODE_CONTAINERS = (".mp4", ".mov", ".mkv", ".ts")
+
+
+def probe_video(file_path):
+    """读取第一条视频流的编码信息和全部关键帧时间，没有视频流时返回 None
+
+    关键帧从数据包标记中读取，不需要解码，长视频也只需数秒。
+    音频文件内嵌的封面图不算视频流。
+    """
+    cmd = ["ffprobe", "-v", "error", "-select_streams", "v:0", "-show_entries"]
+    cmd += ["stream=codec_name,pix_fmt:stream_disposition=attached_pic"]
+    cmd += ["-of", "json", file_path]
+    result = subprocess.run(cmd, capture_output=True, check=True)
+    streams = json.loads(result.stdout or b"{}").get("streams", [])
+    if not streams or streams[0].get("disposition", {}).get("attached_pic"):
+        return None
+
+    cmd = ["ffprobe", "-v", "error", "-select_streams", "v:0"]
+    cmd += ["-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", file_path]
+    result = subprocess.run(cmd, capture_output=True, check=True)
+    keyframes = []
+    for line in result.stdout.decode().splitlines():
+        pts_time, _, flags = line.partition(",")
+        if "K" in flags and pts_time not in ("", "N/A"):
+            keyframes.append(float(pts_time))
+    return {
+        "codec": streams[0].get("codec_name"),
+        "pix_fmt": streams[0].get("pix_fmt") or "yuv420p",
+        "keyframes": sorted(keyframes),
+    }
+
+
+def plan_pieces(ranges, video):
+    """把剪辑范围拆分为 [(开始, 结束, 是否复制), ...]
+
+    视频从起点后的第一个关键帧开始直接复制数据流，起点到该关键帧之间的
+    不完整 GOP 重新编码；范围内没有关键帧时整段重新编码。纯音频文件全部复制。
+    """
+    pieces = []
+    for start, end in ranges:
+        if video is None:
+            pieces.append((start, end, True))
+            continue
+        keyframes = video["keyframes"]
+        index = bisect.bisect_left(keyframes, start - KEYFRAME_TOLERANCE)
+        keyframe = keyframes[index] if index < len(keyframes) else None
+        if keyframe is None or keyframe >= end - KEYFRAME_TOLERANCE:
+            pieces.append((start, end, False))
+        elif keyframe <= start + KEYFRAME_TOLERANCE:
+            pieces.append((keyframe, end, True))
+        else:
+            pieces.append((start, keyframe, False))
+            pieces.append((keyframe, end, True))
+    if video is not None and video["codec"] not in ENCODERS:
+        # 重新编码的片段无法与该编码的原始数据流拼接，只能全部重新编码
+        pieces = [(start, end, False) for start, end, _ in pieces]
+    return pieces
+
+
+def cut_piece(
+    file_path, out_path, start, end, copy, video=None, crf=18, preset="veryfast"
+):
+    """截取 [start, end) 写入 out_path，copy 为 True 时不重新编码
+
+    视频片段写为 MPEG-TS，参数集随关键帧带在流内，重新编码的片段
+    与复制的片段可以直接拼接。音频始终复制。
+    """
+    # 按 ffprobe 输出的精度定位，复制片段的起点恰好落在关键帧上
+    cmd = ["ffmpeg", "-nostdin", "-v", "error", "-y", "-ss", f"{start:.6f}"]
+    cmd += ["-i", file_path, "-t", f"{end - start:.6f}"]
+    if video is None:
+        cmd += ["-map", "0:a:0", "-c:a", "copy"]
+    elif copy:
+        cmd += ["-map", "0:v:0", "-map", "0:a:0?", "-c", "copy"]
+    else:
+        cmd += ["-map", "0:v:0", "-map", "0:a:0?", "-c:a", "copy"]
+        cmd += ["-c:v", ENCODERS.get(video["codec"], FALLBACK_ENCODER)]
+        cmd += ["-pix_fmt", video["pix_fmt"], "-crf", str(crf), "-preset", preset]
+    cmd += ["-avoid_negative_ts", "make_zero", out_path]
+    _run(cmd, "Failed to cut clip")
+
+
+def concat_pieces(piece_paths, out_path):
+    """用 concat 分离器把片段按顺序拼接为一个文件，不重新编码"""
+    list_path = out_path + ".txt"
+    with open(list_path, "w") as f:
+        for path in piece_paths:
+            f.write(f"file '{os.path.abspath(path)}'\n")
+    cmd = ["ffmpeg", "-nostdin", "-v", "error", "-y", "-f", "concat", "-safe", "0"]
+    cmd += ["-i", list_path, "-map", "0", "-c", "copy"]
+    if out_path.endswith((".mp4", ".m4a", ".mov")):
+        cmd += ["-movflags", "+faststart"]
+    cmd.append(out_path)
+    try:
+        _run(cmd, "Failed to concat clips")
+    finally:
+        os.remove(list_path)
+
+
+def piece_ext(file_path, video):
+    return ".ts" if video is not None else os.path.splitext(file_path)[1]
+
+
+def clip_ext(file_path, video, pieces):
+    """剪辑结果的扩展名，默认沿用原文件的封装格式
+
+    有重新编码的片段、而原格式无法容纳重新编码的画面（例如 VP9 的 .webm）时改用 .mkv。
+    """
+    ext = os.path.splitext(file_path)[1]
+    if video is None or all(stream_copy for _, _, stream_copy in pieces):
+        return ext
+    if video["codec"] in ENCODERS and ext.lower() in REENCODE_CONTAINERS:
+        return ext
+    return ".mkv"
+
+
+def _run(cmd, message):
+    try:
+        subprocess.run(cmd, capture_output=True, check=True)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"{message}: {e.stderr.decode()}") from e
@@ -0,0 +1,59 @@
+import torch
+from whisper import load_model
+from whisper.model import Linear as WhisperLinear
+
+
+class WhisperEngine:
+    """默认推理引擎：原生 PyTorch Whisper"""
+
+    name = "torch"
+
+    def load(self, model_name):
+        return load_model(model_name)
+
+    def transcribe(self, model, audio, **kwargs):
+        return model.transcribe(audio, **kwargs)
+
+
+class QuantizedWhisperEngine(WhisperEngine):
+    """CPU int8 推理引擎：对同一权重的 Linear 层做动态量化"""
+
+    name = "int8"
+
+    def load(self, model_name):
+        model = load_model(model_name, device="cpu")
+        _to_plain_linear(model)
+        model = torch.ao.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+        return model.eval()
+
+    def transcribe(self, model, audio, **kwargs):
+        kwargs["fp16"] = False
+        return model.transcribe(audio, **kwargs)
+
+
+def _to_plain_linear(module):
+    # Whisper 的 Linear 子类只在 forward 中做 dtype 转换，fp32 下与 nn.Linear 等价；
+    # quantize_dynamic 按类型精确匹配，需要先替换成 nn.Linear
+    for name, child in module.named_children():
+        if isinstance(child, WhisperLinear):
+            linear = torch.nn.Linear(
+                child.in_features, child.out_features, bias=child.bias is not None
+            )
+            linear.weight = child.weight
+            linear.bias = child.bias
+            setattr(module, name, linear)
+        else:
+            _to_plain_linear(child)
+
+
+ENGINES = {
+    engine.name: engine for engine in (WhisperEngine(), QuantizedWhisperEngine())
+}
+
+
+def get_engine(name):
+    if name not in ENGINES:
+        raise ValueError(f"Unknown inference engine: {name}")
+    return ENGINES[name]
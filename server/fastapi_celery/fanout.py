@@ -0,0 +1,72 @@
+import numpy as np
+
+
+def plan_windows(envelope, duration, frame_sec, window, overlap, search):
+    """按静音位置规划转写窗口
+
+    每个切分点在名义位置（上一切分点 + window）前后 search 秒内取能量最低的帧。
+    相邻切分点之间是窗口的"归属区间"，实际解码区间向两侧各扩展 overlap 秒，
+    合并时只保留中点落在归属区间内的片段，以此去除重叠部分的重复结果。
+    """
+    cuts = [0.0]
+    while duration - cuts[-1] > window + search:
+        nominal = cuts[-1] + window
+        lo = int((nominal - search) / frame_sec)
+        hi = min(int((nominal + search) / frame_sec), len(envelope))
+        if hi <= lo:
+            cut = nominal
+        else:
+            cut = (lo + int(np.argmin(envelope[lo:hi]))) * frame_sec
+        cuts.append(round(cut, 3))
+    cuts.append(round(duration, 3))
+
+    windows = []
+    for index, (own_start, own_end) in enumerate(zip(cuts[:-1], cuts[1:])):
+        windows.append(
+            {
+                "index": index,
+                "start": round(max(0.0, own_start - overlap), 3),
+                "end": round(min(duration, own_end + overlap), 3),
+                "own_start": own_start,
+                "own_end": own_end,
+                "count": len(cuts) - 1,
+            }
+        )
+    return windows
+
+
+def offset_segments(segments, offset):
+    """把相对时间的片段（含词级时间戳）平移到原始时间轴"""
+    for segment in segments:
+        segment["start"] = round(segment["start"] + offset, 3)
+        segment["end"] = round(segment["end"] + offset, 3)
+        if "seek" in segment:
+            # seek 以梅尔帧（10ms）为单位
+            segment["seek"] += int(round(offset * 100))
+        for word in segment.get("words", []):
+            word["start"] = round(word["start"] + offset, 3)
+            word["end"] = round(word["end"] + offset, 3)
+    return segments
+
+
+def owns_segment(window, segment):
+    """片段中点是否落在窗口的归属区间 [own_start, own_end) 内，最后一个窗口包含结束位置"""
+    middle = (segment["start"] + segment["end"]) / 2
+    if middle < window["own_start"]:
+        return False
+    return middle < window["own_end"] or window["index"] == window["count"] - 1
+
+
+def merge_window_results(results, windows):
+    """合并各窗口的转写结果：修正时间偏移、去除重叠区间的重复片段并重新编号"""
+    windows_by_index = {w["index"]: w for w in windows}
+    merged = []
+    for result in sorted(results, key=lambda r: r["index"]):
+        window = windows_by_index[result["index"]]
+        for segment in offset_segments(result["segments"], window["start"]):
+            if owns_segment(window, segment):
+                merged.append(segment)
+
+    for index, segment in enumerate(merged):
+        segment["id"] = index
+    return merged
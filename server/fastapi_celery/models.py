@@ -0,0 +1,86 @@
+import gc
+import os
+import threading
+from collections import OrderedDict
+
+import torch
+from loguru import logger
+
+from fastapi_celery.engines import get_engine
+
+
+def thread_budget(concurrency, cpu_count=None):
+    """把 CPU 核数平均分给同时运行的 worker 子进程，每个子进程至少 1 个线程"""
+    cpu_count = cpu_count or os.cpu_count() or 1
+    return max(1, cpu_count // max(1, int(concurrency)))
+
+
+def _tensor_bytes(value):
+    if isinstance(value, torch.Tensor):
+        return value.numel() * value.element_size()
+    if isinstance(value, (tuple, list)):
+        # 动态量化层的权重以 (qweight, bias) 打包保存
+        return sum(_tensor_bytes(v) for v in value)
+    return 0
+
+
+def model_size_mb(model):
+    size = sum(_tensor_bytes(v) for v in model.state_dict().values())
+    return size / 1024 / 1024
+
+
+class ModelRegistry:
+    """进程内的模型注册表，可同时持有多个尺寸、多个推理引擎的模型
+
+    按权重占用的内存计算总量，超过 max_memory_mb 时按最近最少使用顺序淘汰，
+    但至少保留刚请求的那个模型。
+    """
+
+    def __init__(self, max_memory_mb=4096):
+        self.max_memory_mb = max_memory_mb
+        self._models = OrderedDict()  # (engine, name) -> (model, size_mb)
+        self._lock = threading.Lock()
+
+    def get(self, name, engine="torch"):
+        key = (engine, name)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key][0]
+
+            model = get_engine(engine).load(name)
+            size = model_size_mb(model)
+            self._models[key] = (model, size)
+            logger.info(f"模型 {engine}:{name} 加载完成，占用约 {size:.0f}MB")
+            self._evict()
+            return model
+
+    def _evict(self):
+        while len(self._models) > 1 and self.memory_mb() > self.max_memory_mb:
+            (engine, name), _ = self._models.popitem(last=False)
+            logger.info(
+                f"模型内存超过上限 {self.max_memory_mb}MB，卸载模型 {engine}:{name}"
+            )
+        gc.collect()
+
+    def preload(self, names, engine="torch"):
+        for name in names:
+            self.get(name, engine=engine)
+
+    def memory_mb(self):
+        return sum(size for _, size in self._models.values())
+
+    def loaded(self):
+        return [f"{engine}:{name}" for engine, name in self._models.keys()]
+
+
+def configure_threads(concurrency, threads=None):
+    threads = int(threads or thread_budget(concurrency))
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # 只能在并行计算开始前设置一次
+        pass
+    logger.info(f"worker 子进程 {os.getpid()} 使用 {threads} 个计算线程")
+    return threads
@@ -0,0 +1,73 @@
+import numpy as np
+
+# 最精细一级每个峰值覆盖的采样数，16kHz 下约每秒 62 个
+BASE_SAMPLES_PER_PEAK = 256
+# 相邻两级的缩放倍数
+LEVEL_FACTOR = 4
+# 峰值数少于该值时不再生成更粗的一级
+MIN_LEVEL_PEAKS = 1000
+
+
+def encode_peaks(mins, maxs):
+    """把 [-1, 1] 的峰值量化为 int8，按 min, max 交替排列"""
+    data = np.empty(len(mins) * 2, np.int8)
+    data[0::2] = np.clip(np.round(mins * 127), -127, 127)
+    data[1::2] = np.clip(np.round(maxs * 127), -127, 127)
+    return data.tobytes()
+
+
+def _reduce(values, factor, func):
+    # 不足 factor 的尾部用最后一个值补齐，避免丢掉末尾的峰值
+    pad = -len(values) % factor
+    if pad:
+        values = np.concatenate([values, np.repeat(values[-1:], pad)])
+    return func(values.reshape(-1, factor), axis=1)
+
+
+class PeakBuilder:
+    """逐块输入采样，生成多级波形峰值（mipmap 金字塔）
+
+    第 0 级每 BASE_SAMPLES_PER_PEAK 个采样取一对 min/max，之后每一级由上一级
+    按 LEVEL_FACTOR 合并，直到峰值数少于 MIN_LEVEL_PEAKS。
+    """
+
+    def __init__(self, samples_per_peak=BASE_SAMPLES_PER_PEAK):
+        self.samples_per_peak = samples_per_peak
+        self.pending = np.zeros(0, np.float32)
+        self.mins = []
+        self.maxs = []
+        self.total_samples = 0
+
+    def feed(self, samples):
+        self.total_samples += len(samples)
+        data = np.concatenate([self.pending, samples]) if len(self.pending) else samples
+        n = len(data) // self.samples_per_peak
+        if n:
+            frames = data[: n * self.samples_per_peak].reshape(n, self.samples_per_peak)
+            self.mins.append(frames.min(axis=1))
+            self.maxs.append(frames.max(axis=1))
+        self.pending = data[n * self.samples_per_peak :]
+
+    def finish(self):
+        """返回 [(每个峰值的采样数, 编码后的峰值), ...]，由细到粗"""
+        if len(self.pending):
+            self.mins.append(self.pending.min(keepdims=True))
+            self.maxs.append(self.pending.max(keepdims=True))
+            self.pending = np.zeros(0, np.float32)
+        if not self.mins:
+            return []
+        mins, maxs = np.concatenate(self.mins), np.concatenate(self.maxs)
+        samples_per_peak = self.samples_per_peak
+        levels = [(samples_per_peak, encode_peaks(mins, maxs))]
+        while len(mins) > MIN_LEVEL_PEAKS:
+            mins = _reduce(mins, LEVEL_FACTOR, np.min)
+            maxs = _reduce(maxs, LEVEL_FACTOR, np.max)
+            samples_per_peak *= LEVEL_FACTOR
+            levels.append((samples_per_peak, encode_peaks(mins, maxs)))
+        return levels
+
+
+def build_peaks(audio):
+    builder = PeakBuilder()
+    builder.feed(audio)
+    return builder.finish()
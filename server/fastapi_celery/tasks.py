@@ -1,178 +1,659 @@
 from celery_config import app
-from whisper import load_model
+import copy
+import json
+from celery import chord
+from celery.signals import worker_init, worker_process_init
 import os
+import shutil
 from loguru import logger
 import time
-from db.redis import RedisHandler
-from whisper.utils import get_writer
-import wave
-from moviepy import VideoFileClip
+from db.redis import RedisHandler, VersionConflict, build_task_summary
 from datetime import datetime
+from fastapi_celery.audio import (
+    PROXY_FORMATS,
+    SAMPLE_RATE,
+    finish_proxy,
+    start_proxy,
+    frame_energy,
+    load_audio,
+    decode_audio,
+    energy_envelope,
+)
+from fastapi_celery.peaks import PeakBuilder, build_peaks
+from fastapi_celery.clips import (
+    clip_ext,
+    concat_pieces,
+    cut_piece,
+    piece_ext,
+    plan_pieces,
+    probe_video,
+)
+from fastapi_celery.fanout import (
+    owns_segment,
+    plan_windows,
+    merge_window_results,
+    offset_segments,
+)
+from fastapi_celery.vad import (
+    detect_speech,
+    compact_audio,
+    restore_segments,
+    vad_report,
+    merge_vad_reports,
+)
+from config.config_loader import STT_CONFIG, WORKER_CONFIG
+from utils.stt_options import DEFAULT_OPTIONS, build_options, cache_key
+from utils.scheduling import WINDOW_QUEUE, host_workers, queue_name
+from utils.metrics import stage
 
 sync_redis = RedisHandler()
 
-import torch
+_registry = None
+CACHE_CONFIG = STT_CONFIG.get("cache", {})
+FANOUT_CONFIG = STT_CONFIG.get("fanout", {})
+PROXY_CONFIG = STT_CONFIG.get("proxy", {})
+PROXY_DIR = os.path.join("storage", "proxy")
+CLIP_CONFIG = STT_CONFIG.get("clips", {})
+CLIP_DIR = os.path.join("storage", "clips")
+# 分发到多个 worker 的长文件，播放代理作为单独的任务生成，默认与剪辑导出共用队列
+PROXY_QUEUE = PROXY_CONFIG.get("queue", CLIP_CONFIG.get("queue", "clips"))
+ENVELOPE_FRAME_SEC = 0.1
+# 逐段转写的窗口时长，加上寻找静音的范围后不超过 Whisper 的 30 秒输入
+STREAM_WINDOW = float(STT_CONFIG.get("stream_window", 25))
+STREAM_SEARCH = 4.0
+PROMPT_CONTEXT_CHARS = 200
 
-model = None
-model_name = "small"
 
+def get_registry():
+    # torch / whisper 只在 worker 子进程首次用到模型时导入，
+    # API 进程和 worker 主进程都不加载这些库
+    global _registry
+    if _registry is None:
+        from fastapi_celery.models import ModelRegistry
 
-@app.task(bind=True)
-def process_file_celery(self, file_id):
+        _registry = ModelRegistry(
+            max_memory_mb=int(WORKER_CONFIG.get("max_model_memory_mb", 4096))
+        )
+    return _registry
+
+
+@worker_init.connect
+def record_concurrency(sender=None, **kwargs):
+    # 在主进程 fork 子进程之前记录并发数，子进程据此分配计算线程
+    concurrency = getattr(sender, "concurrency", None) or os.cpu_count()
+    os.environ["CUTAI_WORKER_CONCURRENCY"] = str(concurrency)
+
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    from fastapi_celery.models import configure_threads
 
+    # 同一台机器上的各个 worker 池共用 CPU，按全部池的子进程总数分配线程
+    concurrency = max(
+        int(os.environ.get("CUTAI_WORKER_CONCURRENCY", 1)),
+        int(WORKER_CONFIG.get("host_workers") or host_workers()),
+    )
+    configure_threads(concurrency, WORKER_CONFIG.get("threads_per_child"))
     try:
-        task_id = self.request.id
-        sync_redis.set_stt_task(
-            task_id=task_id,
-            task_info={"file_id": file_id, "state": "PROGRESS", "process": "init"},
+        get_registry().preload(
+            WORKER_CONFIG.get("preload_models", ["small"]),
+            engine=WORKER_CONFIG.get("engine") or DEFAULT_OPTIONS["engine"],
+        )
+    except Exception as e:
+        # 预加载失败不影响子进程启动，首个任务会再次尝试加载
+        logger.exception(e)
+
+
+def resolve_options(options):
+    # 投递时已合并默认参数，这里补全旧消息中缺少的参数并应用 worker.engine
+    return build_options(**(options or {}))
+
+
+def get_model(options):
+    return get_registry().get(options["model"], engine=options["engine"])
+
+
+def transcribe_audio(audio, options, initial_prompt=None):
+    from fastapi_celery.engines import get_engine
+
+    if initial_prompt is None:
+        initial_prompt = options["initial_prompt"]
+    return get_engine(options["engine"]).transcribe(
+        get_model(options),
+        audio,
+        fp16=False,
+        temperature=options["temperature"],
+        language=options["language"],
+        initial_prompt=initial_prompt,
+        verbose=False,
+        word_timestamps=options["word_timestamps"],
+    )
+
+
+class TaskCancelled(Exception):
+    """用户通过 /api/stt-task/{task_id}/cancel 取消了任务"""
+
+
+def check_cancelled(task_id):
+    if task_id and sync_redis.is_task_cancelled(task_id):
+        raise TaskCancelled(task_id)
+
+
+def build_prompt(options, context):
+    # 上一窗口的末尾文本作为解码提示，保持跨窗口的上下文连贯
+    return (options["initial_prompt"] or "") + context
+
+
+def transcribe_speech(
+    audio, options, on_window=None, task_id=None, scope="main", context=""
+):
+    """转写前先做语音活动检测，只把语音区间送入模型，返回 (片段, VAD 统计)
+
+    音频按静音位置切成约 30 秒的窗口逐个转写，每完成一个窗口调用
+    on_window(窗口片段, 已完成窗口数, 窗口总数)，用于输出中间结果。
+    传入 task_id 时每个窗口完成后写入检查点，任务重新投递时从检查点继续；
+    每个窗口开始前检查任务是否已被取消。context 为第一个窗口之前的文本。
+    """
+    regions, mapping = None, None
+    speech_audio = audio
+    if options["vad"]:
+        regions = detect_speech(audio)
+        speech_audio, mapping = compact_audio(audio, regions)
+
+    speech_duration = len(speech_audio) / float(SAMPLE_RATE)
+    windows = []
+    if speech_duration > 0:
+        windows = plan_windows(
+            frame_energy(speech_audio, ENVELOPE_FRAME_SEC),
+            speech_duration,
+            ENVELOPE_FRAME_SEC,
+            window=STREAM_WINDOW,
+            overlap=0,
+            search=STREAM_SEARCH,
         )
+
+    T0 = time.time()
+    segments = []
+    done = 0
+    checkpoint = None
+    if task_id and windows:
+        checkpoint = sync_redis.get_checkpoint(task_id, scope, len(windows))
+    if checkpoint:
+        done, segments, context = checkpoint
+        logger.info(f"{task_id} {scope} 从检查点继续：已完成 {done}/{len(windows)} 个窗口")
+    for window in windows[done:]:
+        check_cancelled(task_id)
+        piece = speech_audio[
+            int(window["start"] * SAMPLE_RATE) : int(window["end"] * SAMPLE_RATE)
+        ]
+        result = transcribe_audio(
+            piece, options, initial_prompt=build_prompt(options, context)
+        )
+        window_segments = offset_segments(result["segments"], window["start"])
+        if mapping is not None:
+            restore_segments(window_segments, mapping)
+        for segment in window_segments:
+            segment["id"] = len(segments)
+            segments.append(segment)
+
+        context = "".join(s["text"] for s in segments[-5:])[-PROMPT_CONTEXT_CHARS:]
+        if task_id:
+            sync_redis.save_checkpoint(
+                task_id, scope, window["index"], len(windows), window_segments, context
+            )
+        if on_window:
+            on_window(window_segments, window["index"] + 1, len(windows))
+
+    report = None
+    if regions is not None:
+        report = vad_report(
+            len(audio) / float(SAMPLE_RATE),
+            sum(end - start for start, end in regions),
+            time.time() - T0,
+        )
+        logger.info(f"语音活动检测：{report}")
+    return segments, report
+
+
+# 各阶段开始时对应的完成百分比，转写阶段在 15~90 之间按窗口进度推进
+STAGE_PERCENT = {
+    "init": 0,
+    "decoding_audio": 5,
+    "splitting_file": 5,
+    "loading_model": 10,
+    "processing_file": 15,
+    "saving_result": 90,
+    "completed": 100,
+}
+
+
+def publish_event(task_id, state, process, percent, **extra):
+    event = {"state": state, "process": process, "percent": percent}
+    event.update(extra)
+    sync_redis.publish_task_event(task_id, event)
+
+
+def processing_percent(done, total):
+    start, end = STAGE_PERCENT["processing_file"], STAGE_PERCENT["saving_result"]
+    return start + (end - start) * done // max(total, 1)
+
+
+def set_progress(task_id, file_id, process, percent=None, **extra):
+    task_info = {"file_id": file_id, "state": "PROGRESS", "process": process}
+    task_info.update(extra)
+    sync_redis.set_stt_task(task_id=task_id, task_info=task_info)
+    if percent is None:
+        percent = STAGE_PERCENT.get(process, 0)
+    publish_event(task_id, "PROGRESS", process, percent, **extra)
+
+
+def set_failure(task_id, file_id, process="failed"):
+    """任务失败或被取消（process 为 "cancelled"），释放名额并清除检查点"""
+    sync_redis.set_stt_task(
+        task_id=task_id,
+        task_info={"file_id": file_id, "state": "FAILURE", "process": process},
+    )
+    sync_redis.set_task_summary(task_id, {"state": "FAILURE"})
+    publish_event(task_id, "FAILURE", process, 100)
+    metric_state = "cancelled" if process == "cancelled" else "failure"
+    sync_redis.observe_metrics([("cutai_jobs_total", {"state": metric_state}, 1)])
+    sync_redis.delete_checkpoint(task_id)
+    release_slot(task_id)
+
+
+def record_metrics(task_id, options, timings, duration, cost_time):
+    """记录一次成功转写的各阶段耗时、实时率和音频时长，多个 worker 在 Redis 中汇总"""
+    logger.info(f"{task_id} 阶段耗时：{json.dumps(timings)}")
+    labels = {"model": options["model"], "engine": options["engine"]}
+    observations = [
+        ("cutai_stage_duration_seconds", {"stage": name}, seconds)
+        for name, seconds in timings.items()
+    ]
+    observations.append(("cutai_jobs_total", {"state": "success"}, 1))
+    if duration:
+        observations.append(("cutai_realtime_factor", labels, cost_time / duration))
+        observations.append(("cutai_audio_seconds_total", labels, duration))
+    sync_redis.observe_metrics(observations)
+
+
+def release_slot(task_id, elapsed=None):
+    """任务结束后释放用户在队列中的名额，并投递该用户暂存的下一个任务"""
+    job = sync_redis.release_job_slot(task_id, elapsed=elapsed)
+    if job is not None:
+        logger.info(f"投递用户 {job['user']} 暂存的任务：{job['task_id']}")
+        process_file_celery.apply_async(
+            args=[job["file_id"], job["options"]],
+            queue=queue_name(job["size_class"]),
+            task_id=job["task_id"],
+        )
+
+
+def complete_task(
+    task_id,
+    file_info,
+    options,
+    segments,
+    duration,
+    started_at,
+    vad=None,
+    timings=None,
+):
+    """写入最终任务结果并更新转写缓存"""
+    timings = dict(timings or {})
+    file_path = file_info["file_path"]
+    formatted_text = "\n\n".join([s["text"] for s in segments])
+
+    set_progress(task_id, file_info["file_id"], "saving_result")
+
+    # 字幕文件不再在这里生成，由 /api/stt-export 按当前版本的片段按需导出
+    T3 = time.time()
+    logger.info(f"文件处理完毕：{file_path}")
+
+    task_info = {}
+    task_info["completion_time"] = datetime.now().isoformat()
+    task_info["file_id"] = file_info["file_id"]
+    task_info["file_type"] = file_info.get("file_type")
+    task_info["file_name"] = file_info["file_name"]
+    task_info["file_path"] = file_path
+    task_info["duration"] = duration
+    task_info["status"] = "success"
+    task_info["process"] = "completed"
+    task_info["cost_time"] = round(T3 - started_at, 2)
+    task_info["timings"] = {name: round(t, 3) for name, t in timings.items()}
+    if vad:
+        task_info["vad"] = vad
+    task_info["text"] = formatted_text
+    task_info["segments"] = segments
+    task_info["state"] = "SUCCESS"
+
+    sync_redis.set_stt_task(task_id=task_id, task_info=task_info)
+    sync_redis.set_task_summary(task_id, build_task_summary(task_info))
+    sync_redis.index_task_segments(task_id, segments)
+    sync_redis.delete_checkpoint(task_id)
+    publish_event(task_id, "SUCCESS", "completed", 100)
+    # 完整结果已写入，中间结果保留一段时间供正在读取的客户端收尾
+    sync_redis.expire_partial_segments(task_id, 3600)
+    record_metrics(task_id, options, timings, duration, T3 - started_at)
+    release_slot(task_id, elapsed=task_info["cost_time"])
+
+    if file_info.get("file_hash"):
+        sync_redis.set_cached_transcript(
+            cache_key(file_info["file_hash"], options),
+            {"text": formatted_text, "segments": segments, "duration": duration},
+            ttl=int(CACHE_CONFIG.get("ttl", 3600 * 24 * 7)),
+            max_entries=int(CACHE_CONFIG.get("max_entries", 1000)),
+        )
+
+
+def should_fan_out(file_info):
+    if not FANOUT_CONFIG.get("enabled", True):
+        return False
+    min_duration = float(FANOUT_CONFIG.get("min_duration", 1200))
+    return float(file_info.get("duration") or 0) >= min_duration
+
+
+def wants_proxy(file_info):
+    return PROXY_CONFIG.get("enabled", True) and not file_info.get("proxy_path")
+
+
+def start_proxy_job(file_info):
+    """开始生成播放用的音频代理，返回 (进程, 输出路径)，已生成或未启用时返回 None"""
+    if not wants_proxy(file_info):
+        return None
+    fmt = PROXY_CONFIG.get("format", "aac")
+    os.makedirs(PROXY_DIR, exist_ok=True)
+    ext = PROXY_FORMATS[fmt][2]
+    out_path = os.path.join(PROXY_DIR, f"{file_info['file_id']}.{ext}")
+    try:
+        process = start_proxy(
+            file_info["file_path"],
+            out_path,
+            fmt=fmt,
+            bitrate=str(PROXY_CONFIG.get("bitrate", "48k")),
+            sr=int(PROXY_CONFIG.get("sample_rate", 24000)),
+        )
+        return process, out_path
+    except Exception as e:
+        logger.exception(e)
+        return None
+
+
+def finish_proxy_job(file_info, proxy, timings=None):
+    """等待音频代理生成完成并记录到文件信息，失败时前端继续播放原文件"""
+    if proxy is None:
+        return
+    process, out_path = proxy
+    try:
+        with stage(timings, "proxy_wait"):
+            finish_proxy(process, out_path)
+        file_info["proxy_path"] = out_path
+        sync_redis.add_file(file_info["file_id"], file_info)
+    except Exception as e:
+        logger.exception(e)
+
+
+@app.task
+def build_proxy(file_id):
+    """为分发到多个 worker 的长文件生成播放代理，不占用分发任务的 worker 等待"""
+    file_info = sync_redis.get_file(file_id)
+    proxy = start_proxy_job(file_info) if file_info else None
+    if proxy is None:
+        return
+    process, out_path = proxy
+    try:
+        finish_proxy(process, out_path)
+        # 生成期间文件信息可能已被其他任务更新，重新读取后再记录代理路径
+        file_info = sync_redis.get_file(file_id) or file_info
+        file_info["proxy_path"] = out_path
+        sync_redis.add_file(file_id, file_info)
+    except Exception as e:
+        logger.exception(e)
+
+
+def cancel_proxy_job(proxy):
+    if proxy is None:
+        return
+    process, out_path = proxy
+    process.kill()
+    process.wait()
+    if os.path.exists(out_path + ".part"):
+        os.remove(out_path + ".part")
+
+
+@app.task(bind=True)
+def process_file_celery(self, file_id, options=None):
+    task_id = self.request.id
+    proxy = None
+    try:
+        options = resolve_options(options)
+        if sync_redis.is_task_cancelled(task_id):
+            # 排队期间已取消，名额已由取消接口释放
+            release_slot(task_id)
+            return None
+        if sync_redis.is_fanned_out(task_id):
+            # 窗口子任务已分发，本次是分发后 worker 退出导致的重新投递
+            return task_id
+        job = sync_redis.start_job(task_id)
+        timings = {}
+        if job and job.get("queued_at"):
+            timings["queue_wait"] = max(0.0, time.time() - job["queued_at"])
+        set_progress(task_id, file_id, "init")
         file_info = sync_redis.get_file(file_id)
         if file_info is None:
+            release_slot(task_id)
             return None
 
         file_info["stt_task_id"] = task_id
-        stt_file_name = file_info["file_path"]
-        # 如果是视频文件，提取音频
-        if file_info["file_type"].startswith("video/"):
-            sync_redis.set_stt_task(
-                task_id=task_id,
-                task_info={
-                    "file_id": file_id,
-                    "state": "PROGRESS",
-                    "process": "file_transcode",
-                },
-            )
-            video_clip = VideoFileClip(file_info["file_path"])
-            audio_clip = video_clip.audio
-            stt_file_name = file_info["file_path"] + ".wav"
-            audio_clip.write_audiofile(stt_file_name, codec="pcm_s16le")
-            video_clip.close()
-            audio_clip.close()
-
-        file_info["stt_file_name"] = stt_file_name
-
-        global model
-        if model is None:
-            torch.set_num_threads(os.cpu_count())
-            model = load_model(model_name)
-
-        if stt_file_name.lower().endswith(".wav"):
-            with wave.open(stt_file_name, "r") as wav_file:
-                length = wav_file.getnframes()
-                channels = wav_file.getnchannels()
-                width = wav_file.getsampwidth()
-                framerate = wav_file.getframerate()
-                duration = length / float(framerate)
-                file_info["audio_length"] = length
-                file_info["audio_channels"] = channels
-                file_info["audio_width"] = width
-                file_info["audio_framerate"] = framerate
-        else:
-            from pydub import AudioSegment
-
-            audio = AudioSegment.from_file(stt_file_name)
-            duration = len(audio) / 1000.0
-            file_info["audio_length"] = len(audio.get_array_of_samples())
-            file_info["audio_channels"] = audio.channels
-            file_info["audio_width"] = audio.sample_width
-            file_info["audio_framerate"] = audio.frame_rate
+        if not sync_redis.has_checkpoint(task_id):
+            # 从检查点继续时保留已输出的中间结果
+            sync_redis.expire_partial_segments(task_id, 0)
+        sync_redis.set_task_summary(task_id, {"state": "PROGRESS"})
+        T0 = time.time()
+        if should_fan_out(file_info):
+            return fan_out(task_id, file_info, options, T0, timings)
 
-        logger.info(f"{task_id} 任务开始处理，文件信息：{file_info}")
+        # 播放代理与转写并行生成
+        proxy = start_proxy_job(file_info)
 
-        file_path = file_info["stt_file_name"]
-        file_name = file_info["file_name"]
+        # 直接解码为 16kHz 单声道数组交给模型，视频文件也无需先导出 wav
+        set_progress(task_id, file_id, "decoding_audio")
+        audio, audio_info = load_audio(file_info["file_path"], timings=timings)
+        duration = audio_info.pop("duration")
+        file_info.update(audio_info)
+        # 音频已在内存中，顺带生成波形峰值，前端无需下载整个文件再解码
+        with stage(timings, "peaks"):
+            sync_redis.set_peaks(file_id, SAMPLE_RATE, duration, build_peaks(audio))
 
+        logger.info(f"{task_id} 任务开始处理，文件信息：{file_info}")
         sync_redis.add_file(file_id, file_info)
 
-        T0 = time.time()
-        sync_redis.set_stt_task(
-            task_id=task_id,
-            task_info={
-                "file_id": file_id,
-                "state": "PROGRESS",
-                "process": "loading_model",
-            },
-        )
-        T1 = time.time()
-        logger.info(f"加载模型耗时：{T1-T0}秒")
-        logger.info(f"开始处理文件：{file_path}")
-        sync_redis.set_stt_task(
-            task_id=task_id,
-            task_info={
-                "file_id": file_id,
-                "state": "PROGRESS",
-                "process": "processing_file",
-            },
+        set_progress(task_id, file_id, "loading_model")
+        with stage(timings, "model_load"):
+            get_model(options)
+        logger.info(f"开始处理文件：{file_info['file_path']}")
+        set_progress(task_id, file_id, "processing_file")
+
+        def on_window(window_segments, done, total):
+            sync_redis.append_partial_segments(task_id, window_segments)
+            publish_event(
+                task_id,
+                "PROGRESS",
+                "processing_file",
+                processing_percent(done, total),
+                windows=total,
+                windows_done=done,
+            )
+
+        with stage(timings, "transcribe"):
+            segments, vad = transcribe_speech(
+                audio, options, on_window=on_window, task_id=task_id
+            )
+        finish_proxy_job(file_info, proxy, timings)
+        proxy = None
+
+        complete_task(
+            task_id,
+            file_info,
+            options,
+            segments,
+            duration,
+            T0,
+            vad=vad,
+            timings=timings,
+        )
+    except TaskCancelled:
+        logger.info(f"{task_id} 任务已取消")
+        cancel_proxy_job(proxy)
+        set_failure(task_id, file_id, process="cancelled")
+    except Exception as e:
+        logger.exception(e)
+        cancel_proxy_job(proxy)
+        set_failure(task_id, file_id)
+
+
+def fan_out(task_id, file_info, options, started_at, timings):
+    """把长文件按静音位置切成重叠窗口，以 chord 分发给多个 worker 并行转写
+
+    窗口子任务和合并任务都投递到共用的窗口队列，不论文件属于哪个时长队列，
+    都由窗口池的全部 worker 并行处理；播放代理在窗口分发之后由 build_proxy 单独生成。
+    """
+    file_id = file_info["file_id"]
+    set_progress(task_id, file_id, "splitting_file")
+    peaks = PeakBuilder()
+    with stage(timings, "split"):
+        envelope, duration = energy_envelope(
+            file_info["file_path"], frame_sec=ENVELOPE_FRAME_SEC, peaks=peaks
         )
+    sync_redis.set_peaks(file_id, SAMPLE_RATE, duration, peaks.finish())
+    windows = plan_windows(
+        envelope,
+        duration,
+        ENVELOPE_FRAME_SEC,
+        window=float(FANOUT_CONFIG.get("window", 600)),
+        overlap=float(FANOUT_CONFIG.get("overlap", 5)),
+        search=float(FANOUT_CONFIG.get("search", 30)),
+    )
+    logger.info(f"{task_id} 文件时长 {duration} 秒，切分为 {len(windows)} 个窗口并行转写")
 
-        result = model.transcribe(
-            file_path,
-            fp16=False,
-            temperature=0,
-            language="Chinese",
-            initial_prompt="以下是简体中文普通话的句子。",
-            verbose=False,
-            word_timestamps=True,  # 获取每个词的时间戳
+    file_info["audio_length"] = int(duration * SAMPLE_RATE)
+    sync_redis.add_file(file_id, file_info)
+    set_progress(task_id, file_id, "processing_file", windows=len(windows))
+
+    route = {"queue": WINDOW_QUEUE}
+    header = [
+        transcribe_window.s(task_id, file_info["file_path"], window, options).set(
+            **route
+        )
+        for window in windows
+    ]
+    callback = (
+        merge_windows.s(
+            task_id, file_info, options, windows, duration, started_at, timings
+        )
+        .set(**route)
+        .on_error(fan_out_failed.s(task_id, file_id).set(**route))
+    )
+    # 先原子地占用分发标记再分发，重新投递的消息不会再次分发同一组窗口
+    if sync_redis.claim_fan_out(task_id):
+        chord(header)(callback)
+        if wants_proxy(file_info):
+            build_proxy.apply_async(args=(file_id,), queue=PROXY_QUEUE)
+    return task_id
+
+
+@app.task(bind=True)
+def transcribe_window(self, task_id, file_path, window, options):
+    check_cancelled(task_id)
+    T0 = time.time()
+    timings = {}
+    with stage(timings, "decode"):
+        audio = decode_audio(
+            file_path, start=window["start"], duration=window["end"] - window["start"]
         )
-        T2 = time.time()
-        logger.info(f"识别耗时：{T2-T1}秒")
+    with stage(timings, "model_load"):
+        get_model(options)
 
-        segments = result["segments"]
-        formatted_text = "\n\n".join([s["text"] for s in segments])
+    def on_window(window_segments, done, total):
+        # 只输出属于本窗口归属区间的片段，重叠部分由相邻窗口负责；
+        # 各窗口并行转写，中间结果按窗口顺序输出
+        shifted = offset_segments(copy.deepcopy(window_segments), window["start"])
+        partial = [s for s in shifted if owns_segment(window, s)]
+        sync_redis.publish_window_partial(task_id, window["index"], done - 1, partial)
 
-        sync_redis.set_stt_task(
+    with stage(timings, "transcribe"):
+        segments, vad = transcribe_speech(
+            audio,
+            options,
+            on_window=on_window,
             task_id=task_id,
-            task_info={
-                "file_id": file_id,
-                "state": "PROGRESS",
-                "process": "generating_subtitle",
-            },
-        )
-
-        base_processed_filename = os.path.basename(file_path)
-        srt_filename = f"{base_processed_filename}.srt"
-        srt_output_dir = "./result"
-        srt_file_path = os.path.join(srt_output_dir, srt_filename)
-
-        writer = get_writer("srt", srt_output_dir)
-        writer(
-            result,
-            srt_filename,
-            # {"highlight_words": True, "max_line_count": 3, "max_line_width": 3},
-        )
-        T3 = time.time()
-        logger.info(f"生成字幕耗时：{T3-T2}秒")
-
-        # os.remove(file_path)
-        logger.info(f"文件处理完毕：{file_path}")
-
-        task_info = {}
-        task_info["completion_time"] = datetime.now().isoformat()
-        task_info["file_id"] = file_id
-        task_info["file_type"] = file_info.get("file_type")
-        task_info["file_name"] = file_name
-        task_info["file_path"] = file_info["file_path"]
-        task_info["duration"] = duration
-        task_info["srt_path"] = srt_file_path
-        task_info["status"] = "success"
-        task_info["process"] = "completed"
-        task_info["cost_time"] = round(T3 - T0, 2)
-        task_info["text"] = formatted_text
-        task_info["segments"] = segments
-        task_info["state"] = "SUCCESS"
-
-        sync_redis.set_stt_task(task_id=task_id, task_info=task_info)
+            scope=f"window{window['index']}",
+        )
+    logger.info(
+        f"{task_id} 窗口 {window['index']} "
+        f"[{window['start']}, {window['end']}] 识别耗时：{time.time()-T0}秒"
+    )
+    sync_redis.publish_window_partial(task_id, window["index"], None, [], finished=True)
+
+    done = sync_redis.incr_task_counter(task_id, "windows_done") or 0
+    publish_event(
+        task_id,
+        "PROGRESS",
+        "processing_file",
+        processing_percent(done, window["count"]),
+        windows=window["count"],
+        windows_done=done,
+    )
+    return {
+        "index": window["index"],
+        "segments": segments,
+        "vad": vad,
+        "timings": timings,
+    }
+
+
+@app.task(bind=True)
+def merge_windows(
+    self,
+    results,
+    task_id,
+    file_info,
+    options,
+    windows,
+    duration,
+    started_at,
+    timings=None,
+):
+    try:
+        segments = merge_window_results(results, windows)
+        vad = merge_vad_reports([r.get("vad") for r in results])
+        # 各窗口的解码、加载模型和转写耗时累加为整个任务的耗时
+        timings = dict(timings or {})
+        for result in results:
+            for name, seconds in (result.get("timings") or {}).items():
+                timings[name] = timings.get(name, 0) + seconds
+        complete_task(
+            task_id,
+            file_info,
+            options,
+            segments,
+            duration,
+            started_at,
+            vad=vad,
+            timings=timings,
+        )
     except Exception as e:
         logger.exception(e)
-        sync_redis.set_stt_task(
-            task_id=task_id,
-            task_info={"file_id": file_id, "state": "FAILURE", "process": "failed"},
-        )
-    finally:
-        # 确保所有临时文件都被清理
-        if file_info["file_path"] != file_info["stt_file_name"]:
-            if os.path.exists(file_info["stt_file_name"]):
-                os.remove(file_info["stt_file_name"])
+        set_failure(task_id, file_info["file_id"])
+
+
+@app.task
+def fan_out_failed(request, exc, traceback, task_id, file_id):
+    if sync_redis.is_task_cancelled(task_id):
+        logger.info(f"{task_id} 任务已取消")
+        set_failure(task_id, file_id, process="cancelled")
+        return
+    logger.error(f"{task_id} 窗口转写失败：{exc}")
+    set_failure(task_id, file_id)
 
 
 async def get_stt_progress(task_id):
@@ -182,3 +663,196 @@ async def get_stt_progress(task_id):
     except Exception as e:
         logger.exception(e)
         return None
+
+
+RANGE_CONTEXT_SEC = 60
+SPLICE_RETRIES = 3
+
+
+def split_range(segments, start, end):
+    """把片段分为 (范围之前, 与 [start, end] 重叠, 范围之后) 三组"""
+    before = [s for s in segments if s["end"] <= start]
+    after = [s for s in segments if s["start"] >= end]
+    inside = [s for s in segments if s["end"] > start and s["start"] < end]
+    return before, inside, after
+
+
+def splice_segments(task_id, start, end, new_segments):
+    """用新片段替换转写稿中与 [start, end] 重叠的片段，范围外的片段（含人工编辑）不变
+
+    在最新版本上执行，提交期间转写稿被修改时重新读取后重试。
+    """
+    for _ in range(SPLICE_RETRIES):
+        meta = sync_redis.get_stt_task_meta(task_id)
+        if meta is None:
+            return None
+        before, inside, after = split_range(
+            sync_redis.get_stt_segments(task_id, start, end) or [], start, end
+        )
+        if not inside and not new_segments:
+            return {"version": meta.get("version", 1), "segments": [], "removed": []}
+        op = {
+            "op": "replace_range",
+            "segment_ids": [s["id"] for s in inside],
+            "segments": new_segments,
+        }
+        if not inside:
+            # 范围内原本没有片段，插入到相邻片段旁边
+            before, _, after = split_range(
+                sync_redis.get_stt_segments(task_id) or [], start, end
+            )
+            if before:
+                op["after_segment_id"] = before[-1]["id"]
+            elif after:
+                op["before_segment_id"] = after[0]["id"]
+        try:
+            return sync_redis.patch_stt_segments(
+                task_id, [op], meta.get("version", 1)
+            )
+        except VersionConflict:
+            continue
+    raise RuntimeError(f"Transcript {task_id} kept changing during splice")
+
+
+def set_range_progress(job_id, job_info, process, state="PROGRESS", **extra):
+    job_info.update({"state": state, "process": process}, **extra)
+    sync_redis.set_range_job(job_id, job_info)
+
+
+@app.task(bind=True)
+def retranscribe_range(self, job_id, task_id, start, end, options=None):
+    """只解码并重新转写 [start, end]，把结果拼接回转写稿
+
+    与范围部分重叠的片段整段重新转写；范围之前的转写文本作为解码提示。
+    """
+    job_info = sync_redis.get_range_job(job_id) or {"job_id": job_id}
+    timings = {}
+    T0 = time.time()
+    try:
+        options = resolve_options(options)
+        meta = sync_redis.get_stt_task_meta(task_id)
+        if meta is None:
+            raise RuntimeError(f"Task {task_id} not found")
+        set_range_progress(job_id, job_info, "decoding_audio")
+        nearby = sync_redis.get_stt_segments(task_id, start - RANGE_CONTEXT_SEC, end)
+        before, inside, _ = split_range(nearby or [], start, end)
+        decode_start = max(0.0, min([start] + [s["start"] for s in inside]))
+        decode_end = max([end] + [s["end"] for s in inside])
+        context = "".join(s["text"] for s in before[-5:])[-PROMPT_CONTEXT_CHARS:]
+        with stage(timings, "decode"):
+            audio = decode_audio(
+                meta["file_path"],
+                start=decode_start,
+                duration=decode_end - decode_start,
+            )
+
+        set_range_progress(job_id, job_info, "loading_model")
+        with stage(timings, "model_load"):
+            get_model(options)
+        set_range_progress(job_id, job_info, "processing_file")
+        with stage(timings, "transcribe"):
+            segments, _ = transcribe_speech(audio, options, context=context)
+        segments = offset_segments(segments, decode_start)
+        for segment in segments:
+            segment.pop("id", None)
+
+        set_range_progress(job_id, job_info, "saving_result")
+        result = splice_segments(task_id, start, end, segments)
+        if result is None:
+            raise RuntimeError(f"Task {task_id} not found")
+        sync_redis.index_task_segments(
+            task_id, result["segments"], removed=result["removed"]
+        )
+        timings = {name: round(t, 3) for name, t in timings.items()}
+        set_range_progress(
+            job_id,
+            job_info,
+            "completed",
+            state="SUCCESS",
+            result=result,
+            cost_time=round(time.time() - T0, 2),
+            timings=timings,
+        )
+        logger.info(
+            f"{task_id} 重新转写 [{decode_start}, {decode_end}]：替换 "
+            f"{len(result['removed'])} 个片段，新增 {len(segments)} 个，耗时 {timings}"
+        )
+        sync_redis.observe_metrics(
+            [
+                ("cutai_stage_duration_seconds", {"stage": f"range_{name}"}, seconds)
+                for name, seconds in timings.items()
+            ]
+        )
+    except Exception as e:
+        logger.exception(e)
+        set_range_progress(job_id, job_info, "failed", state="FAILURE", error=str(e))
+
+
+def set_clip_progress(clip_id, clip_info, process, percent, state="PROGRESS"):
+    clip_info.update({"state": state, "process": process, "percent": percent})
+    sync_redis.set_clip(clip_id, clip_info)
+
+
+@app.task(bind=True)
+def export_clip(self, clip_id, task_id, file_path, ranges):
+    """按时间范围从原文件剪辑并按顺序拼接
+
+    视频只重新编码每个范围起点到下一个关键帧之间的画面，其余部分直接复制数据流。
+    """
+    clip_info = sync_redis.get_clip(clip_id) or {"clip_id": clip_id}
+    work_dir = os.path.join(CLIP_DIR, task_id, clip_id)
+    timings = {}
+    T0 = time.time()
+    try:
+        set_clip_progress(clip_id, clip_info, "probing", 0)
+        with stage(timings, "clip_probe"):
+            video = probe_video(file_path)
+        pieces = plan_pieces([tuple(r) for r in ranges], video)
+
+        os.makedirs(work_dir, exist_ok=True)
+        ext = piece_ext(file_path, video)
+        piece_paths = []
+        for index, (start, end, stream_copy) in enumerate(pieces):
+            path = os.path.join(work_dir, f"{index:04d}{ext}")
+            with stage(timings, "clip_copy" if stream_copy else "clip_encode"):
+                cut_piece(
+                    file_path,
+                    path,
+                    start,
+                    end,
+                    stream_copy,
+                    video,
+                    crf=int(CLIP_CONFIG.get("crf", 18)),
+                    preset=CLIP_CONFIG.get("preset", "veryfast"),
+                )
+            piece_paths.append(path)
+            set_clip_progress(
+                clip_id, clip_info, "cutting", 90 * (index + 1) // len(pieces)
+            )
+
+        clip_path = os.path.join(
+            CLIP_DIR, task_id, clip_id + clip_ext(file_path, video, pieces)
+        )
+        with stage(timings, "clip_concat"):
+            concat_pieces(piece_paths, clip_path)
+
+        clip_info["clip_path"] = clip_path
+        clip_info["copied_seconds"] = round(sum(e - s for s, e, c in pieces if c), 3)
+        clip_info["encoded_seconds"] = round(
+            sum(e - s for s, e, c in pieces if not c), 3
+        )
+        clip_info["cost_time"] = round(time.time() - T0, 2)
+        clip_info["timings"] = {name: round(t, 3) for name, t in timings.items()}
+        set_clip_progress(clip_id, clip_info, "completed", 100, state="SUCCESS")
+        logger.info(f"{clip_id} 剪辑完成：{clip_info}")
+        sync_redis.observe_metrics(
+            [
+                ("cutai_stage_duration_seconds", {"stage": name}, seconds)
+                for name, seconds in timings.items()
+            ]
+        )
+    except Exception as e:
+        logger.exception(e)
+        set_clip_progress(clip_id, clip_info, "failed", 100, state="FAILURE")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
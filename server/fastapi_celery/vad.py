@@ -0,0 +1,132 @@
+import bisect
+
+import numpy as np
+
+from fastapi_celery.audio import SAMPLE_RATE, frame_energy
+
+
+def detect_speech(
+    audio,
+    sr=SAMPLE_RATE,
+    frame_sec=0.03,
+    margin_db=12.0,
+    min_threshold_db=-55.0,
+    min_speech=0.25,
+    min_silence=0.6,
+    pad=0.2,
+):
+    """基于短时能量的语音活动检测，返回语音区间列表 [(start, end), ...]（秒）
+
+    阈值取噪声底（能量 10% 分位数）加 margin_db，且不低于 min_threshold_db。
+    间隔小于 min_silence 的区间会合并，短于 min_speech 的区间丢弃，
+    保留下来的区间两端各扩展 pad 秒，避免截断词首词尾。
+    """
+    energy = frame_energy(audio, frame_sec, sr)
+    n_frames = len(energy)
+    if n_frames == 0:
+        return []
+
+    threshold = max(np.percentile(energy, 10) + margin_db, min_threshold_db)
+    voiced = energy > threshold
+
+    regions = []
+    start = None
+    for i, is_voiced in enumerate(voiced):
+        if is_voiced and start is None:
+            start = i
+        elif not is_voiced and start is not None:
+            regions.append([start * frame_sec, i * frame_sec])
+            start = None
+    if start is not None:
+        regions.append([start * frame_sec, n_frames * frame_sec])
+
+    merged = []
+    for region in regions:
+        if merged and region[0] - merged[-1][1] < min_silence:
+            merged[-1][1] = region[1]
+        else:
+            merged.append(region)
+
+    duration = len(audio) / float(sr)
+    speech = []
+    for start, end in merged:
+        if end - start < min_speech:
+            continue
+        start, end = max(0.0, start - pad), min(duration, end + pad)
+        if speech and start <= speech[-1][1]:
+            speech[-1] = (speech[-1][0], end)
+        else:
+            speech.append((start, end))
+    return speech
+
+
+def compact_audio(audio, regions, sr=SAMPLE_RATE, gap=0.3):
+    """只保留语音区间并拼接（区间之间插入 gap 秒静音），返回 (音频, 时间映射)
+
+    时间映射是 [(拼接后起点, 原始起点, 时长), ...]，用于把结果时间戳还原。
+    """
+    pieces = []
+    mapping = []
+    silence = np.zeros(int(gap * sr), dtype=audio.dtype)
+    position = 0.0
+    for start, end in regions:
+        piece = audio[int(start * sr) : int(end * sr)]
+        if pieces:
+            pieces.append(silence)
+            position += gap
+        pieces.append(piece)
+        mapping.append((position, start, len(piece) / float(sr)))
+        position += len(piece) / float(sr)
+
+    if not pieces:
+        return np.zeros(0, dtype=audio.dtype), mapping
+    return np.concatenate(pieces), mapping
+
+
+def restore_time(t, mapping, is_start=False):
+    """把拼接后音频上的时间还原到原始时间轴
+
+    落在插入静音里的时间点：起始时间归到下一段开头，结束时间归到上一段末尾。
+    """
+    starts = [m[0] for m in mapping]
+    index = max(bisect.bisect_right(starts, t) - 1, 0)
+    compact_start, original_start, length = mapping[index]
+    offset = t - compact_start
+    if is_start and offset > length and index + 1 < len(mapping):
+        return round(mapping[index + 1][1], 3)
+    return round(original_start + min(max(offset, 0.0), length), 3)
+
+
+def restore_segments(segments, mapping):
+    for segment in segments:
+        segment["start"] = restore_time(segment["start"], mapping, is_start=True)
+        segment["end"] = restore_time(segment["end"], mapping)
+        for word in segment.get("words", []):
+            word["start"] = restore_time(word["start"], mapping, is_start=True)
+            word["end"] = restore_time(word["end"], mapping)
+    return segments
+
+
+def vad_report(audio_seconds, speech_seconds, transcribe_seconds):
+    """统计跳过的非语音时长，并按实测的实时率估算节省的转写时间"""
+    skipped = max(audio_seconds - speech_seconds, 0.0)
+    rtf = transcribe_seconds / speech_seconds if speech_seconds else 0.0
+    return {
+        "audio_seconds": round(audio_seconds, 2),
+        "speech_seconds": round(speech_seconds, 2),
+        "skipped_seconds": round(skipped, 2),
+        "skipped_ratio": round(skipped / audio_seconds, 4) if audio_seconds else 0.0,
+        "transcribe_seconds": round(transcribe_seconds, 2),
+        "saved_seconds": round(skipped * rtf, 2),
+    }
+
+
+def merge_vad_reports(reports):
+    reports = [r for r in reports if r]
+    if not reports:
+        return None
+    return vad_report(
+        sum(r["audio_seconds"] for r in reports),
+        sum(r["speech_seconds"] for r in reports),
+        sum(r["transcribe_seconds"] for r in reports),
+    )
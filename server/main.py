@@ -1,7 +1,17 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
+from api.batch import router as batch
+from api.clips import router as clips
+from api.export import router as export
+from api.media import router as media
+from api.metrics import router as metrics
+from api.search import router as search
 from api.stt import router as stt
+from api.upload import router as upload
+from api.waveform import router as waveform
+from db.async_redis import async_redis
+from utils.metrics import HTTP_LATENCY
 import logging
 from loguru import logger
 import time
@@ -42,12 +52,26 @@ app.add_middleware(
     allow_headers=["*"],  # 允许的头信息列表，['*'] 表示允许所有头
 )
 app.include_router(stt, prefix="/api", tags=["语音转写"])
+app.include_router(upload, prefix="/api", tags=["文件上传"])
+app.include_router(export, prefix="/api", tags=["字幕导出"])
+app.include_router(waveform, prefix="/api", tags=["波形"])
+app.include_router(media, prefix="/api", tags=["播放代理"])
+app.include_router(search, prefix="/api", tags=["全文检索"])
+app.include_router(clips, prefix="/api", tags=["剪辑导出"])
+app.include_router(batch, prefix="/api", tags=["批量转写"])
+app.include_router(metrics, tags=["监控指标"])
 from fastapi.staticfiles import StaticFiles
 app.mount("/storage", StaticFiles(directory="storage"), name="storage")
 
 
 
 async def on_startup():
+    # 所有路由共用一个异步连接池，随应用启动创建、关闭时释放
+    await async_redis.connect()
+    # 旧版本只维护了全局任务列表，首次启动时补建任务索引
+    await async_redis.migrate_task_list_to_index()
+    # 建立全文索引之前完成的任务，首次启动时补建索引
+    await async_redis.backfill_search_index()
     logger.info("应用启动，列出所有路由：")
     for route in app.routes:
         if hasattr(route, "methods"):
@@ -59,6 +83,7 @@ async def on_startup():
 
 
 async def on_shutdown():
+    await async_redis.disconnect()
     logger.info("应用关闭")
 
 
@@ -72,15 +97,28 @@ app.router.add_event_handler("shutdown", on_shutdown)
 async def log_requests(request: Request, call_next):
     # 请求开始时记录
     logger.info(f"请求开始: {request.method} {request.url}")
-    start_time = time.time()
+    start_time = time.perf_counter()
 
     # 处理请求
     response = await call_next(request)
 
-    # 请求结束时记录
-    process_time = (time.time() - start_time) * 1000
-    logger.info(
-        f"请求结束: {request.method} {request.url} 完成于 {process_time}ms 状态码: {response.status_code}"
+    # 请求结束时记录；按路由模板统计延迟，避免路径参数让标签无限增长
+    elapsed = time.perf_counter() - start_time
+    route = request.scope.get("route")
+    route_path = getattr(route, "path", "unmatched")
+    HTTP_LATENCY.observe(
+        elapsed,
+        method=request.method,
+        route=route_path,
+        status=response.status_code,
+    )
+    logger.bind(
+        method=request.method,
+        route=route_path,
+        status=response.status_code,
+        duration_ms=round(elapsed * 1000, 2),
+    ).info(
+        f"请求结束: {request.method} {request.url} 完成于 {elapsed * 1000}ms 状态码: {response.status_code}"
     )
 
     return response
@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+# config_loader 按相对路径读取 ./config/config.yaml，与启动服务时一样在 server 目录下运行
+os.chdir(SERVER_DIR)
+
+
+@pytest.fixture
+def fake_server():
+    fakeredis = pytest.importorskip("fakeredis")
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def sync_redis(fake_server, monkeypatch):
+    """不连接真实 Redis 的 RedisHandler，与 async_redis 共用同一个 fakeredis 实例"""
+    import fakeredis
+    from db.redis import RedisHandler
+
+    monkeypatch.setattr(RedisHandler, "connect", lambda self: None)
+    handler = RedisHandler()
+    handler.redis_client = fakeredis.FakeRedis(server=fake_server)
+    return handler
+
+
+@pytest.fixture
+def async_redis(fake_server):
+    import fakeredis
+    from db.async_redis import AsyncRedisHandler
+
+    handler = AsyncRedisHandler()
+    handler.redis_client = fakeredis.FakeAsyncRedis(server=fake_server)
+    return handler
@@ -0,0 +1,77 @@
+from db.codec import (
+    block_info,
+    blocks_in_range,
+    decode_block,
+    encode_block,
+    pack_segments,
+    unpack_text,
+)
+
+
+def make_segment(i, **extra):
+    segment = {
+        "id": i,
+        "seek": i * 100,
+        "start": i * 2.0,
+        "end": i * 2.0 + 1.5,
+        "text": f"第{i}句",
+        "tokens": [50364, 100 + i, 50414],
+        "temperature": 0.0,
+        "avg_logprob": -0.25,
+        "compression_ratio": 1.5,
+        "no_speech_prob": 0.125,
+        "words": [
+            {"word": "第", "start": i * 2.0, "end": i * 2.0 + 0.5, "probability": 0.5},
+            {"word": f"{i}句", "start": i * 2.0 + 0.5, "end": i * 2.0 + 1.5},
+        ],
+    }
+    segment.update(extra)
+    return segment
+
+
+def test_round_trip_keeps_all_fields():
+    segments = [make_segment(i) for i in range(5)]
+    assert decode_block(encode_block(segments)) == segments
+
+
+def test_round_trip_keeps_unknown_fields():
+    segment = make_segment(0, speaker="A")
+    segment["words"][0]["speaker"] = "A"
+    assert decode_block(encode_block([segment])) == [segment]
+
+
+def test_missing_words_and_tokens_stay_missing():
+    segment = {"id": 0, "start": 0.0, "end": 1.0, "text": "hello"}
+    empty_words = {"start": 1.0, "end": 2.0, "text": "", "words": []}
+    assert decode_block(encode_block([segment, empty_words])) == [
+        segment,
+        empty_words,
+    ]
+
+
+def test_timestamps_are_stored_in_milliseconds():
+    segment = {"id": 0, "start": 1.23449, "end": 2.0, "text": "a"}
+    assert decode_block(encode_block([segment]))[0]["start"] == 1.234
+
+
+def test_pack_segments_splits_into_blocks():
+    segments = [make_segment(i) for i in range(7)]
+    blocks, segment_blocks, text_blocks, locate = pack_segments(segments, block_size=3)
+
+    assert [b["count"] for b in blocks] == [3, 3, 1]
+    assert blocks[1] == {"start": 6.0, "end": 11.5, "count": 3}
+    assert locate == {0: 0, 1: 0, 2: 0, 3: 1, 4: 1, 5: 1, 6: 2}
+    decoded = [s for b in range(3) for s in decode_block(segment_blocks[b])]
+    assert decoded == segments
+    assert unpack_text(blocks, text_blocks) == "\n\n".join(s["text"] for s in segments)
+
+
+def test_blocks_in_range_skips_empty_blocks():
+    segments = [make_segment(i) for i in range(6)]
+    blocks = pack_segments(segments, block_size=2)[0]
+    blocks.insert(1, block_info([]))
+
+    assert blocks_in_range(blocks) == [0, 2, 3]
+    assert blocks_in_range(blocks, 4.5, 6.2) == [2]
+    assert blocks_in_range(blocks, 3.0, 8.2) == [0, 2, 3]
+    assert blocks_in_range(blocks, 100, None) == []
@@ -0,0 +1,92 @@
+import numpy as np
+
+from fastapi_celery.fanout import (
+    merge_window_results,
+    offset_segments,
+    owns_segment,
+    plan_windows,
+)
+
+
+def envelope_with_dips(duration, frame_sec, dips):
+    envelope = np.zeros(int(duration / frame_sec))
+    for t in dips:
+        envelope[int(t / frame_sec)] = -60.0
+    return envelope
+
+
+def test_short_audio_is_a_single_window():
+    windows = plan_windows(np.zeros(500), 50.0, 0.1, window=600, overlap=5, search=30)
+    assert windows == [
+        {
+            "index": 0,
+            "start": 0.0,
+            "end": 50.0,
+            "own_start": 0.0,
+            "own_end": 50.0,
+            "count": 1,
+        }
+    ]
+
+
+def test_cuts_at_quietest_frame_near_nominal_position():
+    envelope = envelope_with_dips(1500, 0.1, [590.0, 1215.0])
+    windows = plan_windows(envelope, 1500.0, 0.1, window=600, overlap=5, search=30)
+
+    assert [(w["own_start"], w["own_end"]) for w in windows] == [
+        (0.0, 590.0),
+        (590.0, 1215.0),
+        (1215.0, 1500.0),
+    ]
+    assert [(w["start"], w["end"]) for w in windows] == [
+        (0.0, 595.0),
+        (585.0, 1220.0),
+        (1210.0, 1500.0),
+    ]
+    assert {w["count"] for w in windows} == {3}
+
+
+def test_owned_ranges_are_half_open():
+    envelope = np.zeros(12000)
+    windows = plan_windows(envelope, 1200.0, 0.1, window=600, overlap=5, search=0)
+    first, last = windows
+    boundary = {"start": 599.0, "end": 601.0}
+    assert not owns_segment(first, boundary)
+    assert owns_segment(last, boundary)
+    # 最后一个窗口包含结束位置
+    assert owns_segment(last, {"start": 1200.0, "end": 1200.0})
+
+
+def test_merge_drops_overlap_duplicates_and_renumbers():
+    windows = plan_windows(np.zeros(200), 20.0, 0.1, window=10, overlap=5, search=0)
+    assert [(w["start"], w["end"]) for w in windows] == [(0.0, 15.0), (5.0, 20.0)]
+    results = [
+        {
+            "index": 1,
+            "segments": [
+                {"id": 0, "start": 3.0, "end": 4.5, "text": "dup"},
+                {"id": 1, "start": 5.0, "end": 7.0, "text": "c"},
+            ],
+        },
+        {
+            "index": 0,
+            "segments": [
+                {"id": 0, "start": 1.0, "end": 3.0, "text": "a"},
+                {"id": 1, "start": 8.0, "end": 9.5, "text": "b"},
+                {"id": 2, "start": 10.0, "end": 12.0, "text": "late"},
+            ],
+        },
+    ]
+    merged = merge_window_results(results, windows)
+    assert [(s["id"], s["text"], s["start"]) for s in merged] == [
+        (0, "a", 1.0),
+        (1, "b", 8.0),
+        (2, "c", 10.0),
+    ]
+
+
+def test_offset_segments_shifts_words():
+    segments = [{"start": 1.0, "end": 2.0, "words": [{"start": 1.0, "end": 1.5}]}]
+    assert offset_segments(segments, 100.0) == [
+        {"start": 101.0, "end": 102.0, "words": [{"start": 101.0, "end": 101.5}]}
+    ]
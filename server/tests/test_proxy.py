@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+import fastapi_celery.tasks as tasks
+
+
+@pytest.fixture
+def worker_redis(sync_redis, monkeypatch):
+    monkeypatch.setattr(tasks, "sync_redis", sync_redis)
+    sync_redis.add_file("f1", {"file_id": "f1", "file_path": "long.mp3"})
+    return sync_redis
+
+
+def test_fan_out_dispatches_proxy_after_windows(worker_redis, monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        tasks,
+        "energy_envelope",
+        lambda path, frame_sec, peaks: (np.zeros(12000), 1200.0),
+    )
+    monkeypatch.setattr(
+        tasks, "chord", lambda header: lambda callback: calls.append(("chord", header))
+    )
+    monkeypatch.setattr(
+        tasks.build_proxy,
+        "apply_async",
+        lambda args, queue: calls.append(("proxy", args, queue)),
+    )
+    monkeypatch.setattr(tasks, "start_proxy", pytest.fail)
+
+    file_info = worker_redis.get_file("f1")
+    tasks.fan_out("t1", file_info, {}, 0.0, {})
+    # 重新投递的消息不会再次分发
+    tasks.fan_out("t1", file_info, {}, 0.0, {})
+
+    assert [call[0] for call in calls] == ["chord", "proxy"]
+    assert len(calls[0][1]) == 2
+    assert calls[1][1:] == (("f1",), tasks.PROXY_QUEUE)
+
+
+def test_build_proxy_keeps_file_updates_made_meanwhile(worker_redis, monkeypatch):
+    def finish(process, out_path):
+        # 代理生成期间其他任务更新了文件信息
+        file_info = worker_redis.get_file("f1")
+        worker_redis.add_file("f1", dict(file_info, audio_length=100))
+
+    monkeypatch.setattr(tasks, "start_proxy", lambda *args, **kwargs: object())
+    monkeypatch.setattr(tasks, "finish_proxy", finish)
+    tasks.build_proxy("f1")
+
+    file_info = worker_redis.get_file("f1")
+    assert file_info["audio_length"] == 100
+    assert file_info["proxy_path"].endswith("f1.m4a")
+
+    # 已有代理时不再生成
+    monkeypatch.setattr(tasks, "start_proxy", pytest.fail)
+    tasks.build_proxy("f1")
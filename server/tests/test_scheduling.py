@@ -0,0 +1,150 @@
+import asyncio
+
+from db import keys
+from utils.scheduling import estimate_start, queue_status, size_class
+
+
+def job(task_id, user="u1", size="short", duration=60):
+    return {
+        "task_id": task_id,
+        "file_id": f"file-{task_id}",
+        "size_class": size,
+        "user": user,
+        "duration": duration,
+    }
+
+
+def admit(async_redis, task_ids, user_slots=2, **kwargs):
+    async def run():
+        return [
+            await async_redis.admit_job(t, job(t, **kwargs), user_slots)
+            for t in task_ids
+        ]
+
+    return asyncio.run(run())
+
+
+def slots(client, user="u1", size="short"):
+    inflight_key, held_key = keys.user_slot_keys(size, user)
+    inflight = int(client.get(inflight_key) or 0)
+    held = [t.decode("utf-8") for t in client.lrange(held_key, 0, -1)]
+    return inflight, held
+
+
+def queued(client, size="short"):
+    members = client.zrange(keys.QUEUEKEY_PREFIX + size, 0, -1)
+    return [t.decode("utf-8") for t in members]
+
+
+def test_size_class():
+    assert size_class(None) == "medium"
+    assert size_class(300) == "short"
+    assert size_class(301) == "medium"
+    assert size_class(7200) == "long"
+
+
+def test_admit_holds_jobs_beyond_user_slots(sync_redis, async_redis):
+    assert admit(async_redis, ["a", "b", "c", "d"]) == [True, True, False, False]
+    assert admit(async_redis, ["x"], user="u2") == [True]
+
+    client = sync_redis.redis_client
+    assert slots(client) == (2, ["c", "d"])
+    assert queued(client) == ["a", "b", "x"]
+    # 暂存的任务可能要等很久，不设过期时间
+    assert client.ttl(keys.JOBKEY_PREFIX + "a") > 0
+    assert client.ttl(keys.JOBKEY_PREFIX + "c") == -1
+    assert client.ttl(keys.user_slot_keys("short", "u1")[1]) == -1
+
+
+def test_release_promotes_next_held_job(sync_redis, async_redis):
+    admit(async_redis, ["a", "b", "c"], user_slots=1)
+    client = sync_redis.redis_client
+
+    assert sync_redis.start_job("a")["task_id"] == "a"
+    assert client.zscore(keys.RUNNINGKEY_PREFIX + "short", "a") is not None
+
+    next_job = sync_redis.release_job_slot("a", elapsed=30)
+    assert next_job["task_id"] == "b"
+    assert slots(client) == (1, ["c"])
+    assert queued(client) == ["b"]
+    assert client.ttl(keys.JOBKEY_PREFIX + "b") > 0
+    assert client.get(keys.JOBKEY_PREFIX + "a") is None
+    assert float(client.hget(keys.RTF_KEY, "short")) == 0.5
+
+    # 重复释放（例如失败回调）不再交出名额
+    assert sync_redis.release_job_slot("a") is None
+    assert slots(client) == (1, ["c"])
+
+
+def test_release_skips_missing_held_jobs(sync_redis, async_redis):
+    admit(async_redis, ["a", "b", "c", "d"], user_slots=1)
+    client = sync_redis.redis_client
+    client.delete(keys.JOBKEY_PREFIX + "b", keys.JOBKEY_PREFIX + "c")
+
+    assert sync_redis.release_job_slot("a")["task_id"] == "d"
+    assert queued(client) == ["d"]
+
+    # 没有可以接着投递的任务时归还名额
+    assert sync_redis.release_job_slot("d") is None
+    assert slots(client) == (0, [])
+    assert queued(client) == []
+
+    assert admit(async_redis, ["e", "f"], user_slots=1) == [True, False]
+    client.delete(keys.JOBKEY_PREFIX + "f")
+    assert sync_redis.release_job_slot("e") is None
+    assert slots(client) == (0, [])
+
+
+def test_cancel_held_queued_and_running_jobs(sync_redis, async_redis):
+    admit(async_redis, ["a", "b", "c"], user_slots=1)
+    client = sync_redis.redis_client
+    sync_redis.start_job("a")
+
+    # 处理中的任务由 worker 停止并释放名额
+    assert asyncio.run(async_redis.cancel_job("a")) == (True, None)
+    assert client.exists(keys.CANCELKEY_PREFIX + "a")
+    assert slots(client) == (1, ["b", "c"])
+
+    # 暂存的任务直接移出暂存列表
+    assert asyncio.run(async_redis.cancel_job("c")) == (False, None)
+    assert slots(client) == (1, ["b"])
+    assert client.get(keys.JOBKEY_PREFIX + "c") is None
+
+    # 排队中的任务释放名额并交给下一个暂存任务
+    assert sync_redis.release_job_slot("a")["task_id"] == "b"
+    running, next_job = asyncio.run(async_redis.cancel_job("b"))
+    assert (running, next_job) == (False, None)
+    assert slots(client) == (0, [])
+    assert queued(client) == []
+
+
+def test_cancel_queued_job_promotes_held_job(sync_redis, async_redis):
+    admit(async_redis, ["a", "b"], user_slots=1)
+    running, next_job = asyncio.run(async_redis.cancel_job("a"))
+    assert running is False
+    assert next_job["task_id"] == "b"
+    assert queued(sync_redis.redis_client) == ["b"]
+
+
+def test_estimate_start_uses_earliest_free_workers():
+    # 两个 worker 分别在 110 和 130 空闲，排在前面的任务各需 50 秒
+    assert estimate_start(100, 2, [110, 130], [50]) == 130
+    assert estimate_start(100, 2, [110, 130], [50, 50]) == 160
+    assert estimate_start(100, 2, [], []) == 100
+    assert estimate_start(100, 1, [90], [10]) == 110
+
+
+def test_queue_status_for_queued_job():
+    status = {
+        "size_class": "short",
+        "duration": 100,
+        "rtf": 0.5,
+        "running_finish": None,
+        "ahead": [40, 60],
+        "class_running": [],
+        "held": False,
+    }
+    result = queue_status(status, 1000)
+    assert result["queue"] == "stt.short"
+    assert result["position"] == 3
+    assert result["rtf"] == 0.5
@@ -0,0 +1,89 @@
+from utils.search import find_hits, index_terms, normalize, query_terms, segment_terms
+
+
+def test_index_terms_cjk_unigrams_and_bigrams():
+    assert index_terms("今天天气") == {
+        "今": 1,
+        "天": 2,
+        "气": 1,
+        "今天": 1,
+        "天天": 1,
+        "天气": 1,
+    }
+
+
+def test_index_terms_words_are_lowercased():
+    assert index_terms("Hello, hello World! don't") == {
+        "hello": 2,
+        "world": 1,
+        "don't": 1,
+    }
+
+
+def test_index_terms_mixed_text():
+    terms = index_terms("用GPU转写")
+    assert terms["gpu"] == 1
+    assert terms["用"] == 1 and terms["转写"] == 1
+    assert "用转" not in terms
+
+
+def test_query_terms_use_bigrams_and_deduplicate():
+    assert query_terms("天气 天气") == ["天气"]
+    assert query_terms("今天天气") == ["今天", "天天", "天气"]
+    assert query_terms("天") == ["天"]
+    assert query_terms("Whisper 模型") == ["whisper", "模型"]
+    assert query_terms("，。!") == []
+
+
+def test_query_terms_use_single_characters_only_on_their_own():
+    assert query_terms("天气 好") == ["天气"]
+    assert query_terms("用GPU") == ["gpu"]
+    assert query_terms("天 气") == ["天", "气"]
+
+
+def test_segment_terms_skip_segments_without_id():
+    terms = segment_terms([{"id": 3, "text": "ok"}, {"text": "legacy"}])
+    assert terms == {3: {"ok": 1}}
+
+
+def test_normalize_ignores_case_space_and_punctuation():
+    assert normalize(" Hello, 世界！") == "hello世界"
+
+
+def test_find_hits_maps_matches_to_words():
+    segment = {
+        "start": 0.0,
+        "end": 3.0,
+        "text": "今天天气不错",
+        "words": [
+            {"word": "今天", "start": 0.0, "end": 0.5},
+            {"word": "天气", "start": 0.5, "end": 1.0},
+            {"word": "不错", "start": 1.0, "end": 1.5},
+        ],
+    }
+    assert find_hits(segment, "天天气") == [
+        {"start": 0.0, "end": 1.0, "word_start": 0, "word_end": 1}
+    ]
+    assert find_hits(segment, "不错！") == [
+        {"start": 1.0, "end": 1.5, "word_start": 2, "word_end": 2}
+    ]
+    assert find_hits(segment, "天晴") == []
+
+
+def test_find_hits_repeated_matches():
+    segment = {
+        "start": 0.0,
+        "end": 2.0,
+        "text": " go go",
+        "words": [
+            {"word": " Go", "start": 0.0, "end": 1.0},
+            {"word": " go", "start": 1.0, "end": 2.0},
+        ],
+    }
+    assert [h["word_start"] for h in find_hits(segment, "go")] == [0, 1]
+
+
+def test_find_hits_without_words_uses_segment_times():
+    segment = {"start": 4.0, "end": 6.0, "text": "Hello world"}
+    assert find_hits(segment, "hello WORLD") == [{"start": 4.0, "end": 6.0}]
+    assert find_hits(segment, "bye") == []
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+import api.search
+
+
+def segment(i, text):
+    return {"id": i, "start": float(i), "end": i + 1.0, "text": text}
+
+
+@pytest.fixture
+def client(sync_redis, async_redis, monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    # 大部分候选包含全部词项但不相邻，核对后会被丢弃
+    texts = ["天气不好，不错"] * 30 + ["今天天气不错"] * 5
+    segments = [segment(i, text) for i, text in enumerate(texts)]
+    sync_redis.set_stt_task("t1", {"file_id": "f", "segments": segments, "text": ""})
+    sync_redis.set_task_summary("t1", {"state": "SUCCESS", "file_name": "a.mp3"})
+    asyncio.run(async_redis.update_search_index("t1", segments))
+
+    monkeypatch.setattr(api.search, "async_redis", async_redis)
+    app = FastAPI()
+    app.include_router(api.search.router, prefix="/api")
+    return TestClient(app)
+
+
+def search(client, **params):
+    response = client.get("/api/search", params=dict(q="天气不错", **params))
+    assert response.status_code == 200
+    return response.json()["data"]
+
+
+def test_page_keeps_reading_candidates_until_full(client):
+    data = search(client, limit=5)
+    assert sorted(item["segment_id"] for item in data["items"]) == [30, 31, 32, 33, 34]
+    # 剩下的候选都未通过核对
+    data = search(client, limit=5, offset=data["next_offset"])
+    assert data == {"items": [], "next_offset": None}
+
+
+def test_next_offset_is_the_consumed_candidate_offset(client):
+    seen, offset = [], 0
+    while offset is not None:
+        data = search(client, limit=2, offset=offset)
+        assert len(data["items"]) <= 2
+        seen.extend(item["segment_id"] for item in data["items"])
+        assert data["next_offset"] is None or data["next_offset"] > offset
+        offset = data["next_offset"]
+    assert sorted(seen) == [30, 31, 32, 33, 34]
+
+
+def test_scan_budget_returns_short_page(client, monkeypatch):
+    monkeypatch.setattr(api.search, "MAX_SCAN_ROUNDS", 1)
+    data = search(client, limit=5)
+    # 只读取了一批 10 个候选，下一页从第 11 个候选开始
+    assert data["next_offset"] == 10
+    assert all(item["segment_id"] >= 30 for item in data["items"])
+
+
+def test_single_character_query_reads_the_posting_list(client):
+    response = client.get("/api/search", params={"q": "今", "limit": 3})
+    data = response.json()["data"]
+    segment_ids = {item["segment_id"] for item in data["items"]}
+    assert len(segment_ids) == 3 and segment_ids <= {30, 31, 32, 33, 34}
+    assert data["items"][0]["score"] > 0
+    assert data["next_offset"] == 3
@@ -0,0 +1,16 @@
+import pytest
+
+from bench.startup import measure
+
+# 与 bench/startup.py 中建议的 CI 阈值一致
+MAX_IMPORT_SECONDS = 3
+MAX_RSS_MB = 200
+
+
+@pytest.mark.parametrize("target", ["api", "worker"])
+def test_startup_stays_light(target):
+    result = measure(target, runs=1)
+    assert "error" not in result, result.get("error")
+    assert result["heavy_modules"] == []
+    assert result["import_seconds"] < MAX_IMPORT_SECONDS
+    assert result["rss_mb"] < MAX_RSS_MB
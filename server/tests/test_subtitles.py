@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from utils.subtitles import Exporter, format_timestamp
+
+SEGMENTS = [
+    {
+        "id": 0,
+        "start": 0.0,
+        "end": 1.5,
+        "text": " Hello world",
+        "words": [
+            {"word": " Hello", "start": 0.0, "end": 0.6},
+            {"word": " world", "start": 0.7, "end": 1.5},
+        ],
+    },
+    {
+        "id": 1,
+        "start": 3725.25,
+        "end": 3727.0,
+        "text": " Bye\tnow",
+        "words": [
+            {"word": " Bye", "start": 3725.25, "end": 3726.0},
+            {"word": " now", "start": 3726.0, "end": 3727.0},
+        ],
+    },
+]
+
+
+def export(fmt, segments=SEGMENTS, batch=1, **options):
+    """按 batch 个片段一批逐批渲染，结果应与批次大小无关"""
+    exporter = Exporter(fmt, **options)
+    parts = [exporter.begin()]
+    for i in range(0, len(segments), batch):
+        parts.append(exporter.write(segments[i : i + batch]))
+    parts.append(exporter.end())
+    return "".join(parts)
+
+
+def test_format_timestamp():
+    assert format_timestamp(0) == "00:00.000"
+    assert format_timestamp(3725.2505) == "01:02:05.250"
+    assert format_timestamp(1.5, True, ",") == "00:00:01,500"
+
+
+def test_srt():
+    assert export("srt") == (
+        "1\n00:00:00,000 --> 00:00:01,500\nHello world\n\n"
+        "2\n01:02:05,250 --> 01:02:07,000\nBye now\n\n"
+    )
+
+
+def test_vtt_without_words_uses_segment_text():
+    segments = [{k: v for k, v in s.items() if k != "words"} for s in SEGMENTS]
+    assert export("vtt", segments) == (
+        "WEBVTT\n\n"
+        "00:00.000 --> 00:01.500\nHello world\n\n"
+        "01:02:05.250 --> 01:02:07.000\nBye\tnow\n\n"
+    )
+
+
+def test_tsv_and_txt():
+    assert export("tsv") == (
+        "start\tend\ttext\n0\t1500\tHello world\n3725250\t3727000\tBye now\n"
+    )
+    assert export("txt") == "Hello world\nBye\tnow\n"
+
+
+def test_json_is_valid_across_batches():
+    data = json.loads(export("json", batch=1))
+    assert data["segments"] == SEGMENTS
+    assert data["text"] == " Hello world\n\n Bye\tnow"
+
+
+def test_line_width_rebreaks_across_segments():
+    output = export("srt", max_line_width=12, max_line_count=1)
+    assert output.split("\n\n")[:2] == [
+        "1\n00:00:00,000 --> 00:00:01,500\nHello world",
+        "2\n01:02:05,250 --> 01:02:07,000\nBye now",
+    ]
+    output = export("srt", max_line_width=6, max_line_count=2)
+    assert "Hello\nworld" in output
+
+
+def test_highlight_words():
+    output = export("vtt", SEGMENTS[:1], highlight_words=True)
+    assert output == (
+        "WEBVTT\n\n"
+        "00:00.000 --> 00:00.600\n<u>Hello</u> world\n\n"
+        "00:00.600 --> 00:00.700\nHello world\n\n"
+        "00:00.700 --> 00:01.500\nHello <u>world</u>\n\n"
+    )
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        Exporter("docx")
@@ -0,0 +1,96 @@
+import asyncio
+
+from db import keys
+
+
+def add_tasks(sync_redis, task_ids, score, state="PENDING"):
+    for task_id in task_ids:
+        sync_redis.set_task_summary(task_id, {"state": state}, score)
+
+
+def walk(list_page, limit):
+    """逐页读取，返回全部任务ID和页数"""
+    task_ids, pages, cursor = [], 0, None
+    while True:
+        summaries, cursor = list_page(cursor, limit)
+        task_ids.extend(s["task_id"] for s in summaries)
+        pages += 1
+        if cursor is None:
+            return task_ids, pages
+
+
+def test_pages_through_tasks_sharing_one_score(sync_redis):
+    task_ids = [f"task-{i:03d}" for i in range(300)]
+    add_tasks(sync_redis, task_ids, 1000.0)
+    add_tasks(sync_redis, ["newer"], 2000.0)
+    add_tasks(sync_redis, ["older"], 10.0)
+
+    listed, pages = walk(
+        lambda cursor, limit: sync_redis.list_task_summaries(
+            "PENDING", cursor, limit
+        ),
+        20,
+    )
+    assert listed == ["newer"] + sorted(task_ids, reverse=True) + ["older"]
+    assert pages == 16
+
+
+def test_cursor_survives_removal_of_its_task(sync_redis):
+    task_ids = [f"task-{i:03d}" for i in range(50)]
+    add_tasks(sync_redis, task_ids, 1000.0)
+
+    first, cursor = sync_redis.list_task_summaries("PENDING", None, 10)
+    assert cursor == f"1000.0:{first[-1]['task_id']}"
+    # 上一页最后一个任务完成后移出了 PENDING 索引
+    sync_redis.set_task_summary(first[-1]["task_id"], {"state": "SUCCESS"}, 1000.0)
+    sync_redis.set_task_summary("task-000", {"state": "SUCCESS"}, 1000.0)
+
+    second, _ = sync_redis.list_task_summaries("PENDING", cursor, 10)
+    assert [s["task_id"] for s in second] == [
+        f"task-{i:03d}" for i in range(39, 29, -1)
+    ]
+
+
+def test_async_handler_pages_the_same_way(sync_redis, async_redis):
+    task_ids = [f"task-{i:03d}" for i in range(120)]
+    add_tasks(sync_redis, task_ids, 1000.0)
+
+    async def run():
+        listed, cursor = [], None
+        while True:
+            summaries, cursor = await async_redis.list_task_summaries(
+                None, cursor, 25
+            )
+            listed.extend(s["task_id"] for s in summaries)
+            if cursor is None:
+                return listed
+
+    assert asyncio.run(run()) == sorted(task_ids, reverse=True)
+    assert sync_redis.redis_client.zcard(keys.TASK_INDEX_KEY) == 120
+
+
+def test_batch_items_get_distinct_increasing_scores(sync_redis, async_redis):
+    task_ids = [f"task-{i:03d}" for i in range(150)]
+    jobs = [
+        {"task_id": t, "file_id": "f", "size_class": "short", "user": "u1"}
+        for t in task_ids
+    ]
+    summaries = {t: {"state": "PENDING", "file_name": "a.mp3"} for t in task_ids}
+    admitted = asyncio.run(
+        async_redis.submit_batch("b1", {}, {}, jobs, summaries, user_slots=2)
+    )
+    assert admitted == [True, True] + [False] * 148
+
+    client = sync_redis.redis_client
+    scores = [client.zscore(keys.TASK_INDEX_KEY, t) for t in task_ids]
+    assert scores == sorted(set(scores))
+    queued = client.zrange(keys.QUEUEKEY_PREFIX + "short", 0, -1)
+    assert queued == [b"task-000", b"task-001"]
+
+    listed, _ = walk(
+        lambda cursor, limit: sync_redis.list_task_summaries(
+            "PENDING", cursor, limit
+        ),
+        20,
+    )
+    assert listed == task_ids[::-1]
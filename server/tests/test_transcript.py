@@ -0,0 +1,138 @@
+import pytest
+
+from db.codec import decode_block, pack_segments
+from utils.transcript import PatchError, apply_segment_ops
+
+
+def make_segment(i):
+    start = i * 10.0
+    return {
+        "id": i,
+        "start": start,
+        "end": start + 2.0,
+        "text": f"w{i}a w{i}b",
+        "tokens": [1, 2],
+        "words": [
+            {"word": f" w{i}a", "start": start, "end": start + 1.0},
+            {"word": f" w{i}b", "start": start + 1.0, "end": start + 2.0},
+        ],
+    }
+
+
+def load(count=6, block_size=3):
+    """按块存储后重新读出，返回 (块, 块索引, 片段ID -> 块号, 下一个片段ID)"""
+    segments = [make_segment(i) for i in range(count)]
+    blocks, segment_blocks, _, locate = pack_segments(segments, block_size)
+    loaded = {b: decode_block(data) for b, data in segment_blocks.items()}
+    return loaded, blocks, locate, count
+
+
+def apply(ops, count=6, block_size=3):
+    blocks, block_index, locate, next_id = load(count, block_size)
+    result = apply_segment_ops(blocks, block_index, locate, ops, next_id)
+    segments = [s for b in sorted(blocks) for s in blocks[b]]
+    return segments, locate, result
+
+
+def test_replace_words_derives_text_and_times():
+    words = [
+        {"word": "新", "start": 0.5, "end": 0.8},
+        {"word": "词", "start": 0.8, "end": 1.2},
+    ]
+    segments, _, (touched, next_id, changed, removed) = apply(
+        [{"op": "replace_words", "segment_id": 0, "words": words}]
+    )
+    assert segments[0]["text"] == "新词"
+    assert (segments[0]["start"], segments[0]["end"]) == (0.5, 1.2)
+    assert "tokens" not in segments[0]
+    assert (touched, next_id, changed, removed) == ({0}, 6, {0}, set())
+
+
+def test_split_assigns_next_id():
+    segments, locate, (_, next_id, changed, _) = apply(
+        [{"op": "split", "segment_id": 1, "word_index": 1}]
+    )
+    assert [s["id"] for s in segments[:4]] == [0, 1, 6, 2]
+    assert segments[1]["text"] == "w1a"
+    assert segments[2]["text"] == "w1b"
+    assert segments[2]["start"] == 11.0
+    assert locate[6] == 0
+    assert next_id == 7
+    assert changed == {1, 6}
+
+
+def test_split_rejects_edge_positions():
+    with pytest.raises(PatchError):
+        apply([{"op": "split", "segment_id": 1, "word_index": 2}])
+
+
+def test_merge_across_blocks():
+    segments, locate, (touched, _, changed, removed) = apply(
+        [{"op": "merge", "segment_ids": [2, 3]}]
+    )
+    merged = segments[2]
+    assert merged["id"] == 2
+    assert merged["text"] == "w2a w2b w3a w3b"
+    assert merged["end"] == 32.0
+    assert 3 not in locate
+    assert touched == {0, 1}
+    assert (changed, removed) == ({2}, {3})
+
+
+def test_merge_rejects_non_adjacent_segments():
+    with pytest.raises(PatchError):
+        apply([{"op": "merge", "segment_ids": [1, 3]}])
+
+
+def test_replace_range_replaces_contiguous_segments():
+    new = [
+        {"start": 10.0, "end": 15.0, "text": "x"},
+        {"start": 15.0, "end": 32.0, "text": "y"},
+    ]
+    segments, locate, (_, next_id, changed, removed) = apply(
+        [{"op": "replace_range", "segment_ids": [3, 1, 2], "segments": new}]
+    )
+    assert [s["id"] for s in segments] == [0, 6, 7, 4, 5]
+    assert [s["text"] for s in segments[1:3]] == ["x", "y"]
+    assert locate[6] == locate[7] == 0
+    assert next_id == 8
+    assert (changed, removed) == ({6, 7}, {1, 2, 3})
+
+
+@pytest.mark.parametrize("segment_ids", [[1, 3], [2, 2], [0, 4]])
+def test_replace_range_rejects_gaps(segment_ids):
+    with pytest.raises(PatchError):
+        apply(
+            [
+                {
+                    "op": "replace_range",
+                    "segment_ids": segment_ids,
+                    "segments": [{"start": 0.0, "end": 1.0, "text": "x"}],
+                }
+            ]
+        )
+
+
+def test_replace_range_inserts_at_anchor():
+    new = [{"start": 12.0, "end": 13.0, "text": "x"}]
+    op = {"op": "replace_range", "segment_ids": [], "segments": new}
+    segments, _, (_, _, changed, removed) = apply([dict(op, after_segment_id=1)])
+    assert [s["id"] for s in segments[:4]] == [0, 1, 6, 2]
+    assert (changed, removed) == ({6}, set())
+
+    segments, _, _ = apply(
+        [{"op": "replace_range", "segments": new, "before_segment_id": 3}]
+    )
+    assert [s["id"] for s in segments[2:5]] == [2, 6, 3]
+
+
+def test_replace_range_requires_an_anchor():
+    with pytest.raises(PatchError):
+        apply([{"op": "replace_range", "segments": []}])
+
+
+def test_unknown_segment_and_operation():
+    with pytest.raises(PatchError, match="not found"):
+        apply([{"op": "replace_words", "segment_id": 99, "words": []}])
+    with pytest.raises(PatchError, match="Unknown operation"):
+        apply([{"op": "rename", "segment_id": 0}])
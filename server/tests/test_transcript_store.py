@@ -0,0 +1,108 @@
+import json
+
+import pytest
+
+import db.redis
+from db import keys
+from db.redis import VersionConflict
+
+
+def word(text, start, end):
+    return {"word": text, "start": start, "end": end}
+
+
+def segment(i, text="a b"):
+    start = i * 2.0
+    words = [word(f" {w}", start, start + 1.0) for w in text.split()]
+    return {"id": i, "start": start, "end": start + 1.0, "text": text, "words": words}
+
+
+@pytest.fixture
+def task(sync_redis):
+    task_info = {"file_id": "f", "state": "SUCCESS", "segments": [segment(0)]}
+    task_info["text"] = "a b"
+    sync_redis.set_stt_task("t1", task_info)
+    return sync_redis
+
+
+def test_replace_bumps_version_and_keeps_metadata(task):
+    assert task.replace_stt_segments("t1", [segment(0, "x"), segment(1, "y")], 1) == 2
+    task_info = task.get_stt_task("t1")
+    assert task_info["version"] == 2
+    assert task_info["file_id"] == "f"
+    assert task_info["text"] == "x\n\ny"
+    assert [s["id"] for s in task_info["segments"]] == [0, 1]
+    assert task.replace_stt_segments("missing", [], None) is None
+
+
+def test_replace_rejects_stale_version(task):
+    with pytest.raises(VersionConflict) as e:
+        task.replace_stt_segments("t1", [segment(0, "x")], 0)
+    assert e.value.current_version == 1
+
+
+def test_replace_loses_race_against_concurrent_patch(task, monkeypatch):
+    replace_segments = db.redis.replace_segments
+
+    def patched_meanwhile(meta, segments):
+        # WATCH 之后、提交之前，另一个编辑通过 PATCH 接口提交了修改
+        task.patch_stt_segments(
+            "t1", [{"op": "replace_words", "segment_id": 0, "words": []}], 1
+        )
+        return replace_segments(meta, segments)
+
+    monkeypatch.setattr(db.redis, "replace_segments", patched_meanwhile)
+    with pytest.raises(VersionConflict) as e:
+        task.replace_stt_segments("t1", [segment(0, "x")], 1)
+    assert e.value.current_version == 2
+    assert task.get_stt_task("t1")["segments"][0]["words"] == []
+
+
+def test_set_stt_task_raises_on_bad_segments(task):
+    with pytest.raises(KeyError):
+        task.set_stt_task("t1", {"segments": [{"text": "no times"}]})
+    assert task.get_stt_task("t1")["text"] == "a b"
+
+
+def test_update_endpoint(task, async_redis, monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    import api.stt
+
+    monkeypatch.setattr(api.stt, "async_redis", async_redis)
+    app = FastAPI()
+    app.include_router(api.stt.router, prefix="/api")
+    client = TestClient(app)
+
+    body = {"task_id": "t1", "version": 1, "segments": [segment(0, "x y")]}
+    response = client.post("/api/stt-update", json=body)
+    assert response.status_code == 200
+    assert response.json()["data"] == {"version": 2}
+    assert task.get_stt_task("t1")["text"] == "x y"
+    assert task.redis_client.exists(keys.SEARCH_TERM_PREFIX + "x")
+
+    assert client.post("/api/stt-update", json=body).status_code == 409
+    body["segments"] = [{"id": 0, "start": 0, "end": 1, "text": "no words"}]
+    response = client.post("/api/stt-update", json=body)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid segment field words: Field required"
+    body["task_id"] = "missing"
+    body["segments"] = [segment(0)]
+    assert client.post("/api/stt-update", json=body).status_code == 404
+
+
+def test_splice_into_expired_legacy_task(task, monkeypatch):
+    import fastapi_celery.tasks as tasks
+
+    legacy = {"file_id": "f", "segments": [segment(0)], "text": "a b"}
+    task.redis_client.set(keys.TASKKEY_PREFIX + "t2", json.dumps(legacy))
+    monkeypatch.setattr(tasks, "sync_redis", task)
+    result = tasks.splice_segments("t2", 0.0, 1.0, [segment(0, "x")])
+    assert result["version"] == 2
+    assert task.get_stt_task("t2")["segments"][0]["text"] == "x"
+
+    task.redis_client.set(keys.TASKKEY_PREFIX + "t3", json.dumps(legacy))
+    # 读取元数据之后、转换为分块存储之前任务过期
+    monkeypatch.setattr(task, "get_stt_task", lambda task_id: None)
+    assert tasks.splice_segments("t3", 0.0, 1.0, [segment(0, "x")]) is None
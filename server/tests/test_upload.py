@@ -0,0 +1,102 @@
+import asyncio
+import os
+
+import pytest
+
+import api.upload
+from api.upload import BlockHasher, _resume_hasher
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    monkeypatch.setattr(api.upload, "HASH_BLOCK_SIZE", 8)
+
+
+def digest(data, pieces):
+    hasher = BlockHasher()
+    for i in range(0, len(data), pieces):
+        hasher.update(data[i : i + pieces])
+    return hasher.hexdigest()
+
+
+def test_fingerprint_does_not_depend_on_chunking(small_blocks):
+    data = bytes(range(100))
+    assert len({digest(data, n) for n in (1, 3, 8, 13, 100)}) == 1
+    assert digest(data, 7) != digest(data[:-1], 7)
+    assert BlockHasher().hexdigest() == digest(b"", 1)
+
+
+def test_resume_reads_only_what_the_session_lacks(small_blocks, tmp_path):
+    data = bytes(range(30))
+    path = tmp_path / "partial"
+    path.write_bytes(data)
+    full = digest(data, 30)
+
+    saved = BlockHasher()
+    saved.update(data[:20])
+    assert len(saved.digests) == 2
+    assert _resume_hasher(str(path), saved.digests, 30).hexdigest() == full
+    # 分片写入中途断开：会话里的摘要少于磁盘上的数据
+    assert _resume_hasher(str(path), saved.digests[:1], 30).hexdigest() == full
+    # 客户端从更早的位置重传
+    hasher = _resume_hasher(str(path), saved.digests, 12)
+    hasher.update(data[12:])
+    assert hasher.hexdigest() == full
+
+
+@pytest.fixture
+def client(async_redis, small_blocks, tmp_path, monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(api.upload, "async_redis", async_redis)
+    monkeypatch.setattr(api.upload, "STORAGE_DIR", str(tmp_path))
+    monkeypatch.setattr(api.upload, "PARTIAL_DIR", str(tmp_path / ".partial"))
+    monkeypatch.setattr(api.upload, "probe_media", lambda path: {"duration": 1.0})
+    app = FastAPI()
+    app.include_router(api.upload.router, prefix="/api")
+    return TestClient(app)
+
+
+def put_chunk(client, upload_id, offset, data):
+    return client.put(
+        f"/api/upload/{upload_id}",
+        data={"offset": offset},
+        files={"chunk": ("chunk", data, "application/octet-stream")},
+    )
+
+
+def test_chunked_upload_matches_single_upload(client, async_redis, monkeypatch):
+    data = os.urandom(45)
+    single = client.post("/api/upload", files={"file": ("a.mp3", data, "audio/mpeg")})
+    single_id = single.json()["data"]["file_id"]
+
+    form = {"file_name": "a.mp3", "file_type": "audio/mpeg", "file_size": len(data)}
+    upload_id = client.post("/api/upload/init", data=form).json()["data"]["upload_id"]
+    assert put_chunk(client, upload_id, 0, data[:20]).status_code == 200
+    # 重传并覆盖 offset 10 之后的数据
+    assert put_chunk(client, upload_id, 10, data[10:30]).status_code == 200
+    assert put_chunk(client, upload_id, 30, data[30:]).status_code == 200
+
+    # 登记文件时 Redis 暂时不可用：会话和数据都保留，可以重试
+    add_file = async_redis.add_file
+
+    async def unavailable(*args, **kwargs):
+        raise ConnectionError("redis is down")
+
+    monkeypatch.setattr(async_redis, "add_file", unavailable)
+    complete = f"/api/upload/{upload_id}/complete"
+    assert client.post(complete).status_code == 500
+    assert client.get(f"/api/upload/{upload_id}").json()["data"]["offset"] == 45
+
+    monkeypatch.setattr(async_redis, "add_file", add_file)
+    response = client.post(complete)
+    assert response.status_code == 200
+    chunked_id = response.json()["data"]["file_id"]
+
+    single_info = asyncio.run(async_redis.get_file(single_id))
+    chunked_info = asyncio.run(async_redis.get_file(chunked_id))
+    assert chunked_info["file_hash"] == single_info["file_hash"]
+    with open(chunked_info["file_path"], "rb") as f:
+        assert f.read() == data
+    assert client.get(f"/api/upload/{upload_id}").status_code == 404
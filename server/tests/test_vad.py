@@ -0,0 +1,85 @@
+import numpy as np
+
+from fastapi_celery.audio import SAMPLE_RATE
+from fastapi_celery.vad import (
+    compact_audio,
+    detect_speech,
+    merge_vad_reports,
+    restore_segments,
+    restore_time,
+    vad_report,
+)
+
+
+def tone(seconds, amplitude=0.3):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+
+
+def silence(seconds):
+    rng = np.random.default_rng(0)
+    noise = rng.normal(0, 1e-4, int(seconds * SAMPLE_RATE))
+    return noise.astype(np.float32)
+
+
+def test_detect_speech_finds_padded_regions():
+    audio = np.concatenate([silence(2), tone(1), silence(3), tone(1.5), silence(1)])
+    regions = detect_speech(audio)
+
+    assert len(regions) == 2
+    (s1, e1), (s2, e2) = regions
+    assert abs(s1 - 1.8) < 0.05 and abs(e1 - 3.2) < 0.05
+    assert abs(s2 - 5.8) < 0.05 and abs(e2 - 7.7) < 0.05
+
+
+def test_detect_speech_merges_short_gaps_and_drops_clicks():
+    audio = np.concatenate(
+        [silence(1), tone(1), silence(0.3), tone(1), silence(2), tone(0.06), silence(2)]
+    )
+    regions = detect_speech(audio)
+    assert len(regions) == 1
+    assert regions[0][1] < 3.6
+
+
+def test_detect_speech_on_silence_and_empty_audio():
+    assert detect_speech(silence(3)) == []
+    assert detect_speech(np.zeros(0, dtype=np.float32)) == []
+
+
+def test_compact_and_restore_round_trip():
+    audio = np.concatenate([silence(2), tone(1), silence(3), tone(1), silence(1)])
+    regions = [(2.0, 3.0), (6.0, 7.0)]
+    compacted, mapping = compact_audio(audio, regions, gap=0.3)
+
+    assert len(compacted) == int(2.3 * SAMPLE_RATE)
+    assert mapping == [(0.0, 2.0, 1.0), (1.3, 6.0, 1.0)]
+    assert restore_time(0.5, mapping) == 2.5
+    assert restore_time(1.5, mapping) == 6.2
+    # 落在插入的静音里：起点归到下一段开头，终点归到上一段末尾
+    assert restore_time(1.1, mapping, is_start=True) == 6.0
+    assert restore_time(1.1, mapping) == 3.0
+
+    segments = [
+        {"start": 0.2, "end": 1.5, "words": [{"start": 1.1, "end": 1.5}]},
+    ]
+    assert restore_segments(segments, mapping) == [
+        {"start": 2.2, "end": 6.2, "words": [{"start": 6.0, "end": 6.2}]}
+    ]
+
+
+def test_compact_without_speech():
+    compacted, mapping = compact_audio(silence(1), [])
+    assert len(compacted) == 0 and mapping == []
+
+
+def test_vad_reports():
+    report = vad_report(100.0, 40.0, 20.0)
+    assert report["skipped_seconds"] == 60.0
+    assert report["skipped_ratio"] == 0.6
+    assert report["saved_seconds"] == 30.0
+
+    merged = merge_vad_reports([report, None, vad_report(50.0, 50.0, 10.0)])
+    assert merged["audio_seconds"] == 150.0
+    assert merged["speech_seconds"] == 90.0
+    assert merged["saved_seconds"] == 20.0
+    assert merge_vad_reports([None]) is None
@@ -0,0 +1,30 @@
+import json
+import subprocess
+
+from loguru import logger
+
+
+def probe_media(file_path):
+    """使用 ffprobe 读取媒体信息（阻塞调用，API 中需放到线程池执行）"""
+    cmd = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-show_entries",
+        "format=duration:stream=codec_type,sample_rate,channels",
+        "-of",
+        "json",
+        file_path,
+    ]
+    result = subprocess.run(cmd, capture_output=True, check=True)
+    info = json.loads(result.stdout or b"{}")
+
+    media_info = {"duration": float(info.get("format", {}).get("duration") or 0)}
+    for stream in info.get("streams", []):
+        if stream.get("codec_type") == "audio" and "audio_channels" not in media_info:
+            media_info["audio_channels"] = int(stream.get("channels") or 0)
+            media_info["audio_framerate"] = int(stream.get("sample_rate") or 0)
+        elif stream.get("codec_type") == "video":
+            media_info["has_video"] = True
+    logger.debug(f"媒体信息：{file_path} {media_info}")
+    return media_info
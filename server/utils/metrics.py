@@ -0,0 +1,159 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+STAGE_BUCKETS = (
+    0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600
+)
+RTF_BUCKETS = (0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 5)
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# worker 和 API 写入 Redis 汇总的指标：名称 -> (类型, 说明, 桶边界)
+METRICS = {
+    "cutai_stage_duration_seconds": (
+        "histogram",
+        "Duration of each transcription stage",
+        STAGE_BUCKETS,
+    ),
+    "cutai_realtime_factor": (
+        "histogram",
+        "Processing time divided by audio duration per completed job",
+        RTF_BUCKETS,
+    ),
+    "cutai_audio_seconds_total": (
+        "counter",
+        "Seconds of audio transcribed",
+        None,
+    ),
+    "cutai_jobs_total": ("counter", "Finished transcription jobs", None),
+}
+
+
+@contextmanager
+def stage(timings, name):
+    """把代码块的耗时累加到 timings[name]，timings 为 None 时不记录"""
+    T0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[name] = timings.get(name, 0) + time.perf_counter() - T0
+
+
+def _label_key(labels):
+    return json.dumps(labels or {}, sort_keys=True, ensure_ascii=False)
+
+
+def metric_fields(name, labels, value):
+    """一次观测对应的 hash 字段增量 [(字段, 增量), ...]"""
+    kind, _, buckets = METRICS[name]
+    if kind == "counter":
+        return [(_label_key(labels), value)]
+    return histogram_fields(buckets, labels, value)
+
+
+def histogram_fields(buckets, labels, value):
+    # 只给值所在的第一个桶计数，输出时再累加成 Prometheus 的累积桶
+    label_key = _label_key(labels)
+    le = next((b for b in buckets if value <= b), "+Inf")
+    return [
+        (f"{label_key}\tbucket\t{le}", 1),
+        (f"{label_key}\tsum", value),
+        (f"{label_key}\tcount", 1),
+    ]
+
+
+def _format_labels(labels, **extra):
+    labels = dict(labels, **extra)
+    if not labels:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in labels.items()
+    )
+    return "{" + body + "}"
+
+
+def _format_value(value):
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_metric(name, kind, help_text, buckets, data):
+    """把 metric_fields 写入的数据渲染为 Prometheus 文本格式"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    if kind == "counter":
+        for label_key, value in sorted(data.items()):
+            labels = json.loads(label_key)
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+    series = {}
+    for field, value in data.items():
+        label_key, part, *le = field.split("\t")
+        entry = series.setdefault(label_key, {"buckets": {}, "sum": 0, "count": 0})
+        if part == "bucket":
+            entry["buckets"][le[0]] = float(value)
+        else:
+            entry[part] = float(value)
+
+    for label_key, entry in sorted(series.items()):
+        labels = json.loads(label_key)
+        cumulative = 0
+        for le in [str(b) for b in buckets] + ["+Inf"]:
+            cumulative += entry["buckets"].get(le, 0)
+            lines.append(
+                f"{name}_bucket{_format_labels(labels, le=le)} "
+                f"{_format_value(cumulative)}"
+            )
+        lines.append(f"{name}_sum{_format_labels(labels)} {entry['sum']!r}")
+        lines.append(
+            f"{name}_count{_format_labels(labels)} {_format_value(entry['count'])}"
+        )
+    return lines
+
+
+def render_metrics(data):
+    """data 为 {指标名: hash 内容}，来自 Redis 中汇总的 worker 指标"""
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines += render_metric(name, kind, help_text, buckets, data.get(name, {}))
+    return lines
+
+
+def render_gauge(name, help_text, values):
+    """values 为 [(标签, 值), ...]"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    for labels, value in values:
+        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return lines
+
+
+class Histogram:
+    """进程内直方图，用于 API 进程自身的 HTTP 延迟，数据格式与 Redis 汇总的指标一致"""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        with self.lock:
+            for field, amount in histogram_fields(self.buckets, labels, value):
+                self.data[field] = self.data.get(field, 0) + amount
+
+    def render(self):
+        with self.lock:
+            data = dict(self.data)
+        return render_metric(
+            self.name, "histogram", self.help_text, self.buckets, data
+        )
+
+
+HTTP_LATENCY = Histogram(
+    "cutai_http_request_duration_seconds",
+    "HTTP request latency by route",
+    HTTP_BUCKETS,
+)
@@ -0,0 +1,91 @@
+import heapq
+from datetime import datetime
+
+from config.config_loader import QUEUE_CONFIG
+
+DEFAULT_CLASSES = {
+    "short": {"max_duration": 300, "workers": 1},
+    "medium": {"max_duration": 1800, "workers": 1},
+    "long": {"workers": 2},
+}
+SIZE_CLASSES = QUEUE_CONFIG.get("classes") or DEFAULT_CLASSES
+# 时长未知的文件按中等长度处理
+FALLBACK_CLASS = "medium" if "medium" in SIZE_CLASSES else list(SIZE_CLASSES)[-1]
+USER_SLOTS = int(QUEUE_CONFIG.get("user_slots", 2))
+DEFAULT_RTF = float(QUEUE_CONFIG.get("default_rtf", 0.5))
+RTF_ALPHA = float(QUEUE_CONFIG.get("rtf_alpha", 0.2))
+# 长文件的窗口子任务由单独的 worker 池处理，不占用各时长队列的 worker
+WINDOW_QUEUE = "stt.windows"
+WINDOW_WORKERS = max(1, int((QUEUE_CONFIG.get("windows") or {}).get("workers", 2)))
+
+
+def size_class(duration):
+    """按时长选择队列类别，类别按配置顺序匹配第一个 max_duration 不小于时长的"""
+    if not duration:
+        return FALLBACK_CLASS
+    for name, conf in SIZE_CLASSES.items():
+        max_duration = conf.get("max_duration")
+        if max_duration is None or float(duration) <= float(max_duration):
+            return name
+    return list(SIZE_CLASSES)[-1]
+
+
+def queue_name(name):
+    return f"stt.{name}"
+
+
+def class_workers(name):
+    return max(1, int(SIZE_CLASSES.get(name, {}).get("workers", 1)))
+
+
+def host_workers():
+    """按配置同一台机器上运行的全部 worker 子进程数：各时长队列的池加上窗口池"""
+    return sum(class_workers(name) for name in SIZE_CLASSES) + WINDOW_WORKERS
+
+
+def update_rtf(current, observed, alpha=RTF_ALPHA):
+    return observed if current is None else (1 - alpha) * current + alpha * observed
+
+
+def estimate_start(now, workers, running_finish, ahead_seconds):
+    """估算排队任务的开始时间
+
+    假设 workers 个 worker 按先进先出处理：running_finish 为正在处理的任务的预计
+    完成时间，ahead_seconds 为排在前面的任务的预计处理时长。
+    """
+    free_at = sorted(max(now, t) for t in running_finish)[:workers]
+    free_at += [now] * (workers - len(free_at))
+    heapq.heapify(free_at)
+    for seconds in ahead_seconds:
+        heapq.heappush(free_at, heapq.heappop(free_at) + seconds)
+    return free_at[0]
+
+
+def queue_status(status, now):
+    """把 Redis 中的排队快照转换为 /api/stt-progress 返回的排队信息"""
+    rtf = status["rtf"] if status["rtf"] is not None else DEFAULT_RTF
+    expected = (status["duration"] or 0) * rtf
+    if status["running_finish"] is not None:
+        position, start = 0, None
+        finish = status["running_finish"]
+    else:
+        position = len(status["ahead"]) + 1
+        start = estimate_start(
+            now,
+            class_workers(status["size_class"]),
+            status["class_running"],
+            [(duration or 0) * rtf for duration in status["ahead"]],
+        )
+        finish = start + expected
+
+    def isoformat(ts):
+        return datetime.fromtimestamp(ts).isoformat() if ts is not None else None
+
+    return {
+        "queue": queue_name(status["size_class"]),
+        "position": position,
+        "held": status["held"],
+        "rtf": round(rtf, 4),
+        "estimated_start": isoformat(start),
+        "estimated_finish": isoformat(finish),
+    }
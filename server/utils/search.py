@@ -0,0 +1,97 @@
+import math
+import re
+from collections import Counter
+
+# 连续的中日韩字符，或连续的字母数字
+TOKEN_RE = re.compile(
+    r"([\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+)"
+    r"|([0-9a-z]+(?:'[a-z]+)?)"
+)
+
+
+def normalize(text):
+    """检索时忽略大小写、空白和标点"""
+    return re.sub(r"[\W_]+", "", text.lower())
+
+
+def index_terms(text):
+    """建立索引用的词项：中日韩文本取单字和相邻两字，其他文字按单词切分
+
+    单字的倒排表几乎覆盖整个语料，只供单字查询使用，见 query_terms。
+    """
+    terms = Counter()
+    for cjk, word in TOKEN_RE.findall(text.lower()):
+        if word:
+            terms[word] += 1
+            continue
+        terms.update(cjk)
+        terms.update(cjk[i : i + 2] for i in range(len(cjk) - 1))
+    return terms
+
+
+def query_terms(query):
+    """查询词项：中日韩文本取相邻两字，所有词项都须命中
+
+    只有查询中没有其他词项时才使用单字：单字的倒排表很长，和其他词项求交集时
+    几乎不缩小结果，单字是否出现在命中位置由 find_hits 按原文核对。
+    """
+    terms, chars = [], []
+    for cjk, word in TOKEN_RE.findall(query.lower()):
+        if word:
+            terms.append(word)
+        elif len(cjk) == 1:
+            chars.append(cjk)
+        else:
+            terms.extend(cjk[i : i + 2] for i in range(len(cjk) - 1))
+    return list(dict.fromkeys(terms or chars))
+
+
+def segment_terms(segments):
+    """{片段ID: 词项计数}，没有 ID 的旧片段不建索引"""
+    return {
+        segment["id"]: index_terms(segment.get("text", ""))
+        for segment in segments
+        if "id" in segment
+    }
+
+
+def idf(total, df):
+    return math.log(1 + (total - df + 0.5) / (df + 0.5))
+
+
+def find_hits(segment, query):
+    """在片段中查找查询文本出现的位置，返回带词级起止时间的命中列表
+
+    匹配忽略大小写和空白；有词级时间戳时返回命中词的起止时间，否则返回片段的起止时间。
+    """
+    needle = normalize(query)
+    words = segment.get("words") or []
+    if not needle:
+        return []
+    if not words:
+        if needle not in normalize(segment.get("text", "")):
+            return []
+        return [{"start": segment["start"], "end": segment["end"]}]
+
+    # 每个字符对应的词序号，用于把匹配位置换算回词
+    haystack, owners = [], []
+    for index, word in enumerate(words):
+        chars = normalize(word["word"])
+        haystack.append(chars)
+        owners.extend([index] * len(chars))
+    haystack = "".join(haystack)
+
+    hits = []
+    pos = haystack.find(needle)
+    while pos != -1:
+        first, last = owners[pos], owners[pos + len(needle) - 1]
+        hits.append(
+            {
+                "start": words[first]["start"],
+                "end": words[last]["end"],
+                "word_start": first,
+                "word_end": last,
+            }
+        )
+        pos = haystack.find(needle, pos + len(needle))
+    return hits
@@ -0,0 +1,48 @@
+import hashlib
+import json
+
+from config.config_loader import STT_CONFIG, WORKER_CONFIG
+
+DEFAULT_OPTIONS = {
+    "model": "small",
+    "engine": "torch",  # 推理引擎：torch 或 int8
+    "language": "Chinese",
+    "initial_prompt": "以下是简体中文普通话的句子。",
+    "word_timestamps": True,  # 获取每个词的时间戳
+    "temperature": 0.0,
+    "vad": True,  # 转写前跳过非语音部分
+}
+DEFAULT_OPTIONS.update(STT_CONFIG.get("defaults", {}))
+
+# 影响转写结果的参数，与媒体内容哈希一起组成缓存键
+CACHE_KEY_FIELDS = (
+    "model",
+    "engine",
+    "language",
+    "initial_prompt",
+    "word_timestamps",
+    "temperature",
+    "vad",
+)
+
+
+def build_options(**overrides):
+    """以默认参数为基础合并请求参数，值为 None 的参数视为未指定
+
+    配置了 worker.engine 时以其为准，API 查缓存和 worker 写缓存使用相同的参数。
+    """
+    options = dict(DEFAULT_OPTIONS)
+    options.update({k: v for k, v in overrides.items() if v is not None})
+    if WORKER_CONFIG.get("engine"):
+        options["engine"] = WORKER_CONFIG["engine"]
+    options["temperature"] = float(options["temperature"])
+    options["word_timestamps"] = bool(options["word_timestamps"])
+    options["vad"] = bool(options["vad"])
+    return options
+
+
+def cache_key(media_hash, options):
+    payload = [media_hash] + [options.get(field) for field in CACHE_KEY_FIELDS]
+    return hashlib.sha256(
+        json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
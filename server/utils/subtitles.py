@@ -0,0 +1,170 @@
+import json
+import re
+
+# 导出格式：名称 -> (扩展名, Content-Type)
+FORMATS = {
+    "srt": ("srt", "application/x-subrip; charset=utf-8"),
+    "vtt": ("vtt", "text/vtt; charset=utf-8"),
+    "tsv": ("tsv", "text/tab-separated-values; charset=utf-8"),
+    "json": ("json", "application/json; charset=utf-8"),
+    "txt": ("txt", "text/plain; charset=utf-8"),
+}
+
+
+def format_timestamp(seconds, always_include_hours=False, decimal_marker="."):
+    milliseconds = round(seconds * 1000.0)
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    hours_marker = f"{hours:02d}:" if always_include_hours or hours > 0 else ""
+    return (
+        f"{hours_marker}{minutes:02d}:{seconds:02d}{decimal_marker}{milliseconds:03d}"
+    )
+
+
+class CueBuilder:
+    """把片段切分为字幕条目，规则与 whisper.utils.SubtitlesWriter 一致
+
+    片段逐个输入，跨批次保留未输出完的条目，便于边读取边导出。
+    max_line_width 和 max_line_count 同时指定时才会跨片段重新断行；
+    highlight_words 为每个词输出一条下划线高亮的条目，需要词级时间戳。
+    """
+
+    def __init__(self, max_line_width=None, max_line_count=None, highlight_words=False):
+        self.max_line_width = 1000 if max_line_width is None else max_line_width
+        self.max_line_count = max_line_count
+        self.highlight_words = highlight_words
+        self.preserve_segments = max_line_count is None or max_line_width is None
+        self.subtitle = []
+        self.line_len = 0
+        self.line_count = 1
+        self.last = None
+
+    def feed(self, segment):
+        """输入一个片段，返回已完成的条目 [(开始, 结束, 文本), ...]"""
+        if not segment.get("words"):
+            # 没有词级时间戳时按片段输出
+            cues = self.flush()
+            text = segment["text"].strip().replace("-->", "->")
+            return cues + [(segment["start"], segment["end"], text)]
+
+        cues = []
+        for i, original in enumerate(segment["words"]):
+            timing = dict(original)
+            if self.last is None:
+                self.last = timing["start"]
+            long_pause = (
+                not self.preserve_segments and timing["start"] - self.last > 3.0
+            )
+            has_room = self.line_len + len(timing["word"]) <= self.max_line_width
+            seg_break = i == 0 and len(self.subtitle) > 0 and self.preserve_segments
+            if self.line_len > 0 and has_room and not long_pause and not seg_break:
+                self.line_len += len(timing["word"])
+            else:
+                timing["word"] = timing["word"].strip()
+                if (
+                    len(self.subtitle) > 0
+                    and self.max_line_count is not None
+                    and (long_pause or self.line_count >= self.max_line_count)
+                ) or seg_break:
+                    cues += self._cues(self.subtitle)
+                    self.subtitle = []
+                    self.line_count = 1
+                elif self.line_len > 0:
+                    self.line_count += 1
+                    timing["word"] = "\n" + timing["word"]
+                self.line_len = len(timing["word"].strip())
+            self.subtitle.append(timing)
+            self.last = timing["start"]
+        return cues
+
+    def flush(self):
+        cues = self._cues(self.subtitle) if self.subtitle else []
+        self.subtitle = []
+        self.line_len = 0
+        self.line_count = 1
+        return cues
+
+    def _cues(self, subtitle):
+        text = "".join(word["word"] for word in subtitle)
+        if not self.highlight_words:
+            return [(subtitle[0]["start"], subtitle[-1]["end"], text)]
+
+        cues = []
+        last = subtitle[0]["start"]
+        words = [word["word"] for word in subtitle]
+        for i, word in enumerate(subtitle):
+            if last != word["start"]:
+                cues.append((last, word["start"], text))
+            highlighted = "".join(
+                re.sub(r"^(\s*)(.*)$", r"\1<u>\2</u>", w) if j == i else w
+                for j, w in enumerate(words)
+            )
+            cues.append((word["start"], word["end"], highlighted))
+            last = word["end"]
+        return cues
+
+
+class Exporter:
+    """按格式逐批渲染片段：begin() + write(片段批次)... + end() 拼接为完整文件"""
+
+    def __init__(
+        self, fmt, max_line_width=None, max_line_count=None, highlight_words=False
+    ):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}")
+        self.fmt = fmt
+        self.cues = CueBuilder(max_line_width, max_line_count, highlight_words)
+        self.index = 0
+        self.texts = []
+
+    def begin(self):
+        if self.fmt == "vtt":
+            return "WEBVTT\n\n"
+        if self.fmt == "tsv":
+            return "start\tend\ttext\n"
+        if self.fmt == "json":
+            return '{"segments": ['
+        return ""
+
+    def write(self, segments):
+        if self.fmt in ("srt", "vtt"):
+            cues = []
+            for segment in segments:
+                cues += self.cues.feed(segment)
+            return self._format_cues(cues)
+        if self.fmt == "tsv":
+            return "".join(
+                f"{round(1000 * s['start'])}\t{round(1000 * s['end'])}\t"
+                f"{s['text'].strip().replace(chr(9), ' ')}\n"
+                for s in segments
+            )
+        if self.fmt == "json":
+            parts = []
+            for segment in segments:
+                parts.append(("" if self.index == 0 else ", ") + json.dumps(segment))
+                self.texts.append(segment["text"])
+                self.index += 1
+            return "".join(parts)
+        return "".join(s["text"].strip() + "\n" for s in segments)
+
+    def end(self):
+        if self.fmt in ("srt", "vtt"):
+            return self._format_cues(self.cues.flush())
+        if self.fmt == "json":
+            return '], "text": ' + json.dumps("\n\n".join(self.texts)) + "}"
+        return ""
+
+    def _format_cues(self, cues):
+        lines = []
+        for start, end, text in cues:
+            if self.fmt == "srt":
+                self.index += 1
+                start = format_timestamp(start, True, ",")
+                end = format_timestamp(end, True, ",")
+                lines.append(f"{self.index}\n{start} --> {end}\n{text}\n\n")
+            else:
+                lines.append(
+                    f"{format_timestamp(start)} --> {format_timestamp(end)}\n{text}\n\n"
+                )
+        return "".join(lines)
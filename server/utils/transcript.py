@@ -0,0 +1,165 @@
+class PatchError(ValueError):
+    """片段编辑操作不合法，例如引用了不存在的片段或合并不相邻的片段"""
+
+
+def segment_text(words):
+    return "".join([word["word"] for word in words]).strip()
+
+
+def _derive(segment):
+    # 词发生变化后重新计算文本和起止时间，原有 tokens 已不再对应，直接丢弃
+    words = segment.get("words") or []
+    segment["text"] = segment_text(words)
+    if words:
+        segment["start"] = words[0]["start"]
+        segment["end"] = words[-1]["end"]
+    segment.pop("tokens", None)
+
+
+def _field(op, name):
+    if op.get(name) is None:
+        raise PatchError(f"Operation {op.get('op')} requires {name}")
+    return op[name]
+
+
+def _adjacent(blocks, block_index, first, second):
+    """(块号, 下标) 表示的两个片段是否前后相邻"""
+    first_block, first_index = first
+    second_block, second_index = second
+    if first_block == second_block:
+        return second_index == first_index + 1
+    # 跨块：前者是块内最后一个，后者是后续第一个非空块的第一个
+    between = range(first_block + 1, second_block)
+    return (
+        first_index == len(blocks[first_block]) - 1
+        and second_index == 0
+        and second_block > first_block
+        and all(block_index[b]["count"] == 0 for b in between)
+    )
+
+
+def apply_segment_ops(blocks, block_index, locate, ops, next_id):
+    """在已加载的存储块上按顺序执行片段编辑操作
+
+    blocks 为 {块号: 片段列表}，只需包含操作涉及的块；block_index 为元数据中的块索引；
+    locate 为 {片段ID: 块号}，执行过程中会随拆分、合并同步更新。
+
+    支持的操作：
+      {"op": "replace_words", "segment_id": 3, "words": [...]}
+      {"op": "split", "segment_id": 3, "word_index": 5}
+      {"op": "merge", "segment_ids": [3, 4]}
+      {"op": "replace_range", "segment_ids": [3, 4, 5], "segments": [...]}
+
+    replace_range 用新片段替换连续的若干片段；segment_ids 为空时把新片段插入到
+    after_segment_id 之后或 before_segment_id 之前。新片段按顺序分配新的片段ID。
+
+    返回 (被修改的块号集合, 新的 next_id, 被修改或新增的片段ID集合, 被删除的片段ID集合)。
+    """
+    touched, changed, removed = set(), set(), set()
+
+    def find(segment_id):
+        block_no = locate.get(segment_id)
+        if block_no is None or block_no not in blocks:
+            raise PatchError(f"Segment {segment_id} not found")
+        for index, segment in enumerate(blocks[block_no]):
+            if segment.get("id") == segment_id:
+                return block_no, index
+        raise PatchError(f"Segment {segment_id} not found")
+
+    for op in ops:
+        kind = op.get("op")
+        if kind == "replace_words":
+            block_no, index = find(_field(op, "segment_id"))
+            segment = blocks[block_no][index]
+            segment["words"] = _field(op, "words")
+            _derive(segment)
+            touched.add(block_no)
+            changed.add(segment["id"])
+
+        elif kind == "split":
+            block_no, index = find(_field(op, "segment_id"))
+            segment = blocks[block_no][index]
+            words = segment.get("words") or []
+            word_index = _field(op, "word_index")
+            if not 0 < word_index < len(words):
+                raise PatchError(f"Invalid split position {word_index}")
+
+            new_segment = {k: v for k, v in segment.items() if k != "words"}
+            new_segment["id"] = next_id
+            new_segment["words"] = words[word_index:]
+            segment["words"] = words[:word_index]
+            _derive(segment)
+            _derive(new_segment)
+            blocks[block_no].insert(index + 1, new_segment)
+            locate[next_id] = block_no
+            touched.add(block_no)
+            changed.update((segment["id"], next_id))
+            next_id += 1
+
+        elif kind == "merge":
+            segment_ids = _field(op, "segment_ids")
+            if len(segment_ids) != 2:
+                raise PatchError("Merge requires exactly two segment ids")
+            first_id, second_id = segment_ids
+            first_block, first_index = find(first_id)
+            second_block, second_index = find(second_id)
+            if not _adjacent(
+                blocks,
+                block_index,
+                (first_block, first_index),
+                (second_block, second_index),
+            ):
+                raise PatchError(
+                    f"Segments {first_id} and {second_id} are not adjacent"
+                )
+
+            first = blocks[first_block][first_index]
+            second = blocks[second_block].pop(second_index)
+            first["words"] = (first.get("words") or []) + (second.get("words") or [])
+            _derive(first)
+            locate.pop(second_id, None)
+            touched.update((first_block, second_block))
+            changed.add(first_id)
+            changed.discard(second_id)
+            removed.add(second_id)
+
+        elif kind == "replace_range":
+            segment_ids = op.get("segment_ids") or []
+            new_segments = _field(op, "segments")
+            if segment_ids:
+                positions = sorted(find(i) for i in segment_ids)
+                if len(set(positions)) != len(positions) or not all(
+                    _adjacent(blocks, block_index, a, b)
+                    for a, b in zip(positions, positions[1:])
+                ):
+                    raise PatchError("Segments to replace are not contiguous")
+                # 新片段放在被替换片段中最靠前的位置
+                block_no, index = positions[0]
+            elif op.get("after_segment_id") is not None:
+                block_no, index = find(op["after_segment_id"])
+                index += 1
+            elif op.get("before_segment_id") is not None:
+                block_no, index = find(op["before_segment_id"])
+            else:
+                raise PatchError(
+                    "Operation replace_range requires segment_ids or an anchor segment"
+                )
+
+            for segment_id in segment_ids:
+                old_block, old_index = find(segment_id)
+                blocks[old_block].pop(old_index)
+                locate.pop(segment_id, None)
+                touched.add(old_block)
+                changed.discard(segment_id)
+                removed.add(segment_id)
+            for offset, segment in enumerate(new_segments):
+                blocks[block_no].insert(index + offset, dict(segment, id=next_id))
+                locate[next_id] = block_no
+                changed.add(next_id)
+                next_id += 1
+            touched.add(block_no)
+
+        else:
+            raise PatchError(f"Unknown operation: {kind}")
+
+    return touched, next_id, changed, removed